@@ -0,0 +1,265 @@
+"""Drive the login -> authorize flow of every provider against a local stub.
+
+    python benchmarks/flow.py --requests 2000 --concurrency 50 --users 200
+
+No network is used: the app and the stub provider (``benchmarks/stub.py``)
+are both called in process through ``httpx.ASGITransport``.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import typing
+
+import fastapi
+import httpx
+
+from fastapi_authkit import AuthProviders
+from fastapi_authkit import AuthSetting
+from fastapi_authkit import OAuthApp
+from fastapi_authkit.core import providers
+from fastapi_authkit.core.database import SQLiteDriver
+from fastapi_authkit.core.http import HTTPClientPool
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import TokenIssuer
+from fastapi_authkit.core.users import SQLiteAuthLogic
+
+from stub import StubProvider
+
+BASE_URL = "http://testserver:80"
+PHASES = ("login", "provider", "authorize")
+
+
+def openid() -> dict[str, typing.Any]:
+    return {"scope": "openid profile email"}
+
+
+# name -> (method factory, settings)
+METHODS: dict[str, tuple[typing.Callable[..., typing.Any], dict[str, typing.Any]]] = {
+    "google": (providers.GoogleAuthenticationMethod, {"client_kwargs": openid()}),
+    "zoom": (providers.ZoomAuthenticationMethod, {}),
+    "github": (providers.GithubAuthenticationMethod, {}),
+    "twitter": (providers.TwitterAuthenticationMethod, {}),
+    "okta": (
+        providers.OktaAuthenticationMethod,
+        {"api_base_url": "https://okta.stub", "client_kwargs": openid()},
+    ),
+    "okta-tenants": (
+        functools.partial(
+            providers.OktaTenantAuthenticationMethod,
+            name="okta-tenants",
+            tenant_settings=lambda tenant: {} if tenant.startswith("tenant-") else None,
+        ),
+        {"api_base_url": "https://{tenant}.okta.stub", "client_kwargs": openid()},
+    ),
+}
+
+
+class MemoryAuthLogic(AuthProviders.IAuthLogic):
+    def __init__(self) -> None:
+        self.users: dict[str, AuthProviders.UserInfoModel] = {}
+
+    async def login(
+        self, userinfo: AuthProviders.UserInfoModel
+    ) -> AuthProviders.Token | None:
+        if userinfo.sub in self.users:
+            return AuthProviders.Token("token-" + str(userinfo.sub))
+        return None
+
+    async def singup(self, userinfo: AuthProviders.UserInfoModel) -> None:
+        self.users[str(userinfo.sub)] = userinfo
+
+
+def build(
+    stub: StubProvider, names: list[str], logic: str = "memory"
+) -> tuple[fastapi.FastAPI, OAuthApp]:
+    app = fastapi.FastAPI()
+    oauth_app = OAuthApp(
+        app=app,
+        secret_key="benchmark",
+        http=HTTPClientPool(transport=httpx.ASGITransport(app=stub)),
+    )
+    router = fastapi.APIRouter(prefix="/auth")
+    auth_vias = AuthProviders.AuthVia(
+        oapp=oauth_app.oauth,
+        vias=[
+            AuthSetting(
+                name=name,
+                client_id=stub.client_id,
+                client_secret="secret",
+                **METHODS[name][1],
+            ).dict()
+            for name in names
+        ],
+    )
+    # the sqlite logic keys its users by provider, so a single one is shared.
+    shared: typing.Optional[SQLiteAuthLogic] = None
+    if logic == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(prefix="authkit-bench-"), "users.sqlite3")
+        shared = SQLiteAuthLogic(
+            TokenIssuer(KeyRing("HS256", rotation_interval=None)), SQLiteDriver(path)
+        )
+    for name in names:
+        METHODS[name][0](
+            router=router,
+            oauth_app=oauth_app,
+            auth_vias=auth_vias,
+            auth_logic=shared or MemoryAuthLogic(),
+        )
+    return app, oauth_app
+
+
+def percentile(durations: list[float], q: float) -> float:
+    # nearest rank on the sorted durations.
+    return durations[max(math.ceil(q / 100 * len(durations)) - 1, 0)]
+
+
+class Run:
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.durations: dict[str, list[float]] = {phase: [] for phase in PHASES}
+        self.statuses: dict[int, int] = {}
+        self.errors: int = 0
+        self.elapsed: float = 0.0
+
+    def summary(self) -> dict[str, typing.Any]:
+        flows: int = len(self.durations["authorize"])
+        phases: dict[str, dict[str, float]] = {}
+        for phase, durations in self.durations.items():
+            durations = sorted(durations)
+            if durations:
+                phases[phase] = {
+                    "p50_ms": percentile(durations, 50) * 1e3,
+                    "p99_ms": percentile(durations, 99) * 1e3,
+                }
+        return {
+            "provider": self.name,
+            "flows": flows,
+            "errors": self.errors,
+            "statuses": self.statuses,
+            "throughput": flows / self.elapsed if self.elapsed else 0.0,
+            "phases": phases,
+        }
+
+
+async def flow(
+    run: Run,
+    app_client: httpx.AsyncClient,
+    browser: httpx.AsyncClient,
+    path: str,
+    user: int,
+) -> None:
+    started: float = time.perf_counter()
+    resp: httpx.Response = await app_client.get(path + "/login")
+    login_done: float = time.perf_counter()
+    run.durations["login"].append(login_done - started)
+
+    # the stub stands in for the user's consent, ``user`` picks who logs in.
+    location: str = resp.headers["location"]
+    resp = await browser.get(location, params={"user": str(user)})
+    provider_done: float = time.perf_counter()
+    run.durations["provider"].append(provider_done - login_done)
+
+    resp = await app_client.get(resp.headers["location"])
+    run.durations["authorize"].append(time.perf_counter() - provider_done)
+    run.statuses[resp.status_code] = run.statuses.get(resp.status_code, 0) + 1
+    # a login which ended without a token failed, whatever its status.
+    if not resp.is_success:
+        run.errors += 1
+
+
+async def bench(
+    name: str,
+    app: fastapi.FastAPI,
+    stub: StubProvider,
+    args: argparse.Namespace,
+) -> Run:
+    run: Run = Run(name)
+    remaining: typing.Iterator[int] = iter(range(args.requests))
+
+    async def worker(seed: int) -> None:
+        # every worker is a browser of its own, with its own session cookie.
+        rand = random.Random(seed)
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url=BASE_URL
+        ) as app_client, httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=stub)
+        ) as browser:
+            for _ in remaining:
+                user: int = rand.randint(1, args.users)
+                path: str = "/auth/" + name
+                if name == "okta-tenants":
+                    path += f"/tenant-{user % args.tenants}"
+                try:
+                    await flow(run, app_client, browser, path, user)
+                except (httpx.HTTPError, KeyError):
+                    run.errors += 1
+
+    started: float = time.perf_counter()
+    await asyncio.gather(*(worker(seed) for seed in range(args.concurrency)))
+    run.elapsed = time.perf_counter() - started
+    return run
+
+
+async def main(args: argparse.Namespace) -> list[dict[str, typing.Any]]:
+    stub = StubProvider(latency=args.latency)
+    app, oauth_app = build(stub, args.providers, args.logic)
+    await oauth_app.startup()
+    try:
+        return [
+            (await bench(name, app, stub, args)).summary() for name in args.providers
+        ]
+    finally:
+        await oauth_app.shutdown()
+
+
+def report(summaries: list[dict[str, typing.Any]]) -> None:
+    header = f"{'provider':<14}{'flows/s':>10}{'errors':>8}"
+    for phase in PHASES:
+        header += f"{phase + ' p50':>16}{'p99':>14}"
+    print(header)
+    for summary in summaries:
+        row = f"{summary['provider']:<14}{summary['throughput']:>10.1f}"
+        row += f"{summary['errors']:>8}"
+        for phase in PHASES:
+            stats = summary["phases"].get(phase, {"p50_ms": 0.0, "p99_ms": 0.0})
+            row += f"{stats['p50_ms']:>13.2f} ms  {stats['p99_ms']:>9.2f} ms"
+        print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=500, help="flows per provider")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100, help="distinct users")
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="stub latency per call (s)"
+    )
+    parser.add_argument(
+        "--providers",
+        type=lambda value: value.split(","),
+        default=list(METHODS),
+        help="comma separated, one of " + ", ".join(METHODS),
+    )
+    parser.add_argument(
+        "--logic",
+        choices=("sqlite", "memory"),
+        default="sqlite",
+        help="the users store, SQLiteAuthLogic or a dict",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    summaries = asyncio.run(main(args))
+    report(summaries)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(summaries, file, indent=2)
@@ -0,0 +1,59 @@
+"""Measure the import time of the package's entry points in fresh processes.
+
+    python benchmarks/imports.py --repeat 5 --top 5
+
+Each statement runs in a new interpreter with ``-X importtime``, the best
+run of ``--repeat`` is reported along with its heaviest packages.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+STATEMENTS: tuple[str, ...] = (
+    "import fastapi_authkit",
+    "from fastapi_authkit.core.security import TokenVerifier",
+    "from fastapi_authkit.core.issuer import TokenIssuer",
+    "from fastapi_authkit import OAuthApp",
+    "from fastapi_authkit import AuthProviders",
+)
+
+
+def measure(statement: str) -> dict[str, int]:
+    # the microseconds spent importing each top-level package.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    packages: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line.removeprefix("import time:").split("|")
+        package: str = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    return packages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3, help="heaviest packages shown")
+    args = parser.parse_args()
+
+    for statement in STATEMENTS:
+        runs = [measure(statement) for _ in range(args.repeat)]
+        best = min(runs, key=lambda packages: sum(packages.values()))
+        print(f"{sum(best.values()) / 1e3:>9.1f} ms  {statement}")
+        heaviest = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        for name, us in heaviest[: args.top]:
+            print(f"{us / 1e3:>20.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
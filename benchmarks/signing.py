@@ -0,0 +1,53 @@
+"""Compare the token signing throughput of the key ring with ``jwt.encode``.
+
+    python benchmarks/signing.py --number 2000
+"""
+import argparse
+import time
+import timeit
+import typing
+
+from authlib.jose import jwt
+
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import TokenIssuer
+
+CLAIMS: dict[str, typing.Any] = {
+    "sub": "110169484474386276334",
+    "name": "Jane Doe",
+    "email": "jane@example.com",
+    "picture": "https://lh3.googleusercontent.com/a/photo.jpg",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'alg':<8}{'jwt.encode':>16}{'issuer':>16}{'tokens/s':>12}")
+    for alg in ("HS256", "RS256", "EdDSA"):
+        issuer = TokenIssuer(KeyRing(alg, rotation_interval=None))
+        signing_key = issuer.keyring.current
+        # ``jwt.encode`` is what the ``IAuthLogic.login`` implementations did
+        # so far: the (exported) key is parsed again for every token.
+        raw: typing.Any = signing_key.key.as_dict(is_private=True)
+        header = {"alg": alg, "kid": signing_key.kid}
+        now = int(time.time())
+        payload = {**CLAIMS, "iat": now, "exp": now + 3600}
+        cases = {
+            "jwt.encode": lambda: jwt.encode(header, payload, raw),
+            "issuer": lambda: issuer.issue(CLAIMS),
+        }
+        row = f"{alg:<8}"
+        best: float = 0.0
+        for case in cases.values():
+            best = min(timeit.repeat(case, number=args.number, repeat=args.repeat))
+            row += f"{best / args.number * 1e6:>13.2f} us"
+        row += f"{args.number / best:>12.0f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
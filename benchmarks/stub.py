@@ -0,0 +1,228 @@
+"""A local ASGI stand-in for the providers, used by the offline benchmarks.
+
+It answers for every provider host (routed through ``httpx.ASGITransport``)
+with the discovery, JWKS, authorize, token and userinfo endpoints.
+"""
+import asyncio
+import re
+import secrets
+import time
+import typing
+import urllib.parse
+
+from authlib.jose import JsonWebKey
+from authlib.jose import jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.responses import PlainTextResponse
+from starlette.responses import RedirectResponse
+from starlette.responses import Response
+from starlette.routing import Route
+
+OAUTH_PARAM = re.compile(r'(\w+)="([^"]*)"')
+
+Profile = typing.Callable[[str], dict[str, typing.Any]]
+
+
+def oidc_profile(user: str) -> dict[str, typing.Any]:
+    return {
+        "sub": user,
+        "name": f"user-{user}@example.com",
+        "nickname": f"user-{user}",
+        "given_name": "Jane",
+        "family_name": "Doe",
+        "email": f"user-{user}@example.com",
+        "email_verified": True,
+        "locale": "en",
+        "updated_at": "2023-04-01T10:00:00Z",
+    }
+
+
+def github_profile(user: str) -> dict[str, typing.Any]:
+    return {
+        "id": int(user),
+        "login": f"user-{user}",
+        "node_id": f"node-{user}",
+        "name": "Jane Doe",
+        "email": f"user-{user}@example.com",
+        "html_url": f"https://github.com/user-{user}",
+        "avatar_url": f"https://github.com/user-{user}.png",
+        "location": None,
+        "company": None,
+        "updated_at": "2023-04-01T10:00:00Z",
+    }
+
+
+def zoom_profile(user: str) -> dict[str, typing.Any]:
+    return {
+        "id": user,
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "display_name": f"user-{user}",
+        "email": f"user-{user}@example.com",
+        "timezone": "UTC",
+        "verified": 1,
+        "pic_url": "https://example.com/photo.jpg",
+        "phone_number": "",
+        "location": "",
+        "last_login_time": "2023-04-01T10:00:00Z",
+    }
+
+
+def twitter_profile(user: str) -> dict[str, typing.Any]:
+    return {"id": int(user), "id_str": user, "name": f"user-{user}", "email": None}
+
+
+PROFILES: dict[str, Profile] = {
+    "api.github.com": github_profile,
+    "api.zoom.us": zoom_profile,
+    "api.twitter.com": twitter_profile,
+}
+
+
+class StubProvider:
+    def __init__(self, client_id: str = "bench", latency: float = 0.0) -> None:
+        self.client_id: str = client_id
+        # simulated network latency of every provider round trip.
+        self.latency: float = latency
+        self.key = JsonWebKey.generate_key(
+            "RSA", 2048, {"kid": "stub", "alg": "RS256"}, is_private=True
+        )
+        self.jwk_set: dict[str, typing.Any] = {"keys": [self.key.as_dict()]}
+        # code (or OAuth1 verifier) -> (user, nonce)
+        self.codes: dict[str, tuple[str, typing.Optional[str]]] = {}
+        # OAuth1 request token -> callback
+        self.callbacks: dict[str, str] = {}
+        self.requests: int = 0
+        self.app: Starlette = Starlette(
+            routes=[Route("/{path:path}", self.dispatch, methods=["GET", "POST"])]
+        )
+
+    async def __call__(
+        self, scope: typing.Any, receive: typing.Any, send: typing.Any
+    ) -> None:
+        await self.app(scope, receive, send)
+
+    async def dispatch(self, request: Request) -> Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path: str = request.url.path
+        if path.endswith("/openid-configuration"):
+            return JSONResponse(self.discovery(request))
+        if path.endswith(("/jwks", "/jwks.json")):
+            return JSONResponse(self.jwk_set)
+        if path.endswith(("/authorize", "/authenticate")):
+            return self.authorize(request)
+        if path.endswith("/request_token"):
+            return self.request_token(request)
+        if request.method == "POST" and path.endswith("token"):
+            return await self.token(request)
+        return self.userinfo(request)
+
+    def issuer(self, request: Request) -> str:
+        return f"https://{request.url.hostname}"
+
+    def discovery(self, request: Request) -> dict[str, typing.Any]:
+        issuer: str = self.issuer(request)
+        return {
+            "issuer": issuer,
+            "authorization_endpoint": issuer + "/authorize",
+            "token_endpoint": issuer + "/oauth/token",
+            "userinfo_endpoint": issuer + "/userinfo",
+            "jwks_uri": issuer + "/.well-known/jwks.json",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        }
+
+    @staticmethod
+    def oauth1_params(request: Request) -> dict[str, str]:
+        return {
+            name: urllib.parse.unquote(value)
+            for name, value in OAUTH_PARAM.findall(
+                request.headers.get("authorization", "")
+            )
+        }
+
+    def request_token(self, request: Request) -> Response:
+        token: str = secrets.token_urlsafe(16)
+        self.callbacks[token] = self.oauth1_params(request)["oauth_callback"]
+        return PlainTextResponse(
+            urllib.parse.urlencode(
+                {"oauth_token": token, "oauth_token_secret": "secret"}
+            ),
+            media_type="application/x-www-form-urlencoded",
+        )
+
+    def authorize(self, request: Request) -> Response:
+        # the consent screen, the user to log in is picked by the caller.
+        params = request.query_params
+        user: str = params.get("user", "1")
+        code: str = secrets.token_urlsafe(16)
+        self.codes[code] = (user, params.get("nonce"))
+        if "oauth_token" in params:
+            callback: str = self.callbacks.pop(params["oauth_token"])
+            query: dict[str, str] = {
+                "oauth_token": params["oauth_token"],
+                "oauth_verifier": code,
+            }
+        else:
+            callback = params["redirect_uri"]
+            query = {"code": code, "state": params.get("state", "")}
+        separator: str = "&" if "?" in callback else "?"
+        return RedirectResponse(callback + separator + urllib.parse.urlencode(query))
+
+    async def token(self, request: Request) -> Response:
+        oauth1: dict[str, str] = self.oauth1_params(request)
+        if "oauth_verifier" in oauth1:
+            user, _ = self.codes.pop(oauth1["oauth_verifier"])
+            return PlainTextResponse(
+                urllib.parse.urlencode(
+                    {"oauth_token": "at-" + user, "oauth_token_secret": "secret"}
+                ),
+                media_type="application/x-www-form-urlencoded",
+            )
+
+        form = urllib.parse.parse_qs((await request.body()).decode())
+        nonce: typing.Optional[str] = None
+        if form["grant_type"][0] == "refresh_token":
+            user = form["refresh_token"][0].removeprefix("rt-")
+        else:
+            user, nonce = self.codes.pop(form["code"][0])
+        token: dict[str, typing.Any] = {
+            "access_token": "at-" + user,
+            "refresh_token": "rt-" + user,
+            "token_type": "Bearer",
+            "expires_in": 3600,
+        }
+        if nonce is not None:
+            now: int = int(time.time())
+            claims: dict[str, typing.Any] = oidc_profile(user)
+            claims.update(
+                iss=self.issuer(request),
+                aud=self.client_id,
+                iat=now,
+                exp=now + 3600,
+                nonce=nonce,
+            )
+            token["id_token"] = jwt.encode(
+                {"alg": "RS256", "kid": "stub"}, claims, self.key
+            ).decode()
+        return JSONResponse(token)
+
+    def userinfo(self, request: Request) -> Response:
+        authorization: str = request.headers.get("authorization", "")
+        access_token: typing.Optional[str] = self.oauth1_params(request).get(
+            "oauth_token"
+        )
+        if access_token is None and authorization.startswith("Bearer "):
+            access_token = authorization.removeprefix("Bearer ")
+        if not access_token or not access_token.startswith("at-"):
+            return JSONResponse({"error": "invalid_token"}, status_code=401)
+
+        user: str = access_token.removeprefix("at-")
+        etag: str = f'"{user}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        profile: Profile = PROFILES.get(str(request.url.hostname), oidc_profile)
+        return JSONResponse(profile(user), headers={"ETag": etag})
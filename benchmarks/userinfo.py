@@ -0,0 +1,128 @@
+"""Compare the userinfo construction paths of every provider.
+
+    python benchmarks/userinfo.py --number 20000
+"""
+import argparse
+import timeit
+import typing
+
+from fastapi_authkit.core import providers
+from fastapi_authkit.core.mapping import UserInfoMapper
+from fastapi_authkit.core.oauth import UserInfoModel
+
+PAYLOADS: dict[str, dict[str, typing.Any]] = {
+    "google": {
+        "iss": "https://accounts.google.com",
+        "aud": "client-id",
+        "sub": "110169484474386276334",
+        "email": "jane@example.com",
+        "email_verified": True,
+        "name": "Jane Doe",
+        "given_name": "Jane",
+        "family_name": "Doe",
+        "picture": "https://lh3.googleusercontent.com/a/photo.jpg",
+        "locale": "en",
+        "iat": 1681000000,
+        "exp": 1681003600,
+        "nonce": "n-0S6_WzA2Mj",
+    },
+    "zoom": {
+        "id": "KDcuGIm1QgePTO8WbOqwIQ",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "display_name": "Jane Doe",
+        "email": "jane@example.com",
+        "type": 1,
+        "pmi": 3542471135,
+        "timezone": "Asia/Tehran",
+        "verified": 1,
+        "dept": "",
+        "last_login_time": "2023-04-01T10:00:00Z",
+        "pic_url": "https://example.com/photo.jpg",
+        "language": "en-US",
+        "phone_number": "+1 800000000",
+        "location": "Tehran",
+        "status": "active",
+    },
+    "github": {
+        "login": "janedoe",
+        "id": 1296269,
+        "node_id": "MDQ6VXNlcjE=",
+        "avatar_url": "https://github.com/images/error/janedoe.gif",
+        "html_url": "https://github.com/janedoe",
+        "type": "User",
+        "site_admin": False,
+        "name": "Jane Doe",
+        "company": "GitHub",
+        "blog": "https://github.com/blog",
+        "location": "San Francisco",
+        "email": "jane@example.com",
+        "bio": "There once was...",
+        "public_repos": 2,
+        "followers": 20,
+        "following": 0,
+        "created_at": "2008-01-14T04:33:35Z",
+        "updated_at": "2008-01-14T04:33:35Z",
+    },
+    "twitter": {
+        "id": 6253282,
+        "id_str": "6253282",
+        "name": "Jane Doe",
+        "screen_name": "janedoe",
+        "location": "San Francisco, CA",
+        "description": "There once was...",
+        "followers_count": 6133636,
+        "friends_count": 12,
+        "created_at": "Wed May 23 06:01:13 +0000 2007",
+        "verified": True,
+        "email": "jane@example.com",
+    },
+    "okta": {
+        "sub": "00uid4BxXw6I6TV4m0g3",
+        "name": "jane@example.com",
+        "nickname": "jane",
+        "given_name": "Jane",
+        "family_name": "Doe",
+        "locale": "en-US",
+        "zoneinfo": "America/Los_Angeles",
+        "updated_at": "2023-04-01T10:00:00Z",
+        "email_verified": True,
+        "picture": "https://example.com/photo.jpg",
+    },
+}
+
+METHODS = {
+    "google": providers.GoogleAuthenticationMethod,
+    "zoom": providers.ZoomAuthenticationMethod,
+    "github": providers.GithubAuthenticationMethod,
+    "twitter": providers.TwitterAuthenticationMethod,
+    "okta": providers.OktaAuthenticationMethod,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'provider':<10}{'mapper':>14}{'construct':>14}{'record':>14}")
+    for name, method in METHODS.items():
+        payload = PAYLOADS[name]
+        mapper: UserInfoMapper = method.claims.compile()  # type: ignore[union-attr]
+        # ``mapper`` is the validated ``UserInfoModel`` the providers build,
+        # the others skip the validation.
+        cases = {
+            "mapper": lambda: mapper(payload),
+            "construct": lambda: UserInfoModel.construct(**mapper.extract(payload)),
+            "record": lambda: mapper.record(payload),
+        }
+        row = f"{name:<10}"
+        for case in cases.values():
+            best = min(timeit.repeat(case, number=args.number, repeat=args.repeat))
+            row += f"{best / args.number * 1e6:>11.2f} us"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,34 @@
-from .base import OAuthApp
-from .settings import SETTINGS as AuthSetting
-from .core import providers as AuthProviders
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from .base import OAuthApp
+    from .settings import SETTINGS as AuthSetting
+    from .core import providers as AuthProviders
 
 __version__ = "0.0.2"
 __author__ = "papuridalego@gmail.com"
 __all__ = ["OAuthApp", "AuthSetting", "AuthProviders"]
+
+# the exports are imported on their first access, so the processes which only
+# need a part of the kit (e.g. ``core.security`` to verify tokens) don't load
+# fastapi, authlib's starlette integration and every provider on start.
+_LAZY: dict[str, tuple[str, typing.Optional[str]]] = {
+    "OAuthApp": (".base", "OAuthApp"),
+    "AuthSetting": (".settings", "SETTINGS"),
+    "AuthProviders": (".core.providers", None),
+}
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY[name]
+    module = importlib.import_module(module_name, __name__)
+    value: typing.Any = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY})
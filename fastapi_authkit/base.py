@@ -1,8 +1,40 @@
+import asyncio
+import typing
+import urllib.parse
 from typing import Optional
 import fastapi
+from authlib.jose import JWTClaims
+from authlib.jose.errors import JoseError
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.security import HTTPBearer
 from .settings import SETTINGS
+from .core.introspection import introspection_response
 from .core.oauth import OAuth
+from .core.provisioning import BulkProvisioner
+from .core.provisioning import DuplexStreamingResponse
+from .core.replay import ReplayCache
+from .core.http import HTTPClientPool
+from .core.issuer import TokenIssuer
+from .core.jwks import JWKSManager
+from .core.metadata import MetadataCache
+from .core.metrics import FlowMetrics
+from .core.resilience import ProviderGuards
+from .core.security import TokenVerifier
+from .core.sessions import ServerSessionMiddleware
+from .core.tokens import TokenRefresher
+from .core.userinfo import UserInfoCache
+from .interfaces.cache import ICacheBackend
+from .interfaces.logics import IAuthLogic
+from .interfaces.session import ISessionBackend
+from .interfaces.tokens import ITokenStore
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import JSONResponse
+from starlette.responses import PlainTextResponse
+from starlette.routing import BaseRoute
+
+if typing.TYPE_CHECKING:
+    from .core.oauth import StarletteOAuth1App, StarletteOAuth2App
+    from .interfaces.provider import AuthenticationMethod
 
 SINGLETON = Optional
 
@@ -10,16 +42,76 @@ SINGLETON = Optional
 class OAuthApp:
     __instance: SINGLETON["OAuthApp"] = None
 
-    def __init__(self, app: fastapi.FastAPI, secret_key: str) -> None:
+    def __init__(
+        self,
+        app: fastapi.FastAPI,
+        secret_key: str,
+        token_verifier: Optional[TokenVerifier] = None,
+        jwks: Optional[JWKSManager] = None,
+        metadata_cache: Optional[MetadataCache] = None,
+        http: Optional[HTTPClientPool] = None,
+        session_backend: Optional[ISessionBackend] = None,
+        userinfo_cache: Optional[UserInfoCache] = None,
+        metrics: Optional[FlowMetrics] = None,
+        token_store: Optional[ITokenStore] = None,
+        guards: Optional[ProviderGuards] = None,
+        token_issuer: Optional[TokenIssuer] = None,
+        cache_backend: Optional[ICacheBackend] = None,
+        replay_cache: Optional[ReplayCache] = None,
+    ) -> None:
         self.__app: fastapi.FastAPI = app
-        self.__oauth: OAuth = OAuth()
-        self.__instance = self
-        self.app.add_middleware(
-            SessionMiddleware,
-            secret_key=secret_key,
+        # the default caches of the provider metadata, key sets and userinfo
+        # all go through ``cache_backend`` (if any) to be shared by workers.
+        self.__oauth: OAuth = OAuth(
+            jwks=jwks,
+            metadata_cache=metadata_cache,
+            http=http,
+            state_secret=secret_key,
+            cache_backend=cache_backend,
+            replay_cache=replay_cache,
+        )
+        self.__token_issuer: Optional[TokenIssuer] = token_issuer
+        if token_verifier is None and token_issuer is not None:
+            # the issued tokens are verified with the key ring's keys.
+            token_verifier = TokenVerifier(
+                key=token_issuer.verification_key,
+                algorithms=token_issuer.keyring.algorithms,
+                claims_options=token_issuer.claims_options(),
+            )
+        # tokens are verified with the same secret key by default, as it is
+        # the key which is used for signing them in the examples.
+        self.__token_verifier: TokenVerifier = token_verifier or TokenVerifier(
+            key=secret_key
+        )
+        self.__userinfo_cache: UserInfoCache = userinfo_cache or UserInfoCache(
+            backend=cache_backend
         )
+        self.__metrics: FlowMetrics = metrics or FlowMetrics()
+        self.__guards: ProviderGuards = guards or ProviderGuards()
+        self.__methods: dict[str, "AuthenticationMethod"] = {}
+        # the providers' tokens are only kept when there is a store for them.
+        self.__token_store: Optional[ITokenStore] = token_store
+        self.__token_refresher: Optional[TokenRefresher] = (
+            TokenRefresher(token_store, resolve=self.get_provider_client)
+            if token_store is not None
+            else None
+        )
+        self.__included_routes: set[int] = set()
+        self.__instance = self
+        if session_backend is None:
+            self.app.add_middleware(
+                SessionMiddleware,
+                secret_key=secret_key,
+            )
+        else:
+            self.app.add_middleware(
+                ServerSessionMiddleware,
+                backend=session_backend,
+            )
+        self.app.add_event_handler("startup", self.startup)
+        self.app.add_event_handler("shutdown", self.shutdown)
 
-    def __new__(cls, app: fastapi.FastAPI, secret_key: str) -> "OAuthApp":
+    def __new__(cls, *args: typing.Any, **kwargs: typing.Any) -> "OAuthApp":
         if cls.__instance:
             return cls.__instance
         return super().__new__(cls)
@@ -31,3 +123,227 @@ class OAuthApp:
     @property
     def oauth(self) -> OAuth:
         return self.__oauth
+
+    @property
+    def http(self) -> HTTPClientPool:
+        return self.oauth.http
+
+    @property
+    def jwks(self) -> JWKSManager:
+        return self.oauth.jwks
+
+    @property
+    def metadata_cache(self) -> MetadataCache:
+        return self.oauth.metadata_cache
+
+    @property
+    def userinfo_cache(self) -> UserInfoCache:
+        return self.__userinfo_cache
+
+    @property
+    def metrics(self) -> FlowMetrics:
+        return self.__metrics
+
+    @property
+    def guards(self) -> ProviderGuards:
+        return self.__guards
+
+    @property
+    def token_store(self) -> Optional[ITokenStore]:
+        return self.__token_store
+
+    @property
+    def token_refresher(self) -> Optional[TokenRefresher]:
+        return self.__token_refresher
+
+    @property
+    def token_verifier(self) -> TokenVerifier:
+        return self.__token_verifier
+
+    @property
+    def token_issuer(self) -> Optional[TokenIssuer]:
+        return self.__token_issuer
+
+    def include_router(self, router: fastapi.APIRouter) -> None:
+        # authentication methods share their router, so only the routes which
+        # are not included yet are added to the app.
+        routes: list[BaseRoute] = [
+            route for route in router.routes if id(route) not in self.__included_routes
+        ]
+        if not routes:
+            return
+        self.__included_routes.update(id(route) for route in routes)
+        included: fastapi.APIRouter = fastapi.APIRouter()
+        included.routes.extend(routes)
+        self.app.include_router(included)
+
+    def add_method(self, method: "AuthenticationMethod") -> None:
+        self.__methods[method.name] = method
+
+    async def get_provider_client(
+        self, provider: str
+    ) -> "StarletteOAuth1App | StarletteOAuth2App":
+        # ``provider`` is a method's name, or a namespace of it (``name:tenant``)
+        method: Optional["AuthenticationMethod"] = self.__methods.get(
+            provider.partition(":")[0]
+        )
+        if method is None:
+            raise ValueError(provider + " auth method not registered")
+        return await method.get_named_client(provider)
+
+    async def get_provider_token(
+        self, provider: str, sub: str
+    ) -> Optional[dict[str, typing.Any]]:
+        # the user's (fresh) token of the provider, to call its api with.
+        if self.token_refresher is None:
+            raise RuntimeError("no token store is configured")
+        return await self.token_refresher.get_token(provider, sub)
+
+    def expose_metrics(
+        self,
+        path: str = "/metrics",
+        dependencies: Optional[typing.Sequence[fastapi.params.Depends]] = None,
+    ) -> None:
+        # serves the flow metrics in the prometheus text format, protect it
+        # with ``dependencies`` when the app is public.
+        async def metrics() -> PlainTextResponse:
+            return PlainTextResponse(
+                self.metrics.render(),
+                media_type="text/plain; version=0.0.4",
+            )
+
+        self.app.add_api_route(
+            path,
+            metrics,
+            methods=["GET"],
+            dependencies=dependencies,
+            include_in_schema=False,
+        )
+
+    def expose_jwks(self, path: str = "/.well-known/jwks.json") -> None:
+        # publishes the public keys of the token issuer's key ring.
+        if self.token_issuer is None:
+            raise RuntimeError("no token issuer is configured")
+        keyring = self.token_issuer.keyring
+
+        async def jwks() -> JSONResponse:
+            return JSONResponse(
+                keyring.jwks(), headers={"Cache-Control": "public, max-age=300"}
+            )
+
+        self.app.add_api_route(path, jwks, methods=["GET"], include_in_schema=False)
+
+    def expose_logout(self, path: str = "/logout") -> None:
+        # revokes the bearer token of the request and drops its session.
+        bearer: HTTPBearer = HTTPBearer()
+
+        async def logout(
+            request: fastapi.Request,
+            credentials: HTTPAuthorizationCredentials = fastapi.Depends(bearer),
+        ) -> fastapi.Response:
+            try:
+                await self.token_verifier.revoke(credentials.credentials)
+            except (JoseError, ValueError) as error:
+                raise self.token_verifier.unauthorized(error)
+            request.session.clear()
+            return fastapi.Response(status_code=fastapi.status.HTTP_204_NO_CONTENT)
+
+        self.app.add_api_route(
+            path,
+            logout,
+            methods=["POST"],
+            status_code=fastapi.status.HTTP_204_NO_CONTENT,
+            response_class=fastapi.Response,
+        )
+
+    def expose_introspection(
+        self,
+        dependencies: typing.Sequence[fastapi.params.Depends],
+        path: str = "/introspect",
+    ) -> None:
+        # tells whether a token is active and its claims (RFC 7662), so the
+        # services which don't hold the keys can check the tokens with an
+        # ``IntrospectionClient``. The endpoint must only answer the services,
+        # protect it with ``dependencies`` (e.g. a client credentials check).
+        async def introspect(request: fastapi.Request) -> JSONResponse:
+            form: dict[str, list[str]] = urllib.parse.parse_qs(
+                (await request.body()).decode()
+            )
+            tokens: list[str] = form.get("token", [])
+            if not tokens or not tokens[0]:
+                return JSONResponse(
+                    {"error": "invalid_request"},
+                    status_code=fastapi.status.HTTP_400_BAD_REQUEST,
+                )
+            claims: Optional[JWTClaims]
+            try:
+                claims = self.token_verifier.verify(tokens[0])
+            except (JoseError, ValueError):
+                claims = None
+            return JSONResponse(
+                introspection_response(claims),
+                headers={"Cache-Control": "no-store"},
+            )
+
+        self.app.add_api_route(
+            path,
+            introspect,
+            methods=["POST"],
+            dependencies=dependencies,
+            include_in_schema=False,
+        )
+
+    def expose_provisioning(
+        self,
+        logic: IAuthLogic,
+        provider: str,
+        dependencies: typing.Sequence[fastapi.params.Depends],
+        path: str = "/users/bulk",
+        batch_size: int = 500,
+        concurrency: int = 4,
+    ) -> None:
+        # imports the NDJSON userinfo records of the request body as users of
+        # ``provider`` through ``logic.signup_many``, the results are streamed
+        # back as NDJSON while the body is read. It creates users, so
+        # ``dependencies`` must protect it (e.g. an admin check).
+        provisioner: BulkProvisioner = BulkProvisioner(
+            logic, provider, batch_size=batch_size, concurrency=concurrency
+        )
+
+        async def provision(request: fastapi.Request) -> DuplexStreamingResponse:
+            return DuplexStreamingResponse(
+                provisioner.ndjson(request.stream()),
+                media_type="application/x-ndjson",
+            )
+
+        self.app.add_api_route(
+            path,
+            provision,
+            methods=["POST"],
+            dependencies=dependencies,
+            response_class=DuplexStreamingResponse,
+        )
+
+    def require_user(
+        self, auto_error: bool = True
+    ) -> typing.Callable[..., typing.Awaitable[Optional[JWTClaims]]]:
+        return self.token_verifier.dependency(auto_error=auto_error)
+
+    async def startup(self) -> None:
+        await asyncio.to_thread(self.token_verifier.revocations.load)
+        await self.token_verifier.revocations.start()
+        await self.oauth.prefetch_metadata()
+        await self.jwks.start()
+        if self.token_issuer is not None:
+            await self.token_issuer.keyring.start()
+        if self.token_refresher is not None:
+            await self.token_refresher.start()
+
+    async def shutdown(self) -> None:
+        if self.token_refresher is not None:
+            await self.token_refresher.stop()
+        if self.token_issuer is not None:
+            await self.token_issuer.keyring.stop()
+        await self.jwks.stop()
+        await self.token_verifier.revocations.stop()
+        await self.http.aclose()
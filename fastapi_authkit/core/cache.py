@@ -0,0 +1,86 @@
+import collections
+import time
+import typing
+
+from ..interfaces.cache import ICacheBackend
+
+K = typing.TypeVar("K")
+V = typing.TypeVar("V")
+
+
+class LRUCache(typing.Generic[K, V]):
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: typing.Optional[float] = None,
+        on_evict: typing.Optional[typing.Callable[[K, V], None]] = None,
+    ) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer.")
+        self.maxsize: int = maxsize
+        self.ttl: typing.Optional[float] = ttl
+        # called for the entries dropped by the cache itself (expired or least
+        # recently used), not for the ones explicitly popped or replaced.
+        self.on_evict: typing.Optional[typing.Callable[[K, V], None]] = on_evict
+        self.__data: collections.OrderedDict[
+            K, tuple[V, typing.Optional[float]]
+        ] = collections.OrderedDict()
+
+    def get(self, key: K, default: typing.Optional[V] = None) -> typing.Optional[V]:
+        item = self.__data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self.__data[key]
+            self.__evicted(key, value)
+            return default
+        self.__data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, expires_at: typing.Optional[float] = None) -> None:
+        # ``expires_at`` is an absolute unix timestamp, when it is not given
+        # the default ``ttl`` of the cache (if any) will be applied.
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        self.__data[key] = (value, expires_at)
+        self.__data.move_to_end(key)
+        while len(self.__data) > self.maxsize:
+            evicted_key, (evicted, _) = self.__data.popitem(last=False)
+            self.__evicted(evicted_key, evicted)
+
+    def __evicted(self, key: K, value: V) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def pop(self, key: K, default: typing.Optional[V] = None) -> typing.Optional[V]:
+        item = self.__data.pop(key, None)
+        if item is None:
+            return default
+        return item[0]
+
+    def clear(self) -> None:
+        self.__data.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key) is not None  # type: ignore[arg-type]
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+
+class MemoryCacheBackend(ICacheBackend):
+    # the default backend, each process has its own.
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.cache: LRUCache[str, bytes] = LRUCache(maxsize=maxsize)
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: typing.Optional[float] = None) -> None:
+        self.cache.set(
+            key, value, expires_at=time.time() + ttl if ttl is not None else None
+        )
+
+    def delete(self, key: str) -> None:
+        self.cache.pop(key)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import typing
+
+from ..interfaces.database import IDatabaseDriver
+from ..interfaces.database import Row
+
+
+class SQLiteDriver(IDatabaseDriver):
+    # a single connection reused by every call, sqlite keeps the prepared
+    # statements of the last ``cached_statements`` queries on it.
+    def __init__(
+        self,
+        path: str | os.PathLike[str] = "authkit.sqlite3",
+        cached_statements: int = 256,
+    ) -> None:
+        self.__lock: threading.Lock = threading.Lock()
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=cached_statements,
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+    def __execute(self, sql: str, parameters: typing.Sequence[typing.Any]) -> None:
+        with self.__lock:
+            self.connection.execute(sql, parameters)
+
+    def __executemany(
+        self, sql: str, parameters: typing.Iterable[typing.Sequence[typing.Any]]
+    ) -> None:
+        with self.__lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany(sql, parameters)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def __fetchone(
+        self, sql: str, parameters: typing.Sequence[typing.Any]
+    ) -> typing.Optional[Row]:
+        with self.__lock:
+            cursor: sqlite3.Cursor = self.connection.execute(sql, parameters)
+            try:
+                return cursor.fetchone()
+            finally:
+                # resets the statement, which ends an ``INSERT .. RETURNING``.
+                cursor.close()
+
+    def __fetchall(
+        self, sql: str, parameters: typing.Sequence[typing.Any]
+    ) -> list[Row]:
+        with self.__lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def __executescript(self, script: str) -> None:
+        with self.__lock:
+            self.connection.executescript(script)
+
+    async def execute(
+        self, sql: str, parameters: typing.Sequence[typing.Any] = ()
+    ) -> None:
+        await asyncio.to_thread(self.__execute, sql, parameters)
+
+    async def executemany(
+        self, sql: str, parameters: typing.Iterable[typing.Sequence[typing.Any]]
+    ) -> None:
+        await asyncio.to_thread(self.__executemany, sql, parameters)
+
+    async def fetchone(
+        self, sql: str, parameters: typing.Sequence[typing.Any] = ()
+    ) -> typing.Optional[Row]:
+        return await asyncio.to_thread(self.__fetchone, sql, parameters)
+
+    async def fetchall(
+        self, sql: str, parameters: typing.Sequence[typing.Any] = ()
+    ) -> list[Row]:
+        return await asyncio.to_thread(self.__fetchall, sql, parameters)
+
+    async def executescript(self, script: str) -> None:
+        await asyncio.to_thread(self.__executescript, script)
+
+    async def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,87 @@
+import typing
+
+import httpx
+
+TimeoutTypes = typing.Union[float, httpx.Timeout, None]
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    # authlib opens and closes a client for every token exchange and api
+    # call, so the transport handed to those clients only delegates to the
+    # pooled one and closing them never tears down the shared connections.
+    def __init__(self, pool: "HTTPClientPool") -> None:
+        self.pool: HTTPClientPool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.pool.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HTTPClientPool:
+    def __init__(
+        self,
+        max_connections: typing.Optional[int] = 100,
+        max_keepalive_connections: typing.Optional[int] = 20,
+        keepalive_expiry: typing.Optional[float] = 30.0,
+        http2: bool = False,
+        timeout: TimeoutTypes = 10.0,
+        timeouts: typing.Optional[dict[str, TimeoutTypes]] = None,
+        transport: typing.Optional[httpx.AsyncBaseTransport] = None,
+        **transport_kwargs: typing.Any,
+    ) -> None:
+        self.limits: httpx.Limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2: bool = http2
+        self.timeout: httpx.Timeout = httpx.Timeout(timeout)
+        self.timeouts: dict[str, httpx.Timeout] = {
+            name: httpx.Timeout(value) for name, value in (timeouts or {}).items()
+        }
+        self.transport_kwargs: dict[str, typing.Any] = transport_kwargs
+        self.shared_transport: SharedTransport = SharedTransport(self)
+        # a given transport (e.g. ``httpx.ASGITransport`` of a stub provider)
+        # replaces the pooled one.
+        self.__transport: typing.Optional[httpx.AsyncBaseTransport] = transport
+        self.__owns_transport: bool = transport is None
+        self.__client: typing.Optional[httpx.AsyncClient] = None
+
+    @property
+    def transport(self) -> httpx.AsyncBaseTransport:
+        if self.__transport is None:
+            self.__transport = httpx.AsyncHTTPTransport(
+                limits=self.limits,
+                http2=self.http2,
+                **self.transport_kwargs,
+            )
+        return self.__transport
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self.__client is None:
+            self.__client = httpx.AsyncClient(
+                transport=self.shared_transport,
+                timeout=self.timeout,
+            )
+        return self.__client
+
+    def get_timeout(self, name: str) -> httpx.Timeout:
+        return self.timeouts.get(name, self.timeout)
+
+    def client_kwargs(self, name: str) -> dict[str, typing.Any]:
+        return {
+            "transport": self.shared_transport,
+            "timeout": self.get_timeout(name),
+        }
+
+    async def aclose(self) -> None:
+        if self.__client is not None:
+            client, self.__client = self.__client, None
+            await client.aclose()
+        # a given transport belongs to its owner, and serves the next uses.
+        if self.__transport is not None and self.__owns_transport:
+            transport, self.__transport = self.__transport, None
+            await transport.aclose()
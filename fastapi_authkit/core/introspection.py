@@ -0,0 +1,125 @@
+import hashlib
+import time
+import typing
+
+import httpx
+
+from .cache import LRUCache
+from .http import HTTPClientPool
+from .singleflight import SingleFlight
+
+
+class IntrospectionClient:
+    # asks an introspection endpoint (RFC 7662, see ``OAuthApp
+    # .expose_introspection``) whether a token is active, for the services
+    # which don't hold the signing keys. Active results are cached until the
+    # token expires, but no longer than ``max_ttl`` which bounds how long a
+    # revoked token is still seen as active, inactive ones for
+    # ``negative_ttl``. Concurrent introspections of a token share a single
+    # request, made through the pooled connections of ``http``.
+    def __init__(
+        self,
+        url: str,
+        auth: typing.Optional[httpx.Auth | tuple[str, str]] = None,
+        client: typing.Optional[httpx.AsyncClient] = None,
+        negative_ttl: float = 30,
+        max_ttl: float = 300,
+        maxsize: int = 10000,
+        http: typing.Optional[HTTPClientPool] = None,
+    ) -> None:
+        self.url: str = url
+        self.auth: typing.Optional[httpx.Auth | tuple[str, str]] = auth
+        self.client: typing.Optional[httpx.AsyncClient] = client
+        # a pool of its own unless it's given one (e.g. ``OAuthApp.http``).
+        self.http: HTTPClientPool = http or HTTPClientPool()
+        self.__owns_http: bool = http is None
+        self.negative_ttl: float = negative_ttl
+        self.max_ttl: float = max_ttl
+        self.cache: LRUCache[bytes, dict[str, typing.Any]] = LRUCache(maxsize=maxsize)
+        self.__inflight: SingleFlight[dict[str, typing.Any]] = SingleFlight()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    async def fetch(self, token: str) -> dict[str, typing.Any]:
+        data: dict[str, str] = {"token": token, "token_type_hint": "access_token"}
+        kwargs: dict[str, typing.Any] = {"auth": self.auth} if self.auth else {}
+        client: httpx.AsyncClient = self.client or self.http.client
+        resp: httpx.Response = await client.post(self.url, data=data, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+
+    def expires_at(self, result: dict[str, typing.Any]) -> float:
+        now: float = time.time()
+        if not result.get("active"):
+            return now + self.negative_ttl
+        # a token without ``exp`` is still only cached for ``max_ttl``.
+        if result.get("exp") is None:
+            return now + self.max_ttl
+        return min(float(result["exp"]), now + self.max_ttl)
+
+    async def __introspect(self, token: str, digest: bytes) -> dict[str, typing.Any]:
+        result: dict[str, typing.Any] = await self.fetch(token)
+        # failures (unreachable endpoint, 5xx) are not cached.
+        self.cache.set(digest, result, expires_at=self.expires_at(result))
+        return result
+
+    async def introspect(self, token: str) -> dict[str, typing.Any]:
+        # the token is only known by its digest, in the cache and in flight.
+        digest: bytes = self.digest(token)
+        result: typing.Optional[dict[str, typing.Any]] = self.cache.get(digest)
+        if result is not None:
+            return result
+        result, _ = await self.__inflight.do(
+            digest, lambda: self.__introspect(token, digest)
+        )
+        return result
+
+    async def aclose(self) -> None:
+        if self.__owns_http:
+            await self.http.aclose()
+
+    def dependency(
+        self, auto_error: bool = True
+    ) -> typing.Callable[..., typing.Awaitable[typing.Optional[dict[str, typing.Any]]]]:
+        # the introspection result of an active bearer token, like
+        # ``TokenVerifier.dependency`` does with the claims.
+        import fastapi
+        from fastapi.security import HTTPAuthorizationCredentials
+        from fastapi.security import HTTPBearer
+
+        from .security import TokenVerifier
+
+        bearer: HTTPBearer = HTTPBearer(auto_error=auto_error)
+
+        async def require_user(
+            credentials: typing.Optional[
+                HTTPAuthorizationCredentials
+            ] = fastapi.Depends(bearer),
+        ) -> typing.Optional[dict[str, typing.Any]]:
+            if credentials is None:
+                return None
+            result: dict[str, typing.Any] = await self.introspect(
+                credentials.credentials
+            )
+            if result.get("active"):
+                return result
+            if not auto_error:
+                return None
+            raise TokenVerifier.unauthorized(ValueError("The token is not active."))
+
+        return require_user
+
+
+def introspection_response(
+    claims: typing.Optional[dict[str, typing.Any]]
+) -> dict[str, typing.Any]:
+    # the claims of an active token, with the registered members of RFC 7662.
+    # ``active`` is set last, no claim can override it.
+    if claims is None:
+        return {"active": False}
+    response: dict[str, typing.Any] = {"token_type": "Bearer"}
+    response.update(claims)
+    response["active"] = True
+    return response
@@ -0,0 +1,357 @@
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import secrets
+import time
+import typing
+
+from authlib.common.encoding import urlsafe_b64encode
+from authlib.jose import JsonWebKey
+from authlib.jose import JsonWebSignature
+from authlib.jose.rfc7517 import Key
+
+if typing.TYPE_CHECKING:
+    # the interfaces pull in authlib's starlette integration.
+    from ..interfaces.logics import Token
+
+log = logging.getLogger(__name__)
+
+# the key type and size (or curve) generated for each algorithm.
+KEY_TYPES: dict[str, tuple[str, typing.Any]] = {
+    "HS256": ("oct", 256),
+    "RS256": ("RSA", 2048),
+    "EdDSA": ("OKP", "Ed25519"),
+}
+
+
+class SigningKey:
+    # the key is parsed and the header encoded once, signing a token only
+    # encodes the payload and signs it.
+    def __init__(
+        self,
+        key: typing.Any,
+        alg: str = "RS256",
+        kid: typing.Optional[str] = None,
+        created_at: typing.Optional[float] = None,
+    ) -> None:
+        self.alg: str = alg
+        self.algorithm: typing.Any = JsonWebSignature.ALGORITHMS_REGISTRY[alg]
+        self.key: Key = self.algorithm.prepare_key(key)
+        self.kid: str = kid or self.key.thumbprint()
+        self.created_at: float = created_at or time.time()
+        self.__header: bytes = urlsafe_b64encode(
+            json.dumps(
+                {"alg": alg, "kid": self.kid, "typ": "JWT"}, separators=(",", ":")
+            ).encode()
+        )
+
+    @classmethod
+    def generate(cls, alg: str = "RS256") -> "SigningKey":
+        kty, size = KEY_TYPES[alg]
+        return cls(JsonWebKey.generate_key(kty, size, is_private=True), alg)
+
+    @property
+    def public(self) -> bool:
+        # symmetric keys are never published.
+        return self.key.kty != "oct"
+
+    def public_jwk(self) -> dict[str, typing.Any]:
+        return {
+            **self.key.as_dict(is_private=False),
+            "kid": self.kid,
+            "alg": self.alg,
+            "use": "sig",
+        }
+
+    def sign(self, payload: typing.Mapping[str, typing.Any]) -> str:
+        signing_input: bytes = (
+            self.__header
+            + b"."
+            + urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        )
+        signature: bytes = self.algorithm.sign(signing_input, self.key)
+        return (signing_input + b"." + urlsafe_b64encode(signature)).decode()
+
+
+class KeyRing:
+    # signs with the newest key, and keeps the previous ones for
+    # ``retention`` seconds after they are replaced, so the tokens they
+    # signed still verify. Keep it longer than the tokens' lifetime. With a
+    # ``path``, the keys are kept in that file (private keys, mode 0600) and
+    # shared by the workers: the first one due rotates the key there, the
+    # others adopt it.
+    def __init__(
+        self,
+        alg: str = "RS256",
+        keys: typing.Optional[typing.Iterable[SigningKey]] = None,
+        rotation_interval: typing.Optional[float] = 7 * 86400,
+        retention: float = 86400,
+        path: typing.Optional[str | os.PathLike[str]] = None,
+        workers: typing.Optional[int] = None,
+    ) -> None:
+        self.alg: str = alg
+        self.rotation_interval: typing.Optional[float] = rotation_interval
+        self.retention: float = retention
+        self.path: typing.Optional[str | os.PathLike[str]] = path
+        # the workers of the server (``WEB_CONCURRENCY`` for uvicorn and
+        # gunicorn), each one would sign with keys unknown to the others.
+        self.workers: int = (
+            workers
+            if workers is not None
+            else int(os.environ.get("WEB_CONCURRENCY", "1"))
+        )
+        if (
+            self.workers > 1
+            and path is None
+            and (not keys or rotation_interval is not None)
+        ):
+            raise RuntimeError(
+                f"{self.workers} workers can't share the keys generated by each"
+                " of them, give the key ring a path (or fixed keys without"
+                " rotation)."
+            )
+        self.__keys: list[SigningKey] = sorted(
+            keys or (), key=lambda key: key.created_at
+        )
+        self.__retired_at: dict[str, float] = {}
+        self.__rotator: typing.Optional[asyncio.Task[None]] = None
+        self.__loaded_at: float = 0
+        self.__by_kid: dict[str, SigningKey] = {key.kid: key for key in self.__keys}
+        if path is not None:
+            self.sync(rotate=False)
+        elif not self.__keys:
+            self.__keys.append(SigningKey.generate(alg))
+            self.__by_kid[self.current.kid] = self.current
+
+    @property
+    def current(self) -> SigningKey:
+        return self.__keys[-1]
+
+    @property
+    def keys(self) -> list[SigningKey]:
+        return list(self.__keys)
+
+    @property
+    def algorithms(self) -> list[str]:
+        return sorted({key.alg for key in self.__keys} | {self.alg})
+
+    def find(self, kid: typing.Optional[str]) -> typing.Optional[SigningKey]:
+        if kid is None:
+            return None
+        key: typing.Optional[SigningKey] = self.__by_kid.get(kid)
+        if (
+            key is None
+            and self.path is not None
+            and time.time() >= (self.__loaded_at + 1)
+        ):
+            # another worker may have rotated the key, the file is read at
+            # most once a second for the unknown kids.
+            self.load()
+            key = self.__by_kid.get(kid)
+        return key
+
+    def add(self, key: SigningKey) -> None:
+        # the new key signs from now on.
+        self.__retired_at[self.current.kid] = time.time()
+        self.__keys.append(key)
+        self.__by_kid[key.kid] = key
+
+    def rotate(self) -> SigningKey:
+        key: SigningKey = SigningKey.generate(self.alg)
+        self.add(key)
+        self.prune()
+        if self.path is not None:
+            with self.__locked():
+                self.__write()
+        return key
+
+    def prune(self) -> None:
+        now: float = time.time()
+        for key in self.__keys[:-1]:
+            if self.__retired_at.get(key.kid, now) + self.retention <= now:
+                self.__keys.remove(key)
+                self.__by_kid.pop(key.kid, None)
+                self.__retired_at.pop(key.kid, None)
+
+    def jwks(self) -> dict[str, typing.Any]:
+        return {"keys": [key.public_jwk() for key in self.__keys if key.public]}
+
+    @contextlib.contextmanager
+    def __locked(self) -> typing.Iterator[None]:
+        # the key file itself is replaced on every write.
+        assert self.path is not None
+        with open(os.fspath(self.path) + ".lock", "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def __read(self) -> bool:
+        # called with the lock held, adopts the keys of the file if any.
+        assert self.path is not None
+        try:
+            with open(self.path) as file:
+                entries: list[dict[str, typing.Any]] = json.load(file)["keys"]
+        except FileNotFoundError:
+            return False
+        keys: list[SigningKey] = [
+            SigningKey(entry["jwk"], entry["alg"], entry["kid"], entry["created_at"])
+            for entry in entries
+        ]
+        self.__keys = sorted(keys, key=lambda key: key.created_at)
+        self.__retired_at = {
+            entry["kid"]: entry["retired_at"]
+            for entry in entries
+            if entry.get("retired_at") is not None
+        }
+        self.__by_kid = {key.kid: key for key in self.__keys}
+        self.__loaded_at = time.time()
+        return bool(self.__keys)
+
+    def __write(self) -> None:
+        # called with the lock held, the file is replaced at once so the
+        # readers never see a partial one.
+        assert self.path is not None
+        entries: list[dict[str, typing.Any]] = [
+            {
+                "jwk": key.key.as_dict(is_private=True),
+                "alg": key.alg,
+                "kid": key.kid,
+                "created_at": key.created_at,
+                "retired_at": self.__retired_at.get(key.kid),
+            }
+            for key in self.__keys
+        ]
+        written: str = os.fspath(self.path) + ".tmp"
+        fd: int = os.open(written, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w") as file:
+            json.dump({"keys": entries}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(written, self.path)
+
+    def load(self) -> None:
+        with self.__locked():
+            self.__read()
+
+    def sync(self, rotate: bool = True) -> typing.Optional[SigningKey]:
+        # adopts the keys of the file, and generates (and writes) a key if
+        # there is none yet or, when rotating, the current one is due. The
+        # lock is held throughout so only one worker rotates. Returns the
+        # generated key, if any.
+        with self.__locked():
+            if not self.__read() and self.__keys:
+                # the keys given to the first worker are the initial ones.
+                self.__write()
+                return None
+            key: typing.Optional[SigningKey] = None
+            if not self.__keys:
+                key = SigningKey.generate(self.alg)
+                self.__keys.append(key)
+                self.__by_kid[key.kid] = key
+            elif (
+                rotate
+                and self.rotation_interval is not None
+                and self.current.created_at + self.rotation_interval <= time.time()
+            ):
+                key = SigningKey.generate(self.alg)
+                self.add(key)
+                self.prune()
+            if key is not None:
+                self.__write()
+            return key
+
+    async def __rotate_forever(self) -> None:
+        assert self.rotation_interval is not None
+        while True:
+            due: float = self.current.created_at + self.rotation_interval
+            await asyncio.sleep(max(due - time.time(), 0))
+            key: typing.Optional[SigningKey]
+            try:
+                # generating a key (RSA especially) must not block the loop.
+                if self.path is not None:
+                    key = await asyncio.to_thread(self.sync)
+                else:
+                    key = await asyncio.to_thread(SigningKey.generate, self.alg)
+                    self.add(key)
+                    self.prune()
+            except Exception:
+                log.exception("failed to rotate the %s signing key", self.alg)
+                await asyncio.sleep(60)
+                continue
+            if key is not None:
+                log.info("rotated the signing key to %s", key.kid)
+
+    async def start(self) -> None:
+        if self.rotation_interval is not None and self.__rotator is None:
+            self.__rotator = asyncio.ensure_future(self.__rotate_forever())
+
+    async def stop(self) -> None:
+        if self.__rotator is not None:
+            self.__rotator.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__rotator
+            self.__rotator = None
+
+
+class TokenIssuer:
+    def __init__(
+        self,
+        keyring: typing.Optional[KeyRing] = None,
+        issuer: typing.Optional[str] = None,
+        audience: typing.Optional[str] = None,
+        lifetime: float = 3600,
+    ) -> None:
+        self.keyring: KeyRing = keyring or KeyRing()
+        self.issuer: typing.Optional[str] = issuer
+        self.audience: typing.Optional[str] = audience
+        self.lifetime: float = lifetime
+
+    def issue(
+        self,
+        claims: typing.Mapping[str, typing.Any],
+        lifetime: typing.Optional[float] = None,
+    ) -> str:
+        # the registered claims are set over the given ones, which may be a
+        # whole userinfo with an ``iss`` or ``exp`` of the provider's.
+        now: int = int(time.time())
+        payload: dict[str, typing.Any] = dict(claims)
+        payload.update(
+            iat=now,
+            exp=now + int(lifetime or self.lifetime),
+            jti=secrets.token_urlsafe(16),
+        )
+        if self.issuer is not None:
+            payload["iss"] = self.issuer
+        if self.audience is not None:
+            payload["aud"] = self.audience
+        return self.keyring.current.sign(payload)
+
+    def token(
+        self,
+        claims: typing.Mapping[str, typing.Any],
+        lifetime: typing.Optional[float] = None,
+    ) -> "Token":
+        # what ``IAuthLogic.login`` returns.
+        return typing.cast("Token", self.issue(claims, lifetime))
+
+    def claims_options(self) -> dict[str, typing.Any]:
+        options: dict[str, typing.Any] = {"exp": {"essential": True}}
+        if self.issuer is not None:
+            options["iss"] = {"essential": True, "value": self.issuer}
+        if self.audience is not None:
+            options["aud"] = {"essential": True, "value": self.audience}
+        return options
+
+    def verification_key(
+        self, header: typing.Mapping[str, typing.Any], payload: typing.Any
+    ) -> Key:
+        # the key argument of ``jwt.decode``, which picks it by the ``kid``.
+        key: typing.Optional[SigningKey] = self.keyring.find(header.get("kid"))
+        if key is None:
+            raise ValueError("unknown signing key " + repr(header.get("kid")))
+        return key.key
@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import typing
+
+import httpx
+from authlib.jose import JsonWebKey
+from authlib.jose.errors import JoseError
+from authlib.jose.rfc7517 import Key
+
+from ..interfaces.cache import ICacheBackend
+from .http import HTTPClientPool
+from .singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+
+class UnknownKeyError(JoseError):
+    # the token's ``kid`` isn't in the provider's key set, a client error
+    # like any other token which doesn't verify.
+    error = "unknown_key"
+
+
+class KeySetEntry:
+    def __init__(
+        self,
+        keys: dict[typing.Optional[str], Key],
+        fetched_at: typing.Optional[float] = None,
+    ) -> None:
+        self.keys: dict[typing.Optional[str], Key] = keys
+        self.fetched_at: float = (
+            fetched_at if fetched_at is not None else time.monotonic()
+        )
+
+    def find(self, kid: typing.Optional[str]) -> typing.Optional[Key]:
+        key: typing.Optional[Key] = self.keys.get(kid)
+        if key is None and kid is None and len(self.keys) == 1:
+            # tokens without a ``kid`` header can only be matched to a set
+            # that holds a single key.
+            return next(iter(self.keys.values()))
+        return key
+
+
+class JWKSManager:
+    def __init__(
+        self,
+        refresh_interval: float = 3600,
+        min_refetch_interval: float = 60,
+        client: typing.Optional[httpx.AsyncClient] = None,
+        backend: typing.Optional[ICacheBackend] = None,
+        http: typing.Optional[HTTPClientPool] = None,
+    ) -> None:
+        self.refresh_interval: float = refresh_interval
+        self.min_refetch_interval: float = min_refetch_interval
+        self.client: typing.Optional[httpx.AsyncClient] = client
+        # the pool's client is looked up on every fetch, as the pool replaces
+        # it once closed (e.g. by a previous lifespan of the app).
+        self.http: typing.Optional[HTTPClientPool] = http
+        # a cache shared with the other workers, so a key set is fetched once
+        # per host instead of once per worker.
+        self.backend: typing.Optional[ICacheBackend] = backend
+        self.__uris: set[str] = set()
+        self.__sets: dict[str, KeySetEntry] = {}
+        self.__inflight: SingleFlight[KeySetEntry] = SingleFlight()
+        self.__refresher: typing.Optional[asyncio.Task[None]] = None
+
+    def register(self, uri: str) -> None:
+        self.__uris.add(uri)
+
+    def forget(self, uri: str) -> None:
+        # stop refreshing a key set nobody uses anymore.
+        self.__uris.discard(uri)
+        self.__sets.pop(uri, None)
+
+    @staticmethod
+    def parse(jwk_set: dict[str, typing.Any]) -> dict[typing.Optional[str], Key]:
+        keys: dict[typing.Optional[str], Key] = {}
+        for raw in jwk_set.get("keys", []):
+            try:
+                key: Key = JsonWebKey.import_key(raw)
+            except (ValueError, KeyError) as error:
+                log.warning("skipping unsupported key %r: %s", raw.get("kid"), error)
+                continue
+            keys[key.kid] = key
+        return keys
+
+    async def fetch(self, uri: str) -> dict[str, typing.Any]:
+        client: typing.Optional[httpx.AsyncClient] = self.client or (
+            self.http.client if self.http is not None else None
+        )
+        if client is not None:
+            resp: httpx.Response = await client.get(uri)
+        else:
+            async with httpx.AsyncClient() as client:
+                resp = await client.get(uri)
+        resp.raise_for_status()
+        return resp.json()
+
+    def load_shared(self, uri: str) -> typing.Optional[KeySetEntry]:
+        # the key set another worker fetched, if it is newer than ours.
+        if self.backend is None:
+            return None
+        data: typing.Optional[bytes] = self.backend.get(f"jwks:{uri}")
+        if data is None:
+            return None
+        shared: dict[str, typing.Any] = json.loads(data)
+        age: float = time.time() - shared["fetched_at"]
+        current: typing.Optional[KeySetEntry] = self.__sets.get(uri)
+        if age >= self.refresh_interval or (
+            current is not None and age >= time.monotonic() - current.fetched_at
+        ):
+            return None
+        return KeySetEntry(self.parse(shared["jwks"]), time.monotonic() - age)
+
+    def store_shared(self, uri: str, jwk_set: dict[str, typing.Any]) -> None:
+        if self.backend is None:
+            return
+        shared: dict[str, typing.Any] = {"jwks": jwk_set, "fetched_at": time.time()}
+        self.backend.set(f"jwks:{uri}", json.dumps(shared).encode())
+
+    async def __load(
+        self, uri: str, kid: typing.Optional[str] = None, refetch: bool = False
+    ) -> KeySetEntry:
+        entry: typing.Optional[KeySetEntry] = self.load_shared(uri)
+        if refetch and entry is not None and entry.find(kid) is None:
+            # the shared copy doesn't know the kid either, it may have been
+            # fetched before the provider rotated its keys.
+            entry = None
+        if entry is None:
+            jwk_set: dict[str, typing.Any] = await self.fetch(uri)
+            entry = KeySetEntry(self.parse(jwk_set))
+            self.store_shared(uri, jwk_set)
+        self.__sets[uri] = entry
+        return entry
+
+    async def refresh(
+        self, uri: str, kid: typing.Optional[str] = None, refetch: bool = False
+    ) -> KeySetEntry:
+        # concurrent refreshes of the same uri share a single fetch. a
+        # refetch for an unknown ``kid`` only shares the ones for that kid.
+        self.register(uri)
+        entry, _ = await self.__inflight.do(
+            (uri, kid) if refetch else uri,
+            lambda: self.__load(uri, kid, refetch),
+        )
+        return entry
+
+    async def get_key(self, uri: str, kid: typing.Optional[str]) -> Key:
+        entry: typing.Optional[KeySetEntry] = self.__sets.get(uri)
+        if entry is None:
+            entry = await self.refresh(uri)
+
+        key: typing.Optional[Key] = entry.find(kid)
+        if key is not None:
+            return key
+
+        # unknown kid, the provider may have rotated its keys. refetch once,
+        # but never more often than ``min_refetch_interval``.
+        if time.monotonic() - entry.fetched_at >= self.min_refetch_interval:
+            entry = await self.refresh(uri, kid, refetch=True)
+            key = entry.find(kid)
+            if key is not None:
+                return key
+        raise UnknownKeyError(description=f"{kid} key not found in {uri}.")
+
+    async def prefetch(self) -> None:
+        uris: list[str] = [uri for uri in self.__uris if uri not in self.__sets]
+        results = await asyncio.gather(
+            *(self.refresh(uri) for uri in uris), return_exceptions=True
+        )
+        for uri, result in zip(uris, results):
+            if isinstance(result, Exception):
+                log.warning("failed to prefetch JWKS from %s: %s", uri, result)
+
+    async def __refresh_forever(self) -> None:
+        while True:
+            now: float = time.monotonic()
+            due: list[str] = [
+                uri
+                for uri, entry in self.__sets.items()
+                if now - entry.fetched_at >= self.refresh_interval
+            ]
+            results = await asyncio.gather(
+                *(self.refresh(uri) for uri in due), return_exceptions=True
+            )
+            for uri, result in zip(due, results):
+                if isinstance(result, Exception):
+                    log.warning("failed to refresh JWKS from %s: %s", uri, result)
+                    # keep serving the stale keys and retry on the next round,
+                    # unless the set was forgotten in the meantime.
+                    entry: typing.Optional[KeySetEntry] = self.__sets.get(uri)
+                    if entry is not None:
+                        entry.fetched_at = time.monotonic() - (
+                            self.refresh_interval - self.min_refetch_interval
+                        )
+
+            next_due: float = min(
+                (
+                    entry.fetched_at + self.refresh_interval
+                    for entry in self.__sets.values()
+                ),
+                default=time.monotonic() + self.refresh_interval,
+            )
+            await asyncio.sleep(max(next_due - time.monotonic(), 1))
+
+    async def start(self) -> None:
+        await self.prefetch()
+        if self.__refresher is None:
+            self.__refresher = asyncio.ensure_future(self.__refresh_forever())
+
+    async def stop(self) -> None:
+        if self.__refresher is not None:
+            self.__refresher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__refresher
+            self.__refresher = None
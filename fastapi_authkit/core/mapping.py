@@ -0,0 +1,161 @@
+import operator
+import typing
+
+from .oauth import UserInfoModel
+
+Payload = dict[str, typing.Any]
+Getter = typing.Callable[[Payload], typing.Any]
+
+
+class Const:
+    def __init__(self, value: typing.Any) -> None:
+        self.value: typing.Any = value
+
+
+class Claim:
+    MISSING: typing.Any = object()
+
+    def __init__(
+        self,
+        name: str,
+        default: typing.Any = MISSING,
+        convert: typing.Optional[typing.Callable[[typing.Any], typing.Any]] = None,
+    ) -> None:
+        self.name: str = name
+        self.default: typing.Any = default
+        self.convert: typing.Optional[
+            typing.Callable[[typing.Any], typing.Any]
+        ] = convert
+
+    def compile(self) -> Getter:
+        getter: Getter
+        if self.default is Claim.MISSING:
+            getter = operator.itemgetter(self.name)
+        else:
+            name, default = self.name, self.default
+            getter = lambda payload: payload.get(name, default)  # noqa: E731
+        if self.convert is None:
+            return getter
+        convert = self.convert
+        return lambda payload: convert(getter(payload))
+
+
+def optional_str(value: typing.Any) -> typing.Optional[str]:
+    return None if value is None else str(value)
+
+
+class UserInfoRecord:
+    # a lightweight userinfo for hot paths, it holds the same fields as
+    # ``UserInfoModel`` without any validation or pydantic overhead.
+    __slots__ = (*UserInfoModel.known_fields(), "extra")
+
+    def __init__(self, **values: typing.Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def dict(self) -> dict[str, typing.Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_model(self) -> UserInfoModel:
+        return UserInfoModel.construct(**self.dict())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(sub={self.sub!r}, name={self.name!r})"
+
+
+class UserInfoMapper:
+    def __init__(
+        self,
+        getters: tuple[tuple[str, Getter], ...],
+        constants: dict[str, typing.Any],
+        consumed: frozenset[str],
+        extra: typing.Literal["payload", "unknown"],
+        required: frozenset[str] = frozenset(),
+    ) -> None:
+        self.getters: tuple[tuple[str, Getter], ...] = getters
+        self.consumed: frozenset[str] = consumed
+        # the claims without a default, a payload lacking any can't be mapped.
+        self.required: frozenset[str] = required
+        self.extra: typing.Literal["payload", "unknown"] = extra
+        self.defaults: dict[str, typing.Any] = dict.fromkeys(
+            UserInfoModel.known_fields()
+        )
+        self.defaults.update(constants)
+
+    def extract(self, payload: Payload) -> dict[str, typing.Any]:
+        values: dict[str, typing.Any] = self.defaults.copy()
+        for name, getter in self.getters:
+            values[name] = getter(payload)
+        if self.extra == "payload":
+            values["extra"] = payload
+        else:
+            values["extra"] = {
+                key: value for key, value in payload.items() if key not in self.consumed
+            }
+        return values
+
+    def __call__(self, payload: Payload) -> UserInfoModel:
+        # validated like the models the providers built by hand: a whole
+        # payload is given as ``extra`` (and nested by the model), the unknown
+        # claims are given as they are. ``record`` skips the validation.
+        values: dict[str, typing.Any] = self.extract(payload)
+        extra: dict[str, typing.Any] = values.pop("extra")
+        if self.extra == "payload":
+            return UserInfoModel(**values, extra=extra)
+        return UserInfoModel(**{**extra, **values})
+
+    def record(self, payload: Payload) -> UserInfoRecord:
+        return UserInfoRecord(**self.extract(payload))
+
+
+class ClaimMapping:
+    def __init__(
+        self,
+        fields: dict[str, str | Claim | Const | Getter],
+        extra: typing.Literal["payload", "unknown"] = "payload",
+    ) -> None:
+        unknown: set[str] = set(fields) - UserInfoModel.known_fields()
+        if unknown:
+            raise ValueError(f"{', '.join(sorted(unknown))} are not userinfo fields.")
+        self.fields: dict[str, str | Claim | Const | Getter] = fields
+        self.extra: typing.Literal["payload", "unknown"] = extra
+
+    @classmethod
+    def standard(cls) -> "ClaimMapping":
+        # OIDC standard claims map one to one on the userinfo fields.
+        return cls(
+            {
+                name: Claim(
+                    name,
+                    default=Claim.MISSING if name == "sub" else None,
+                    convert=optional_str if name == "updated_at" else None,
+                )
+                for name in UserInfoModel.known_fields()
+            },
+            extra="unknown",
+        )
+
+    def compile(self) -> UserInfoMapper:
+        getters: list[tuple[str, Getter]] = []
+        constants: dict[str, typing.Any] = {}
+        consumed: set[str] = set()
+        required: set[str] = set()
+        for name, spec in self.fields.items():
+            if isinstance(spec, str):
+                spec = Claim(spec)
+            if isinstance(spec, Claim):
+                consumed.add(spec.name)
+                if spec.default is Claim.MISSING:
+                    required.add(spec.name)
+                getters.append((name, spec.compile()))
+            elif isinstance(spec, Const):
+                constants[name] = spec.value
+            else:
+                getters.append((name, spec))
+        return UserInfoMapper(
+            tuple(getters),
+            constants,
+            frozenset(consumed),
+            self.extra,
+            frozenset(required),
+        )
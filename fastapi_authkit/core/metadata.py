@@ -0,0 +1,160 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+import typing
+
+import httpx
+
+from ..interfaces.cache import ICacheBackend
+from .http import HTTPClientPool
+from .singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    def __init__(
+        self,
+        path: typing.Optional[str | os.PathLike[str]] = None,
+        ttl: float = 86400,
+        client: typing.Optional[httpx.AsyncClient] = None,
+        backend: typing.Optional[ICacheBackend] = None,
+        http: typing.Optional[HTTPClientPool] = None,
+    ) -> None:
+        self.path: typing.Optional[pathlib.Path] = pathlib.Path(path) if path else None
+        self.ttl: float = ttl
+        self.client: typing.Optional[httpx.AsyncClient] = client
+        # the pool's client is looked up on every fetch, as the pool replaces
+        # it once closed (e.g. by a previous lifespan of the app).
+        self.http: typing.Optional[HTTPClientPool] = http
+        # a cache shared with the other workers, so a document is fetched
+        # once per host instead of once per worker.
+        self.backend: typing.Optional[ICacheBackend] = backend
+        self.__entries: dict[str, dict[str, typing.Any]] = self.load()
+        self.__inflight: SingleFlight[dict[str, typing.Any]] = SingleFlight()
+
+    def load(self) -> dict[str, dict[str, typing.Any]]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with self.path.open() as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            log.warning("ignoring unreadable metadata cache %s: %s", self.path, error)
+            return {}
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        # write to a temporary file first so concurrent workers never read a
+        # partially written cache.
+        tmp: typing.Optional[str] = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name)
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.__entries, file)
+            os.replace(tmp, self.path)
+        except OSError as error:
+            log.warning("failed to write metadata cache %s: %s", self.path, error)
+            if tmp is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp)
+
+    def is_fresh(self, url: str) -> bool:
+        entry: typing.Optional[dict[str, typing.Any]] = self.__entries.get(url)
+        return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def forget(self, url: str) -> None:
+        # drop a document nobody uses anymore, the file follows on the next save.
+        self.__entries.pop(url, None)
+
+    async def fetch(self, url: str, headers: dict[str, str]) -> httpx.Response:
+        client: typing.Optional[httpx.AsyncClient] = self.client or (
+            self.http.client if self.http is not None else None
+        )
+        if client is not None:
+            return await client.get(url, headers=headers)
+        async with httpx.AsyncClient() as client:
+            return await client.get(url, headers=headers)
+
+    def load_shared(self, url: str) -> typing.Optional[dict[str, typing.Any]]:
+        if self.backend is None:
+            return None
+        data: typing.Optional[bytes] = self.backend.get(f"metadata:{url}")
+        return json.loads(data) if data is not None else None
+
+    def store_shared(self, url: str, entry: dict[str, typing.Any]) -> None:
+        if self.backend is not None:
+            self.backend.set(f"metadata:{url}", json.dumps(entry).encode())
+
+    async def __load(self, url: str) -> dict[str, typing.Any]:
+        entry: typing.Optional[dict[str, typing.Any]] = self.__entries.get(url)
+        shared: typing.Optional[dict[str, typing.Any]] = self.load_shared(url)
+        if shared is not None and (
+            entry is None or shared["fetched_at"] > entry["fetched_at"]
+        ):
+            # another worker fetched it more recently, when it is not fresh
+            # either its validators (or stale copy) are still worth using.
+            entry = self.__entries[url] = shared
+            if self.is_fresh(url):
+                return shared["metadata"]
+        headers: dict[str, str] = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            resp: httpx.Response = await self.fetch(url, headers)
+            if resp.status_code == httpx.codes.NOT_MODIFIED and entry:
+                entry["fetched_at"] = time.time()
+            else:
+                resp.raise_for_status()
+                entry = {
+                    "metadata": resp.json(),
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "fetched_at": time.time(),
+                }
+                self.__entries[url] = entry
+        except (httpx.HTTPError, ValueError) as error:
+            # the provider is unreachable, a stale copy is better than
+            # failing the login.
+            if entry is None:
+                raise
+            log.warning("using cached metadata of %s: %s", url, error)
+            return entry["metadata"]
+
+        self.store_shared(url, entry)
+        self.save()
+        return entry["metadata"]
+
+    async def refresh(self, url: str) -> dict[str, typing.Any]:
+        metadata, _ = await self.__inflight.do(url, lambda: self.__load(url))
+        return metadata
+
+    async def get(self, url: str) -> dict[str, typing.Any]:
+        if self.is_fresh(url):
+            return self.__entries[url]["metadata"]
+        return await self.refresh(url)
+
+    async def prefetch(
+        self, urls: typing.Iterable[str]
+    ) -> dict[str, dict[str, typing.Any]]:
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(
+            *(self.get(url) for url in urls), return_exceptions=True
+        )
+        metadata: dict[str, dict[str, typing.Any]] = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                log.warning("failed to prefetch metadata from %s: %s", url, result)
+                continue
+            metadata[url] = result
+        return metadata
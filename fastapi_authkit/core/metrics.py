@@ -0,0 +1,187 @@
+import bisect
+import contextlib
+import logging
+import time
+import typing
+
+import fastapi
+import httpx
+from authlib.jose.errors import JoseError
+
+from .oauth import MismatchingStateError
+from .oauth import OAuthError
+from .replay import ReplayedCallbackError
+from .resilience import ProviderUnavailable
+from ..interfaces.hooks import IFlowHook
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets: tuple[float, ...] = buckets
+        # the last count is for the observations above the largest bucket.
+        self.counts: list[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total: int = 0
+        result: list[tuple[str, int]] = []
+        for bound, count in zip((*map(repr, self.buckets), "+Inf"), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class FlowMetrics:
+    # the timings of each phase of the callback flow per provider, and the
+    # outcome of every callback: login, signup, rejected (no token from the
+    # auth logic), unavailable (failed fast, see ``ProviderGuards``),
+    # replayed (see ``ReplayCache``), client_error (any other 4xx),
+    # provider_error or error. Past ``max_providers`` providers the new ones
+    # are counted as ``other``, so the series can't grow without bound.
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        hooks: typing.Iterable[IFlowHook] = (),
+        max_providers: int = 64,
+    ) -> None:
+        self.buckets: tuple[float, ...] = buckets
+        self.hooks: list[IFlowHook] = list(hooks)
+        self.max_providers: int = max_providers
+        self.__providers: set[str] = set()
+        self.__durations: dict[tuple[str, str], Histogram] = {}
+        self.__outcomes: dict[tuple[str, str], int] = {}
+
+    def add_hook(self, hook: IFlowHook) -> None:
+        self.hooks.append(hook)
+
+    def label(self, provider: str) -> str:
+        if provider not in self.__providers:
+            if len(self.__providers) >= self.max_providers:
+                return "other"
+            self.__providers.add(provider)
+        return provider
+
+    def observe(self, provider: str, phase: str, duration: float) -> None:
+        provider = self.label(provider)
+        histogram: typing.Optional[Histogram] = self.__durations.get((provider, phase))
+        if histogram is None:
+            histogram = self.__durations[(provider, phase)] = Histogram(self.buckets)
+        histogram.observe(duration)
+
+    def histogram(self, provider: str, phase: str) -> typing.Optional[Histogram]:
+        return self.__durations.get((provider, phase))
+
+    def outcomes(self, provider: str) -> dict[str, int]:
+        return {
+            outcome: count
+            for (name, outcome), count in self.__outcomes.items()
+            if name == provider
+        }
+
+    @contextlib.contextmanager
+    def phase(self, provider: str, phase: str) -> typing.Iterator[None]:
+        provider = self.label(provider)
+        self.__notify("phase_started", provider, phase)
+        error: typing.Optional[BaseException] = None
+        started: float = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            duration: float = time.perf_counter() - started
+            self.observe(provider, phase, duration)
+            self.__notify("phase_finished", provider, phase, duration, error)
+
+    def count(self, provider: str, outcome: str) -> None:
+        provider = self.label(provider)
+        key: tuple[str, str] = (provider, outcome)
+        self.__outcomes[key] = self.__outcomes.get(key, 0) + 1
+        self.__notify("outcome", provider, outcome)
+
+    @staticmethod
+    def classify(error: BaseException) -> str:
+        if isinstance(error, ProviderUnavailable):
+            return "unavailable"
+        if isinstance(error, ReplayedCallbackError):
+            return "replayed"
+        if isinstance(error, (MismatchingStateError, JoseError)):
+            # the state is checked before the provider is called, and an ID
+            # token which doesn't verify gets a 400 too.
+            return "client_error"
+        if (
+            isinstance(error, fastapi.HTTPException)
+            and error.status_code == fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY
+        ):
+            return "rejected"
+        if isinstance(error, fastapi.HTTPException) and 400 <= error.status_code < 500:
+            return "client_error"
+        if isinstance(error, (OAuthError, httpx.HTTPError)):
+            return "provider_error"
+        return "error"
+
+    def __notify(self, event: str, *args: typing.Any) -> None:
+        for hook in self.hooks:
+            try:
+                getattr(hook, event)(*args)
+            except Exception:
+                # a broken hook must never fail a login.
+                log.exception("%s hook of %r failed", event, hook)
+
+    def render(self) -> str:
+        # the prometheus text exposition format.
+        lines: list[str] = [
+            "# HELP authkit_phase_duration_seconds Duration of the callback flow "
+            "phases.",
+            "# TYPE authkit_phase_duration_seconds histogram",
+        ]
+        for (provider, phase), histogram in sorted(self.__durations.items()):
+            labels: str = f'provider="{escape(provider)}",phase="{escape(phase)}"'
+            for bound, count in histogram.cumulative():
+                lines.append(
+                    "authkit_phase_duration_seconds_bucket"
+                    f'{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(
+                f"authkit_phase_duration_seconds_sum{{{labels}}} {histogram.sum}"
+            )
+            lines.append(
+                f"authkit_phase_duration_seconds_count{{{labels}}} {histogram.count}"
+            )
+        lines += [
+            "# HELP authkit_callbacks_total Callbacks by their outcome.",
+            "# TYPE authkit_callbacks_total counter",
+        ]
+        for (provider, outcome), count in sorted(self.__outcomes.items()):
+            lines.append(
+                f'authkit_callbacks_total{{provider="{escape(provider)}",'
+                f'outcome="{escape(outcome)}"}} {count}'
+            )
+        return "\n".join(lines) + "\n"
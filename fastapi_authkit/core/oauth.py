@@ -1,42 +1,379 @@
 from __future__ import annotations
 from datetime import datetime
+import functools
+import hmac
+import secrets
+import time
 import typing
 
-from authlib.integrations.starlette_client import OAuth
+from authlib.integrations.starlette_client import OAuth as StarletteOAuth
 from authlib.integrations.starlette_client.apps import (
     StarletteOAuth1App,
     StarletteOAuth2App,
 )
+from authlib.common.security import generate_token
+from authlib.integrations.base_client import MismatchingStateError
 from authlib.integrations.starlette_client import OAuthError
+from authlib.jose import JsonWebToken
+from authlib.jose.errors import DecodeError
+from authlib.jose.rfc7517 import Key
+from authlib.jose.util import extract_header
+from authlib.oidc.core import CodeIDToken
+from authlib.oidc.core import ImplicitIDToken
 from authlib.oidc.core.claims import UserInfo
 import pydantic
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
+
+from ..interfaces.cache import ICacheBackend
+from .http import HTTPClientPool
+from .jwks import JWKSManager
+from .metadata import MetadataCache
+from .replay import ReplayCache
+from .replay import ReplayedCallbackError
+from .state import StateSerializer
 
 
 Url = typing.NewType("Url", str)
 
 
+class OAuth2App(StarletteOAuth2App):
+    jwks: typing.Optional[JWKSManager] = None
+    metadata_cache: typing.Optional[MetadataCache] = None
+    # set when the provider's settings have an ``urlsafe_salt``, see
+    # ``OAuth.setup_client``.
+    state_serializer: typing.Optional[StateSerializer] = None
+    # the browser binding of the stateless states, so a callback can't be
+    # completed in another browser than the one which started the login.
+    binding_cookie: str = "_authkit_binding"
+    replay_cache: typing.Optional[ReplayCache] = None
+
+    def __init__(
+        self,
+        *args: typing.Any,
+        urlsafe_salt: typing.Optional[str] = None,
+        urlsafe_max_age: typing.Optional[int] = None,
+        **kwargs: typing.Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.urlsafe_salt: typing.Optional[str] = urlsafe_salt
+        self.urlsafe_max_age: typing.Optional[int] = urlsafe_max_age
+
+    async def authorize_redirect(
+        self,
+        request: Request,
+        redirect_uri: typing.Optional[str] = None,
+        **kwargs: typing.Any,
+    ) -> RedirectResponse:
+        if self.state_serializer is None:
+            return await super().authorize_redirect(request, redirect_uri, **kwargs)
+
+        binding: str = request.cookies.get(
+            self.binding_cookie
+        ) or secrets.token_urlsafe(16)
+        data: dict[str, typing.Any] = {"redirect_uri": redirect_uri, "b": binding}
+        scope: typing.Optional[str] = kwargs.get(
+            "scope", self.client_kwargs.get("scope")
+        )
+        if scope and "openid" in scope.split():
+            data["nonce"] = kwargs["nonce"] = kwargs.get("nonce") or generate_token(20)
+        if self.client_kwargs.get("code_challenge_method"):
+            data["code_verifier"] = kwargs["code_verifier"] = kwargs.get(
+                "code_verifier"
+            ) or generate_token(48)
+        rv: dict[str, typing.Any] = await self.create_authorization_url(
+            redirect_uri, state=self.state_serializer.dumps(data), **kwargs
+        )
+        response: RedirectResponse = RedirectResponse(rv["url"], status_code=302)
+        response.set_cookie(
+            self.binding_cookie,
+            binding,
+            max_age=self.state_serializer.max_age,
+            httponly=True,
+            secure=request.url.scheme == "https",
+            samesite="lax",
+        )
+        return response
+
+    async def authorize_access_token(
+        self, request: Request, **kwargs: typing.Any
+    ) -> dict[str, typing.Any]:
+        if self.state_serializer is None:
+            if self.replay_cache is not None:
+                session = None if self.framework.cache else request.session
+                state: typing.Optional[str] = request.query_params.get("state")
+                session_data: typing.Optional[
+                    dict[str, typing.Any]
+                ] = await self.framework.get_state_data(session, state)
+                # an unknown state is rejected by authlib.
+                if session_data is not None:
+                    self.check_replay(
+                        state, request.query_params.get("code"), session_data
+                    )
+            return await super().authorize_access_token(request, **kwargs)
+
+        error: typing.Optional[str] = request.query_params.get("error")
+        if error:
+            raise OAuthError(
+                error=error, description=request.query_params.get("error_description")
+            )
+        params: dict[str, typing.Any] = {
+            "code": request.query_params.get("code"),
+            "state": request.query_params.get("state"),
+        }
+        claims_options = kwargs.pop("claims_options", None)
+        state_data: typing.Optional[
+            dict[str, typing.Any]
+        ] = self.state_serializer.loads(params["state"])
+        if state_data is None or not hmac.compare_digest(
+            state_data.pop("b", ""), request.cookies.get(self.binding_cookie, "")
+        ):
+            raise MismatchingStateError()
+        self.check_replay(params["state"], params["code"], state_data)
+        params = self._format_state_params(state_data, params)
+        token: dict[str, typing.Any] = await self.fetch_access_token(**params, **kwargs)
+        if "id_token" in token and "nonce" in state_data:
+            token["userinfo"] = await self.parse_id_token(
+                token, nonce=state_data["nonce"], claims_options=claims_options
+            )
+        return token
+
+    def check_replay(
+        self,
+        state: typing.Optional[str],
+        code: typing.Optional[str],
+        state_data: dict[str, typing.Any],
+    ) -> None:
+        # only the callbacks of a valid state are recorded, so made up ones
+        # can't flood the cache.
+        if self.replay_cache is None:
+            return
+        values: list[str] = [f"state:{state}", f"code:{self.name}:{code}"]
+        if state_data.get("nonce"):
+            values.append(f"nonce:{state_data['nonce']}")
+        if self.replay_cache.seen(*values):
+            raise ReplayedCallbackError()
+
+    async def load_server_metadata(self) -> dict[str, typing.Any]:
+        if self.metadata_cache is None or not self._server_metadata_url:
+            return await super().load_server_metadata()
+
+        loaded_at: typing.Optional[float] = self.server_metadata.get("_loaded_at")
+        if loaded_at is None or time.time() - loaded_at >= self.metadata_cache.ttl:
+            metadata: dict[str, typing.Any] = await self.metadata_cache.get(
+                self._server_metadata_url
+            )
+            self.server_metadata.update(metadata)
+            self.server_metadata["_loaded_at"] = time.time()
+        return self.server_metadata
+
+    async def parse_id_token(
+        self,
+        token: dict[str, typing.Any],
+        nonce: typing.Optional[str],
+        claims_options: typing.Optional[dict[str, typing.Any]] = None,
+    ) -> UserInfo:
+        metadata: dict[str, typing.Any] = await self.load_server_metadata()
+        jwks_uri: typing.Optional[str] = metadata.get("jwks_uri")
+        if self.jwks is None or not jwks_uri or metadata.get("jwks"):
+            return await super().parse_id_token(token, nonce, claims_options)
+
+        # resolve the signing key through the shared JWKS manager, which keeps
+        # the parsed keys indexed by ``kid`` instead of fetching and
+        # re-importing the whole key set on every callback.
+        header: dict[str, typing.Any] = extract_header(
+            token["id_token"].split(".")[0].encode(), DecodeError
+        )
+        key: Key = await self.jwks.get_key(jwks_uri, header.get("kid"))
+
+        claims_params: dict[str, typing.Any] = dict(
+            nonce=nonce,
+            client_id=self.client_id,
+        )
+        claims_cls: typing.Type[ImplicitIDToken] = ImplicitIDToken
+        if "access_token" in token:
+            claims_params["access_token"] = token["access_token"]
+            claims_cls = CodeIDToken
+
+        if claims_options is None and "issuer" in metadata:
+            claims_options = {"iss": {"values": [metadata["issuer"]]}}
+
+        alg_values: list[str] = metadata.get(
+            "id_token_signing_alg_values_supported"
+        ) or ["RS256"]
+        claims = JsonWebToken(alg_values).decode(
+            token["id_token"],
+            key=key,
+            claims_cls=claims_cls,
+            claims_options=claims_options,
+            claims_params=claims_params,
+        )
+        # https://github.com/lepture/authlib/issues/259
+        if claims.get("nonce_supported") is False:
+            claims.params["nonce"] = None
+        claims.validate(leeway=120)
+        return UserInfo(claims)
+
+
+class OAuth(StarletteOAuth):
+    oauth2_client_cls = OAuth2App
+
+    def __init__(
+        self,
+        *args: typing.Any,
+        jwks: typing.Optional[JWKSManager] = None,
+        metadata_cache: typing.Optional[MetadataCache] = None,
+        http: typing.Optional[HTTPClientPool] = None,
+        state_secret: typing.Optional[str] = None,
+        cache_backend: typing.Optional[ICacheBackend] = None,
+        replay_cache: typing.Optional[ReplayCache] = None,
+        **kwargs: typing.Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.state_secret: typing.Optional[str] = state_secret
+        self.replay_cache: typing.Optional[ReplayCache] = replay_cache
+        self.__stateless_replay_caches: dict[int, ReplayCache] = {}
+        self.http: HTTPClientPool = http or HTTPClientPool()
+        self.jwks: JWKSManager = jwks or JWKSManager(backend=cache_backend)
+        self.metadata_cache: MetadataCache = metadata_cache or MetadataCache(
+            backend=cache_backend
+        )
+        for component in (self.jwks, self.metadata_cache):
+            if component.client is None and component.http is None:
+                component.http = self.http
+
+    def register(
+        self, name: str, overwrite: bool = False, **kwargs: typing.Any
+    ) -> None:
+        # unlike authlib, the client is only created on its first use.
+        self._registry[name] = (overwrite, kwargs)
+        self._clients.pop(name, None)
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._registry
+
+    def metadata_urls(self) -> list[str]:
+        return [
+            config["server_metadata_url"]
+            for _, config in self._registry.values()
+            if config.get("server_metadata_url")
+        ]
+
+    async def prefetch_metadata(self) -> None:
+        # fetch the discovery documents of all registered providers at once,
+        # and warm up the key sets they point at.
+        metadata = await self.metadata_cache.prefetch(self.metadata_urls())
+        for document in metadata.values():
+            if document.get("jwks_uri"):
+                self.jwks.register(document["jwks_uri"])
+
+    def setup_client(
+        self, client: StarletteOAuth1App | StarletteOAuth2App, pool_name: str
+    ) -> StarletteOAuth1App | StarletteOAuth2App:
+        # every provider shares the pooled connections, a timeout given
+        # through the provider's ``client_kwargs`` still takes precedence.
+        for key, value in self.http.client_kwargs(pool_name).items():
+            client.client_kwargs.setdefault(key, value)
+        if isinstance(client, OAuth2App):
+            client.jwks = self.jwks
+            client.metadata_cache = self.metadata_cache
+            client.replay_cache = self.replay_cache
+            if client.urlsafe_salt and self.state_secret:
+                max_age: int = client.urlsafe_max_age or 600
+                client.state_serializer = StateSerializer(
+                    self.state_secret, client.urlsafe_salt, max_age
+                )
+                if client.replay_cache is None:
+                    client.replay_cache = self.stateless_replay_cache(max_age)
+        return client
+
+    def stateless_replay_cache(self, max_age: int) -> ReplayCache:
+        # a stateless state is valid on its own for ``max_age``, it must be
+        # remembered as long to be used only once. Without a replay cache
+        # given, each worker remembers the states it has seen itself.
+        if max_age not in self.__stateless_replay_caches:
+            self.__stateless_replay_caches[max_age] = ReplayCache(ttl=max_age)
+        return self.__stateless_replay_caches[max_age]
+
+    def create_client(
+        self, name: str
+    ) -> typing.Optional[StarletteOAuth1App | StarletteOAuth2App]:
+        client = super().create_client(name)
+        if client is None:
+            return None
+        return self.setup_client(client, name)
+
+    def build_client(
+        self,
+        name: str,
+        pool_name: typing.Optional[str] = None,
+        **config: typing.Any,
+    ) -> StarletteOAuth1App | StarletteOAuth2App:
+        # a client which is kept out of the registry, for the ones created and
+        # dropped at runtime (e.g. one per tenant) by their owner.
+        kwargs: dict[str, typing.Any] = self.generate_client_kwargs(
+            name, False, **config
+        )
+        framework = self.framework_integration_cls(name, self.cache)
+        client: StarletteOAuth1App | StarletteOAuth2App
+        if kwargs.get("request_token_url"):
+            client = self.oauth1_client_cls(framework, name, **kwargs)
+        else:
+            client = self.oauth2_client_cls(framework, name, **kwargs)
+        return self.setup_client(client, pool_name or name)
+
+    def release_client(self, client: StarletteOAuth1App | StarletteOAuth2App) -> None:
+        # forget the shared documents and keys a built client has loaded.
+        if not isinstance(client, OAuth2App):
+            return
+        if client._server_metadata_url:
+            self.metadata_cache.forget(client._server_metadata_url)
+        jwks_uri: typing.Optional[str] = client.server_metadata.get("jwks_uri")
+        if jwks_uri:
+            self.jwks.forget(jwks_uri)
+
+
 class AuthVia:
     class Authenticator:
         def __init__(
             self,
             context: typing.Type[AuthVia],
             urls: list[Url],
-            auth_class: typing.Optional[StarletteOAuth1App | StarletteOAuth2App],
+            auth_class: typing.Optional[
+                StarletteOAuth1App
+                | StarletteOAuth2App
+                | typing.Callable[
+                    [], typing.Optional[StarletteOAuth1App | StarletteOAuth2App]
+                ]
+            ],
         ) -> None:
             self.context: typing.Type[AuthVia] = context
             self.urls: list[Url] = urls
+            # the client is either given, or created on the first use.
             self.__auth_class: typing.Optional[
                 StarletteOAuth1App | StarletteOAuth2App
-            ] = auth_class
+            ] = None
+            self.__loader: typing.Optional[
+                typing.Callable[
+                    [], typing.Optional[StarletteOAuth1App | StarletteOAuth2App]
+                ]
+            ] = None
+            if callable(auth_class):
+                self.__loader = auth_class
+            else:
+                self.__auth_class = auth_class
+            self.__prefix: str = "/" + self.context.__name__.lower() + "/"
 
         def get_auth_class(self) -> StarletteOAuth1App | StarletteOAuth2App:
+            if self.__auth_class is None and self.__loader is not None:
+                self.__auth_class = self.__loader()
             if self.__auth_class:
                 return self.__auth_class
             raise AttributeError
 
         def __call__(self, url: Url) -> Url:
             if url in self.urls:
-                return Url("/" + self.context.__name__.lower() + "/" + url)
+                return Url(self.__prefix + url)
             raise ValueError("url not registered")
 
     def __init__(
@@ -44,38 +381,38 @@ class AuthVia:
     ) -> None:
         self.vias: typing.Iterable[dict[str, typing.Any]] = vias
         self.oapp: OAuth = oapp
-        self.__methods: list[str] = []
-        for via in self.vias:
-            self.__methods.append(via["name"])
+        self.__settings: dict[str, dict[str, typing.Any]] = {
+            via["name"]: via for via in self.vias
+        }
+        self.__contexts: dict[str, typing.Type[AuthVia]] = {}
 
     def register(self, setting: dict[str, typing.Any]) -> None:
         self.oapp.register(overwrite=False, **setting)
 
     def get_setting(self, name: str) -> dict[str, typing.Any]:
-        if name in self.__methods:
-            for via in self.vias:
-                if via["name"] == name:
-                    return via
-        raise ValueError(name + " method not registered.")
+        try:
+            return self.__settings[name]
+        except KeyError:
+            raise ValueError(name + " method not registered.")
+
+    def get_context(self, via: str) -> typing.Type[AuthVia]:
+        context: typing.Optional[typing.Type[AuthVia]] = self.__contexts.get(via)
+        if context is None:
+            context = type(via, (self.__class__,), dict())
+            self.__contexts[via] = context
+        return context
 
     def __call__(
         self,
         via: str,
         urls: list[Url],
     ) -> Authenticator:
-        if via in self.__methods:
-            cls: typing.Type[AuthVia] = type(via, (self.__class__,), dict())
-            try:
-                return self.Authenticator(
-                    cls,
-                    urls,
-                    getattr(
-                        self.oapp,
-                        via,
-                    ),
-                )
-            except AttributeError:
-                pass
+        if via in self.__settings and self.oapp.is_registered(via):
+            return self.Authenticator(
+                self.get_context(via),
+                urls,
+                lambda: self.oapp.create_client(via),
+            )
         raise ValueError(f"{via} auth method not registered")
 
     def __repr__(self) -> str:
@@ -109,15 +446,19 @@ class UserInfoModel(pydantic.BaseModel):
     updated_at: typing.Optional[str] = pydantic.Field(None)
     extra: typing.Optional[dict[str, typing.Any]] = pydantic.Field(None)
 
-    @pydantic.root_validator(pre=True)
-    def build_extra(cls, values: dict[str, typing.Any]) -> dict[str, typing.Any]:
-        all_required_field_names = {
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def known_fields(cls) -> frozenset[str]:
+        return frozenset(
             field.alias for field in cls.__fields__.values() if field.alias != "extra"
-        }  # to support alias
+        )  # to support alias
 
+    @pydantic.root_validator(pre=True)
+    def build_extra(cls, values: dict[str, typing.Any]) -> dict[str, typing.Any]:
+        known_fields: frozenset[str] = cls.known_fields()
         extra: dict[str, typing.Any] = {}
         for field_name in list(values):
-            if field_name not in all_required_field_names:
+            if field_name not in known_fields:
                 extra[field_name] = values.pop(field_name)
         values["extra"] = extra
         return values
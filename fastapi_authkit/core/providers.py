@@ -1,24 +1,25 @@
 import typing
 import fastapi
-from httpx import Response
-
-from ..utils import get_full_url
 
 from .. import OAuthApp
 
 from .oauth import AuthVia
-from .oauth import UserInfo
 from .oauth import OAuthError
 from .oauth import UserInfoModel
-
+from .mapping import Claim
+from .mapping import ClaimMapping
+from .mapping import Const
+from .tenants import TenantAuthenticationMethod
+from .tenants import TenantSettings
 
 from ..interfaces.logics import IAuthLogic
 from ..interfaces.logics import Token
 from ..interfaces.provider import AuthenticationMethod
-from ..interfaces.provider import TokenResponse
 
 
 class GoogleAuthenticationMethod(AuthenticationMethod):
+    claims = ClaimMapping.standard()
+
     def __init__(
         self,
         router: fastapi.APIRouter,
@@ -39,63 +40,35 @@ class GoogleAuthenticationMethod(AuthenticationMethod):
             "https://accounts.google.com/.well-known/openid-configuration"
         )
 
-    def create_userinfo(self, userinfo: dict[str, typing.Any]) -> UserInfoModel:
-        return UserInfoModel(**UserInfo(userinfo))
-
-    def routes(self):
-        @self.router.get(self.authenticator(self.login_url))
-        async def login(request: fastapi.Request) -> fastapi.responses.RedirectResponse:
-            redirect_uri: str = (
-                get_full_url(request=request)
-                + self.router.prefix
-                + self.authenticator(self.auth_url)
-            )
-            return await self.authenticator.get_auth_class().authorize_redirect(
-                request,
-                redirect_uri=redirect_uri,
-            )
-
-        @self.router.get(
-            self.authenticator(self.auth_url),
-            responses={
-                201: {
-                    "description": "when a user has not already registered, this api will"
-                    "signup first and next step will login the user,"
-                },
-            },
-            response_model=TokenResponse,
-        )
-        async def authorize(
-            request: fastapi.Request, response: fastapi.Response
-        ) -> TokenResponse:
-            auth_token: typing.Any = (
-                await self.authenticator.get_auth_class().authorize_access_token(
-                    request
-                )
-            )
-            userinfo: UserInfoModel = self.create_userinfo(auth_token["userinfo"])
-            # If user has already registered by its github account will login
-            # easily, otherwize will invoke the signup method before relogin
-            # flow.
-
-            token: str | None = await self.auth_logic.login(userinfo=userinfo)
-            if token:
-                return TokenResponse(access_token=token, token_type="bearer")
-
-            # create a user account
-            await self.auth_logic.singup(userinfo=userinfo)
-
-            # login the user.
-            token = await self.auth_logic.login(userinfo)
-            if token:
-                response.status_code = fastapi.status.HTTP_201_CREATED
-                return TokenResponse(access_token=token, token_type="bearer")
-            raise fastapi.HTTPException(
-                fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
-            )
-
 
 class ZoomAuthenticationMethod(AuthenticationMethod):
+    userinfo_endpoint = "v2/users/me"
+    userinfo_params = {"skip_status": True}
+    claims = ClaimMapping(
+        {
+            "sub": "id",
+            "name": "display_name",
+            "family_name": "last_name",
+            "given_name": "first_name",
+            "middle_name": Const(""),
+            "nickname": Const(""),
+            "email": "email",
+            "preferred_username": "display_name",
+            "address": "location",
+            "birthdate": Const(""),
+            "zoneinfo": "timezone",
+            "email_verified": "verified",
+            "picture": "pic_url",
+            "locale": "location",
+            "gender": Const(""),
+            "phone_number": "phone_number",
+            "phone_number_verified": "verified",
+            "profile": Const(""),
+            "updated_at": "last_login_time",
+            "website": Const(""),
+        }
+    )
+
     def __init__(
         self,
         router: fastapi.APIRouter,
@@ -110,92 +83,35 @@ class ZoomAuthenticationMethod(AuthenticationMethod):
         self.settings.access_token_url = "https://zoom.us/oauth/token"
         self.settings.api_base_url = "https://api.zoom.us/"
 
-    def create_userinfo(self, userinfo: dict[str, typing.Any]) -> UserInfoModel:
-        return UserInfoModel(
-            sub=userinfo["id"],
-            name=userinfo["display_name"],
-            family_name=userinfo["last_name"],
-            given_name=userinfo["first_name"],
-            middle_name="",
-            nickname="",
-            email=userinfo["email"],
-            preferred_username=userinfo["display_name"],
-            address=userinfo["location"],
-            birthdate="",
-            zoneinfo=userinfo["timezone"],
-            email_verified=userinfo["verified"],
-            picture=userinfo["pic_url"],
-            locale=userinfo["location"],
-            gender="",
-            phone_number=userinfo["phone_number"],
-            phone_number_verified=userinfo["verified"],
-            profile="",
-            updated_at=userinfo["last_login_time"],
-            website="",
-            extra=userinfo,
-        )
-
-    def routes(self):
-        @self.router.get(self.authenticator(self.login_url))
-        async def login(request: fastapi.Request) -> fastapi.responses.RedirectResponse:
-            redirect_uri: str = (
-                get_full_url(request=request)
-                + self.router.prefix
-                + self.authenticator(self.auth_url)
-            )
-            return await self.authenticator.get_auth_class().authorize_redirect(
-                request,
-                redirect_uri=redirect_uri,
-            )
-
-        @self.router.get(
-            self.authenticator(self.auth_url),
-            responses={
-                201: {
-                    "description": "when a user has not already registered, this api will"
-                    "signup first and next step will login the user,"
-                },
-            },
-            response_model=TokenResponse,
-        )
-        async def authorize(
-            request: fastapi.Request, response: fastapi.Response
-        ) -> TokenResponse:
-            auth_token: typing.Any = (
-                await self.authenticator.get_auth_class().authorize_access_token(
-                    request
-                )
-            )
-
-            resp: Response = await self.authenticator.get_auth_class().get(
-                "v2/users/me",
-                params={"skip_status": True},
-                token=auth_token,
-            )
-            resp.raise_for_status()
-            userinfo: UserInfoModel = self.create_userinfo(resp.json())
-            # If user has already registered by its github account will login
-            # easily, otherwize will invoke the signup method before relogin
-            # flow.
-
-            token: str | None = await self.auth_logic.login(userinfo=userinfo)
-            if token:
-                return TokenResponse(access_token=token, token_type="bearer")
-
-            # create a user account
-            await self.auth_logic.singup(userinfo=userinfo)
-
-            # login the user.
-            token = await self.auth_logic.login(userinfo)
-            if token:
-                response.status_code = fastapi.status.HTTP_201_CREATED
-                return TokenResponse(access_token=token, token_type="bearer")
-            raise fastapi.HTTPException(
-                fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
-            )
-
 
 class GithubAuthenticationMethod(AuthenticationMethod):
+    userinfo_endpoint = "user"
+    userinfo_params = {"skip_status": True}
+    claims = ClaimMapping(
+        {
+            "sub": Claim("id", convert=str),
+            "name": "login",
+            "address": Const(""),
+            "birthdate": Const(""),
+            "email": "email",
+            "email_verified": Const(True),
+            "family_name": lambda userinfo: userinfo["name"].partition(" ")[2],
+            "given_name": lambda userinfo: userinfo["name"].partition(" ")[0],
+            "gender": Const(""),
+            "locale": lambda userinfo: userinfo["location"] or "",
+            "middle_name": "company",
+            "nickname": "name",
+            "phone_number": Const(""),
+            "phone_number_verified": Const(False),
+            "picture": "avatar_url",
+            "preferred_username": "node_id",
+            "profile": "html_url",
+            "updated_at": "updated_at",
+            "website": "html_url",
+            "zoneinfo": Const(""),
+        }
+    )
+
     def __init__(
         self,
         router: fastapi.APIRouter,
@@ -212,31 +128,7 @@ class GithubAuthenticationMethod(AuthenticationMethod):
                 "\nplease add a publick email to your github account.",
                 uri=userinfo["html_url"],
             )
-        name: str = userinfo["name"]
-        first_name, last_name = name.split(" ")
-        return UserInfoModel(
-            sub=str(userinfo["id"]),
-            name=userinfo["login"],
-            address="",
-            birthdate="",
-            email=userinfo["email"],
-            email_verified=True,
-            extra=userinfo,
-            family_name=last_name,
-            given_name=first_name,
-            gender="",
-            locale=userinfo["location"] or "",
-            middle_name=userinfo["company"],
-            nickname=name,
-            phone_number="",
-            phone_number_verified=False,
-            picture=userinfo["avatar_url"],
-            preferred_username=userinfo["node_id"],
-            profile=userinfo["html_url"],
-            updated_at=userinfo["updated_at"],
-            website=userinfo["html_url"],
-            zoneinfo="",
-        )
+        return super().create_userinfo(userinfo)
 
     def configure(self):
         self.settings.access_token_url = "https://github.com/login/oauth/access_token"
@@ -251,67 +143,18 @@ class GithubAuthenticationMethod(AuthenticationMethod):
             }
         )
 
-    def routes(self):
-        @self.router.get(self.authenticator(self.login_url))
-        async def login(request: fastapi.Request) -> fastapi.responses.RedirectResponse:
-            redirect_uri: str = (
-                get_full_url(request=request)
-                + self.router.prefix
-                + self.authenticator(self.auth_url)
-            )
-            return await self.authenticator.get_auth_class().authorize_redirect(
-                request,
-                redirect_uri=redirect_uri,
-            )
-
-        @self.router.get(
-            self.authenticator(self.auth_url),
-            responses={
-                201: {
-                    "description": "when a user has not already registered, this api will"
-                    "signup first and next step will login the user,"
-                },
-            },
-            response_model=TokenResponse,
-        )
-        async def authorize(
-            request: fastapi.Request, response: fastapi.Response
-        ) -> TokenResponse:
-            auth_token: typing.Any = (
-                await self.authenticator.get_auth_class().authorize_access_token(
-                    request
-                )
-            )
-
-            resp: Response = await self.authenticator.get_auth_class().get(
-                "user",
-                params={"skip_status": True},
-                token=auth_token,
-            )
-            resp.raise_for_status()
-            userinfo: UserInfoModel = self.create_userinfo(resp.json())
-            # If user has already registered by its github account will login
-            # easily, otherwize will invoke the signup method before relogin
-            # flow.
-
-            token: str | None = await self.auth_logic.login(userinfo=userinfo)
-            if token:
-                return TokenResponse(access_token=token, token_type="bearer")
-
-            # create a user account
-            await self.auth_logic.singup(userinfo=userinfo)
-
-            # login the user.
-            token = await self.auth_logic.login(userinfo)
-            if token:
-                response.status_code = fastapi.status.HTTP_201_CREATED
-                return TokenResponse(access_token=token, token_type="bearer")
-            raise fastapi.HTTPException(
-                fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
-            )
-
 
 class TwitterAuthenticationMethod(AuthenticationMethod):
+    userinfo_endpoint = "account/verify_credentials.json"
+    userinfo_params = {"skip_status": True}
+    claims = ClaimMapping(
+        {
+            "name": "name",
+            "email": Claim("email", default=None),
+            "sub": lambda userinfo: userinfo.get("sub") or userinfo["id_str"],
+        }
+    )
+
     def __init__(
         self,
         router: fastapi.APIRouter,
@@ -328,90 +171,33 @@ class TwitterAuthenticationMethod(AuthenticationMethod):
         self.settings.access_token_url = f"{twitter_address}/oauth/access_token"
         self.settings.authorize_url = f"{twitter_address}/oauth/authenticate"
 
-    def create_userinfo(self, userinfo: dict[str, typing.Any]) -> UserInfoModel:
-        return UserInfoModel(
-            name=userinfo["name"],
-            email=userinfo["email"],
-            sub=userinfo["sub"],
-            given_name=None,
-            family_name=None,
-            middle_name=None,
-            nickname=None,
-            preferred_username=None,
-            profile=None,
-            picture=None,
-            website=None,
-            email_verified=None,
-            gender=None,
-            birthdate=None,
-            zoneinfo=None,
-            locale=None,
-            phone_number=None,
-            phone_number_verified=None,
-            address=None,
-            updated_at=None,
-            extra=userinfo,
-        )
-
-    def routes(self):
-        @self.router.get(self.authenticator(self.login_url))
-        async def login(request: fastapi.Request) -> fastapi.responses.RedirectResponse:
-            redirect_uri: str = (
-                get_full_url(request=request)
-                + self.router.prefix
-                + self.authenticator(self.auth_url)
-            )
-            return await self.authenticator.get_auth_class().authorize_redirect(
-                request,
-                redirect_uri=redirect_uri,
-            )
-
-        @self.router.get(
-            self.authenticator(self.auth_url),
-            responses={
-                201: {
-                    "description": "when a user has not already registered, this api will"
-                    "signup first and next step will login the user,"
-                },
-            },
-            response_model=TokenResponse,
-        )
-        async def authorize(
-            request: fastapi.Request, response: fastapi.Response
-        ) -> TokenResponse:
-            auth_token: typing.Any = (
-                await self.authenticator.get_auth_class().authorize_access_token(
-                    request
-                )
-            )
-            url = "account/verify_credentials.json"
-            resp: Response = await self.authenticator.get_auth_class().get(
-                url, params={"skip_status": True}, token=auth_token
-            )
-            resp.raise_for_status()
-            userinfo = resp.json()
-            # If user has already registered by its github account will login
-            # easily, otherwize will invoke the signup method before relogin
-            # flow.
-
-            token: str | None = await self.auth_logic.login(userinfo=userinfo)
-            if token:
-                return TokenResponse(access_token=token, token_type="bearer")
-
-            # create a user account
-            await self.auth_logic.singup(userinfo=userinfo)
-
-            # login the user.
-            token = await self.auth_logic.login(userinfo)
-            if token:
-                response.status_code = fastapi.status.HTTP_201_CREATED
-                return TokenResponse(access_token=token, token_type="bearer")
-            raise fastapi.HTTPException(
-                fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
-            )
-
 
 class OktaAuthenticationMethod(AuthenticationMethod):
+    claims = ClaimMapping(
+        {
+            "name": "nickname",
+            "email": "name",
+            "address": Claim("address", default=""),
+            "given_name": Claim("given_name", default=""),
+            "middle_name": Claim("middle_name", default=""),
+            "family_name": Claim("family_name", default=""),
+            "birthdate": Claim("birthdate", default=""),
+            "email_verified": Claim("email_verified", default=""),
+            "gender": Claim("gender", default=""),
+            "locale": Claim("locale", default=""),
+            "phone_number": Claim("phone_number", default=""),
+            "nickname": Claim("nickname", default=""),
+            "phone_number_verified": Claim("phone_number_verified", default=""),
+            "picture": Claim("picture", default=""),
+            "preferred_username": Claim("preferred_username", default=""),
+            "sub": "sub",
+            "updated_at": "updated_at",
+            "profile": Claim("profile", default=""),
+            "website": Claim("website", default=""),
+            "zoneinfo": Claim("zoneinfo", default=""),
+        }
+    )
+
     def __init__(
         self,
         router: fastapi.APIRouter,
@@ -432,88 +218,76 @@ class OktaAuthenticationMethod(AuthenticationMethod):
         if api_base_url:
             self.settings.access_token_url = api_base_url + "/oauth/token"
             self.settings.authorize_url = api_base_url + "/authorize"
-            self.settings.server_metadata_url = api_base_url + "/.well-known/jwks.json"
+            self.settings.server_metadata_url = (
+                api_base_url + "/.well-known/openid-configuration"
+            )
+            self.settings.jwks_uri = api_base_url + "/.well-known/jwks.json"
         else:
             raise ValueError("Okta Domain/API URL didn't verify.")
 
-    def create_userinfo(self, userinfo: dict[str, typing.Any]) -> UserInfoModel:
-        return UserInfoModel(
-            name=userinfo["nickname"],
-            email=userinfo["name"],
-            address=userinfo.get("address", ""),
-            given_name=userinfo.get("given_name", ""),
-            middle_name=userinfo.get("middle_name", ""),
-            family_name=userinfo.get("family_name", ""),
-            birthdate=userinfo.get("birthdate", ""),
-            email_verified=userinfo.get("email_verified", ""),
-            gender=userinfo.get("gender", ""),
-            locale=userinfo.get("locale", ""),
-            phone_number=userinfo.get("phone_number", ""),
-            nickname=userinfo.get("nickname", ""),
-            phone_number_verified=userinfo.get("phone_number_verified", ""),
-            picture=userinfo.get("picture", ""),
-            preferred_username=userinfo.get("preferred_username", ""),
-            sub=userinfo["sub"],
-            updated_at=userinfo["updated_at"],
-            profile=userinfo.get("profile", ""),
-            website=userinfo.get("website", ""),
-            zoneinfo=userinfo.get("zoneinfo", ""),
-            extra=userinfo,
+
+class OIDCTenantAuthenticationMethod(TenantAuthenticationMethod):
+    claims = ClaimMapping.standard()
+
+    def __init__(
+        self,
+        name: str,
+        router: fastapi.APIRouter,
+        oauth_app: OAuthApp,
+        auth_vias: AuthVia,
+        auth_logic: IAuthLogic,
+        tenant_settings: TenantSettings,
+        max_tenants: int = 128,
+        idle_ttl: float = 3600,
+    ) -> None:
+        super().__init__(
+            name,
+            router,
+            oauth_app,
+            auth_vias,
+            auth_logic,
+            tenant_settings=tenant_settings,
+            max_tenants=max_tenants,
+            idle_ttl=idle_ttl,
         )
 
-    def routes(self):
-        @self.router.get(self.authenticator(self.login_url))
-        async def login(request: fastapi.Request) -> fastapi.responses.RedirectResponse:
-            redirect_uri: str = (
-                get_full_url(request=request)
-                + self.router.prefix
-                + self.authenticator(self.auth_url)
-            )
-            return await self.authenticator.get_auth_class().authorize_redirect(
-                request,
-                redirect_uri=redirect_uri,
-            )
+    def configure(self):
+        # e.g. api_base_url="https://login.example.com/{tenant}"
+        if self.settings.server_metadata_url:
+            return
+        if not self.settings.api_base_url:
+            raise ValueError(self.name + " needs an api_base_url or metadata url.")
+        self.settings.server_metadata_url = (
+            self.settings.api_base_url.rstrip("/") + "/.well-known/openid-configuration"
+        )
 
-        @self.router.get(
-            self.authenticator(self.auth_url),
-            responses={
-                201: {
-                    "description": "when a user has not already registered, this api will"
-                    "signup first and next step will login the user,"
-                },
-            },
-            response_model=TokenResponse,
+
+class OktaTenantAuthenticationMethod(OIDCTenantAuthenticationMethod):
+    claims = OktaAuthenticationMethod.claims
+
+    def __init__(
+        self,
+        router: fastapi.APIRouter,
+        oauth_app: OAuthApp,
+        auth_vias: AuthVia,
+        auth_logic: IAuthLogic,
+        tenant_settings: TenantSettings,
+        max_tenants: int = 128,
+        idle_ttl: float = 3600,
+        name: str = "okta",
+    ) -> None:
+        super().__init__(
+            name,
+            router,
+            oauth_app,
+            auth_vias,
+            auth_logic,
+            tenant_settings=tenant_settings,
+            max_tenants=max_tenants,
+            idle_ttl=idle_ttl,
         )
-        async def authorize(
-            request: fastapi.Request, response: fastapi.Response
-        ) -> TokenResponse:
-            server_metadata: dict = getattr(
-                self.authenticator.get_auth_class(), "server_metadata"
-            )
-            if server_metadata:
-                server_metadata["jwks_uri"] = self.settings.server_metadata_url
-            auth_token: typing.Any = (
-                await self.authenticator.get_auth_class().authorize_access_token(
-                    request
-                )
-            )
-            userinfo: UserInfoModel = self.create_userinfo(auth_token["userinfo"])
-            # If user has already registered by its github account will login
-            # easily, otherwize will invoke the signup method before relogin
-            # flow.
-
-            token: str | None = await self.auth_logic.login(userinfo=userinfo)
-            if token:
-                return TokenResponse(access_token=token, token_type="bearer")
-
-            # create a user account
-            await self.auth_logic.singup(userinfo=userinfo)
-
-            # login the user.
-            token = await self.auth_logic.login(userinfo)
-            if token:
-                response.status_code = fastapi.status.HTTP_201_CREATED
-                return TokenResponse(access_token=token, token_type="bearer")
-            raise fastapi.HTTPException(
-                fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
-            )
+
+    def configure(self):
+        if not self.settings.api_base_url:
+            self.settings.api_base_url = "https://{tenant}.okta.com"
+        OktaAuthenticationMethod.configure(self)  # type: ignore[arg-type]
@@ -0,0 +1,187 @@
+import asyncio
+import contextlib
+import json
+import typing
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from .oauth import UserInfoModel
+from ..interfaces.logics import IAuthLogic
+
+# the line number and userinfo (or error) of a record.
+Record = tuple[int, UserInfoModel | str]
+Results = list[dict[str, typing.Any]]
+
+
+class BulkProvisioner:
+    # imports the users of ``provider`` (the name of an authentication method,
+    # e.g. "google", or "okta:acme" for a tenant) from NDJSON, one
+    # ``UserInfoModel`` per line, so they log in as existing users through it.
+    # The records go through ``IAuthLogic.signup_many``, ``batch_size`` at a
+    # time with up to ``concurrency`` batches in flight. A result is produced
+    # for each line in the input order, so the memory used is bounded by the
+    # batches in flight whatever the size of the import.
+    def __init__(
+        self,
+        logic: IAuthLogic,
+        provider: str,
+        batch_size: int = 500,
+        concurrency: int = 4,
+        max_line_size: int = 64 * 1024,
+    ) -> None:
+        self.logic: IAuthLogic = logic
+        self.provider: str = provider
+        self.batch_size: int = batch_size
+        self.concurrency: int = concurrency
+        self.max_line_size: int = max_line_size
+
+    async def lines(
+        self, chunks: typing.AsyncIterable[bytes]
+    ) -> typing.AsyncIterator[tuple[int, typing.Optional[bytes]]]:
+        # the numbered lines of the stream, None for the ones too long to be
+        # a record which are skipped without being buffered.
+        buffer: bytearray = bytearray()
+        number: int = 0
+        skipping: bool = False
+        async for chunk in chunks:
+            buffer += chunk
+            while (end := buffer.find(b"\n")) >= 0:
+                number += 1
+                too_long: bool = skipping or end > self.max_line_size
+                yield number, None if too_long else bytes(buffer[:end])
+                del buffer[: end + 1]
+                skipping = False
+            if len(buffer) > self.max_line_size:
+                skipping = True
+                buffer.clear()
+        if buffer or skipping:
+            yield number + 1, None if skipping else bytes(buffer)
+
+    @staticmethod
+    def parse(line: bytes) -> UserInfoModel:
+        data: typing.Any = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError("a record must be a JSON object")
+        userinfo: UserInfoModel = UserInfoModel.parse_obj(data)
+        if userinfo.sub is None:
+            raise ValueError("a record must have a sub")
+        return userinfo
+
+    async def records(
+        self, chunks: typing.AsyncIterable[bytes]
+    ) -> typing.AsyncIterator[Record]:
+        # blank lines are skipped.
+        async for number, line in self.lines(chunks):
+            if line is None:
+                yield number, "the line is too long"
+                continue
+            if not line.strip():
+                continue
+            try:
+                yield number, self.parse(line)
+            except ValueError as error:
+                yield number, str(error)
+
+    async def signup(self, batch: list[Record]) -> Results:
+        userinfos: list[UserInfoModel] = [
+            userinfo for _, userinfo in batch if isinstance(userinfo, UserInfoModel)
+        ]
+        outcomes: list[typing.Optional[Exception]]
+        try:
+            outcomes = (
+                await self.logic.signup_many(self.provider, userinfos)
+                if userinfos
+                else []
+            )
+        except Exception as error:
+            # the whole batch failed, not the import.
+            outcomes = [error] * len(userinfos)
+        errors: typing.Iterator[typing.Optional[Exception]] = iter(outcomes)
+        results: Results = []
+        for number, userinfo in batch:
+            if not isinstance(userinfo, UserInfoModel):
+                results.append({"line": number, "ok": False, "error": userinfo})
+                continue
+            error: typing.Optional[Exception] = next(errors)
+            result: dict[str, typing.Any] = {
+                "line": number,
+                "sub": userinfo.sub,
+                "ok": error is None,
+            }
+            if error is not None:
+                result["error"] = str(error) or type(error).__name__
+            results.append(result)
+        return results
+
+    async def __produce(
+        self,
+        chunks: typing.AsyncIterable[bytes],
+        batches: asyncio.Queue[typing.Optional[asyncio.Task[Results]]],
+        slots: asyncio.Semaphore,
+    ) -> None:
+        try:
+            batch: list[Record] = []
+            async for record in self.records(chunks):
+                batch.append(record)
+                if len(batch) < self.batch_size:
+                    continue
+                await slots.acquire()
+                batches.put_nowait(asyncio.ensure_future(self.signup(batch)))
+                batch = []
+            if batch:
+                await slots.acquire()
+                batches.put_nowait(asyncio.ensure_future(self.signup(batch)))
+        finally:
+            batches.put_nowait(None)
+
+    async def provision(
+        self, chunks: typing.AsyncIterable[bytes]
+    ) -> typing.AsyncIterator[dict[str, typing.Any]]:
+        # the results of each record and a final summary. the stream keeps
+        # being read while the batches are signed up, a slot is freed when
+        # the results of its batch have been consumed.
+        batches: asyncio.Queue[typing.Optional[asyncio.Task[Results]]] = asyncio.Queue()
+        slots: asyncio.Semaphore = asyncio.Semaphore(self.concurrency)
+        producer: asyncio.Task[None] = asyncio.ensure_future(
+            self.__produce(chunks, batches, slots)
+        )
+        records: int = 0
+        failed: int = 0
+        try:
+            while (batch := await batches.get()) is not None:
+                for result in await batch:
+                    records += 1
+                    failed += not result["ok"]
+                    yield result
+                slots.release()
+            # raises the error reading the stream, if any.
+            await producer
+            yield {"summary": {"records": records, "failed": failed}}
+        finally:
+            producer.cancel()
+            while not batches.empty():
+                pending = batches.get_nowait()
+                if pending is not None:
+                    pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await producer
+
+    async def ndjson(
+        self, chunks: typing.AsyncIterable[bytes]
+    ) -> typing.AsyncIterator[bytes]:
+        async for result in self.provision(chunks):
+            yield json.dumps(result, separators=(",", ":")).encode() + b"\n"
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    # a streaming response sent while the request body is still being read.
+    # ``StreamingResponse`` listens for the client's disconnection on
+    # ``receive``, which would take the body away from ``request.stream``
+    # (it raises ``ClientDisconnect`` itself).
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,85 @@
+import collections
+import hashlib
+import time
+import typing
+
+from authlib.integrations.base_client import MismatchingStateError
+
+from .revocation import BloomFilter
+from ..interfaces.cache import ICacheBackend
+
+
+class ReplayedCallbackError(MismatchingStateError):
+    error = "replayed_callback"
+    description = "The callback has already been used."
+
+
+class Bucket:
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.started_at: float = time.time()
+        self.filter: BloomFilter = BloomFilter(capacity, error_rate)
+        self.count: int = 0
+
+
+class ReplayCache:
+    # remembers the ``state``, nonce and code of the callbacks for ``ttl`` so
+    # none of them can be used twice. The values are kept in a ring of bloom
+    # filters, each covering ``ttl / buckets`` seconds, which makes a check
+    # O(1) and the memory fixed. A bucket is also retired once it holds
+    # ``capacity`` values: under a login flood the remembered window shrinks
+    # instead of the false positives (legit callbacks rejected) growing. The
+    # optional ``backend`` (e.g. a ``SharedCacheBackend``) shares the values
+    # with the other workers and keeps them across restarts.
+    def __init__(
+        self,
+        ttl: float = 600,
+        buckets: int = 10,
+        capacity: int = 100000,
+        error_rate: float = 1e-6,
+        backend: typing.Optional[ICacheBackend] = None,
+    ) -> None:
+        self.ttl: float = ttl
+        self.width: float = ttl / buckets
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.backend: typing.Optional[ICacheBackend] = backend
+        # the oldest bucket is only dropped once the newest is ``width`` old,
+        # so a value is remembered for ``ttl`` at least.
+        self.__buckets: collections.deque[Bucket] = collections.deque(
+            maxlen=buckets + 1
+        )
+
+    @staticmethod
+    def digest(value: str) -> bytes:
+        return hashlib.sha256(value.encode()).digest()
+
+    def __current(self) -> Bucket:
+        now: float = time.time()
+        while self.__buckets and now - self.__buckets[0].started_at >= (
+            self.ttl + self.width
+        ):
+            self.__buckets.popleft()
+        if (
+            not self.__buckets
+            or now - self.__buckets[-1].started_at >= self.width
+            or self.__buckets[-1].count >= self.capacity
+        ):
+            self.__buckets.append(Bucket(self.capacity, self.error_rate))
+        return self.__buckets[-1]
+
+    def seen(self, *values: str) -> bool:
+        # records the values, returning whether any of them was already seen.
+        current: Bucket = self.__current()
+        replayed: bool = False
+        for value in values:
+            digest: bytes = self.digest(value)
+            if any(digest in bucket.filter for bucket in self.__buckets):
+                replayed = True
+                continue
+            current.filter.add(digest)
+            current.count += 1
+            if self.backend is not None and not self.backend.add(
+                "replay:" + digest.hex(), b"", ttl=self.ttl
+            ):
+                replayed = True
+        return replayed
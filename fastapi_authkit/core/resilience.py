@@ -0,0 +1,339 @@
+import asyncio
+import collections
+import contextlib
+import random
+import time
+import typing
+
+import fastapi
+import httpx
+
+from .cache import LRUCache
+from .oauth import OAuthError
+
+T = typing.TypeVar("T")
+
+
+class ProviderUnavailable(fastapi.HTTPException):
+    def __init__(
+        self, provider: str, reason: str, retry_after: typing.Optional[float] = None
+    ) -> None:
+        super().__init__(
+            fastapi.status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{provider} is unavailable ({reason}), please try again later.",
+            headers=(
+                {"Retry-After": str(max(int(retry_after), 1))}
+                if retry_after is not None
+                else None
+            ),
+        )
+        self.provider: str = provider
+        self.reason: str = reason
+
+
+class CircuitBreaker:
+    CLOSED: str = "closed"
+    OPEN: str = "open"
+    HALF_OPEN: str = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        window: int = 20,
+    ) -> None:
+        self.failure_threshold: int = failure_threshold
+        self.recovery_timeout: float = recovery_timeout
+        # the outcomes of the last ``window`` calls, a failed one is True.
+        self.__outcomes: collections.deque[bool] = collections.deque(maxlen=window)
+        self.__opened_at: typing.Optional[float] = None
+        self.__probing: bool = False
+
+    @property
+    def failures(self) -> int:
+        return sum(self.__outcomes)
+
+    @property
+    def state(self) -> str:
+        if self.__opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.__opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def retry_after(self) -> float:
+        if self.__opened_at is None:
+            return 0.0
+        return max(self.__opened_at + self.recovery_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        state: str = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.__probing:
+            # a single call probes whether the provider has recovered.
+            self.__probing = True
+            return True
+        return False
+
+    def success(self) -> None:
+        if self.__probing:
+            # the provider has recovered.
+            self.__outcomes.clear()
+            self.__opened_at = None
+            self.__probing = False
+        elif self.__opened_at is None:
+            self.__outcomes.append(False)
+
+    def failure(self) -> None:
+        if self.__probing or self.__opened_at is None:
+            self.__outcomes.append(True)
+            if self.__probing or self.failures >= self.failure_threshold:
+                self.__opened_at = time.monotonic()
+        self.__probing = False
+
+    def abandon(self) -> None:
+        # the call never reached the provider, so it tells nothing about it.
+        self.__probing = False
+
+
+class Bulkhead:
+    def __init__(
+        self,
+        max_concurrent: int = 20,
+        queue_timeout: float = 5.0,
+        max_waiting: typing.Optional[int] = None,
+    ) -> None:
+        self.max_concurrent: int = max_concurrent
+        self.queue_timeout: float = queue_timeout
+        self.max_waiting: typing.Optional[int] = max_waiting
+        self.waiting: int = 0
+        self.__semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrent)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, provider: str) -> typing.AsyncIterator[None]:
+        if self.max_waiting is not None and self.waiting >= self.max_waiting:
+            raise ProviderUnavailable(provider, "too many pending calls")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.__semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ProviderUnavailable(provider, "too many pending calls")
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self.__semaphore.release()
+
+
+class ProviderGuard:
+    # bounds the concurrent calls to a provider, and stops calling it for a
+    # while once it keeps failing, instead of piling up slow requests.
+    def __init__(self, provider: str, bulkhead: Bulkhead, breaker: CircuitBreaker):
+        self.provider: str = provider
+        self.bulkhead: Bulkhead = bulkhead
+        self.breaker: CircuitBreaker = breaker
+
+    def check(self) -> None:
+        if self.breaker.state == CircuitBreaker.OPEN:
+            raise ProviderUnavailable(
+                self.provider, "circuit open", self.breaker.retry_after
+            )
+
+    async def call(
+        self,
+        func: typing.Callable[[], typing.Awaitable[T]],
+        is_failure: typing.Optional[typing.Callable[[T], bool]] = None,
+    ) -> T:
+        if not self.breaker.allow():
+            raise ProviderUnavailable(
+                self.provider, "circuit open", self.breaker.retry_after
+            )
+        try:
+            async with self.bulkhead.slot(self.provider):
+                result: T = await func()
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            self.breaker.failure()
+            raise
+        except OAuthError:
+            # an error response, e.g. an invalid code, the provider is fine.
+            self.breaker.success()
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        if is_failure is not None and is_failure(result):
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+        return result
+
+
+class ProviderGuards:
+    def __init__(
+        self,
+        max_concurrent: int = 20,
+        queue_timeout: float = 5.0,
+        max_waiting: typing.Optional[int] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        overrides: typing.Optional[dict[str, dict[str, typing.Any]]] = None,
+        maxsize: int = 1024,
+    ) -> None:
+        self.defaults: dict[str, typing.Any] = {
+            "max_concurrent": max_concurrent,
+            "queue_timeout": queue_timeout,
+            "max_waiting": max_waiting,
+            "failure_threshold": failure_threshold,
+            "recovery_timeout": recovery_timeout,
+        }
+        # e.g. {"github": {"max_concurrent": 50}}, given to a method's name
+        # they apply to all of its tenants as well.
+        self.overrides: dict[str, dict[str, typing.Any]] = overrides or {}
+        self.__guards: LRUCache[str, ProviderGuard] = LRUCache(maxsize=maxsize)
+
+    def get(self, provider: str) -> ProviderGuard:
+        guard: typing.Optional[ProviderGuard] = self.__guards.get(provider)
+        if guard is None:
+            options: dict[str, typing.Any] = {
+                **self.defaults,
+                **self.overrides.get(provider.partition(":")[0], {}),
+                **self.overrides.get(provider, {}),
+            }
+            guard = ProviderGuard(
+                provider,
+                Bulkhead(
+                    options["max_concurrent"],
+                    options["queue_timeout"],
+                    options["max_waiting"],
+                ),
+                CircuitBreaker(
+                    options["failure_threshold"], options["recovery_timeout"]
+                ),
+            )
+            self.__guards.set(provider, guard)
+        return guard
+
+
+class LatencyWindow:
+    # the latencies of the last ``size`` calls, the hedging delay is taken
+    # from them.
+    def __init__(self, size: int = 200) -> None:
+        self.__samples: collections.deque[float] = collections.deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self.__samples)
+
+    def observe(self, latency: float) -> None:
+        self.__samples.append(latency)
+
+    def percentile(self, q: float) -> float:
+        ordered: list[float] = sorted(self.__samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class RetryPolicy:
+    # the retries of idempotent calls only (e.g. the userinfo GETs), never of
+    # the code exchange, as a code can only be used once.
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.05,
+        max_backoff: float = 1.0,
+        hedge_percentile: typing.Optional[float] = None,
+        hedge_min_samples: int = 20,
+        retry_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504}),
+    ) -> None:
+        self.attempts: int = attempts
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        # e.g. 0.95, a second request is sent once the first one is slower
+        # than 95% of the recent ones.
+        self.hedge_percentile: typing.Optional[float] = hedge_percentile
+        self.hedge_min_samples: int = hedge_min_samples
+        self.retry_statuses: frozenset[int] = retry_statuses
+
+    def backoff_delay(self, attempt: int) -> float:
+        # full jitter, so the retries of many logins don't line up.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def hedge_delay(self, latencies: LatencyWindow) -> typing.Optional[float]:
+        if self.hedge_percentile is None or len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies.percentile(self.hedge_percentile)
+
+    def retryable(self, resp: httpx.Response) -> bool:
+        return resp.status_code in self.retry_statuses
+
+    async def __hedged(
+        self,
+        call: typing.Callable[[], typing.Awaitable[httpx.Response]],
+        latencies: LatencyWindow,
+    ) -> httpx.Response:
+        async def timed() -> httpx.Response:
+            started: float = time.monotonic()
+            resp: httpx.Response = await call()
+            latencies.observe(time.monotonic() - started)
+            return resp
+
+        delay: typing.Optional[float] = self.hedge_delay(latencies)
+        if delay is None:
+            return await timed()
+
+        pending: set[asyncio.Future[httpx.Response]] = {asyncio.ensure_future(timed())}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                # the first request is slower than usual, a second one races it.
+                pending.add(asyncio.ensure_future(timed()))
+            fallback: typing.Optional[httpx.Response] = None
+            error: typing.Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif not self.retryable(task.result()):
+                        return task.result()
+                    else:
+                        fallback = task.result()
+            if fallback is not None:
+                return fallback
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def run(
+        self,
+        call: typing.Callable[[], typing.Awaitable[httpx.Response]],
+        latencies: LatencyWindow,
+        deadline: typing.Optional[float] = None,
+    ) -> httpx.Response:
+        # ``deadline`` (``time.monotonic``) stops retrying when the next
+        # attempt wouldn't start before it.
+        attempt: int = 0
+        while True:
+            resp: typing.Optional[httpx.Response] = None
+            error: typing.Optional[httpx.TransportError] = None
+            try:
+                resp = await self.__hedged(call, latencies)
+            except httpx.TransportError as exc:
+                error = exc
+            if resp is not None and not self.retryable(resp):
+                return resp
+            delay: float = self.backoff_delay(attempt)
+            attempt += 1
+            if attempt >= self.attempts or (
+                deadline is not None and time.monotonic() + delay >= deadline
+            ):
+                if error is not None:
+                    raise error
+                assert resp is not None
+                return resp
+            await asyncio.sleep(delay)
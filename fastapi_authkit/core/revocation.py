@@ -0,0 +1,238 @@
+import asyncio
+import contextlib
+import fcntl
+import logging
+import math
+import os
+import threading
+import time
+import typing
+
+log = logging.getLogger(__name__)
+
+# the digests and expiries of the revocations read from the log.
+Entries = list[tuple[bytes, typing.Optional[float]]]
+
+
+class BloomFilter:
+    # the digests are sha256 already, so their bytes are used as the hashes.
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity: int = capacity
+        self.size: int = max(
+            int(-capacity * math.log(error_rate) / math.log(2) ** 2), 64
+        )
+        self.hashes: int = max(round(self.size / capacity * math.log(2)), 1)
+        self.__bits: bytearray = bytearray((self.size + 7) // 8)
+
+    def add(self, digest: bytes) -> None:
+        first: int = int.from_bytes(digest[:8], "little")
+        second: int = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.hashes):
+            position: int = (first + i * second) % self.size
+            self.__bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        first: int = int.from_bytes(digest[:8], "little")
+        second: int = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.hashes):
+            position: int = (first + i * second) % self.size
+            if not self.__bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationList:
+    # the digests of the revoked tokens until they expire. Nearly every token
+    # checked isn't revoked, which the bloom filter tells without a lookup,
+    # the exact set only settles its false positives.
+    def __init__(
+        self,
+        path: typing.Optional[str | os.PathLike[str]] = None,
+        capacity: int = 10000,
+        error_rate: float = 0.001,
+        purge_interval: float = 60,
+        sync_interval: float = 1,
+    ) -> None:
+        # an append-only log of the revocations, shared by the workers. each
+        # one replays what the others appended every ``sync_interval``.
+        self.path: typing.Optional[str | os.PathLike[str]] = path
+        self.error_rate: float = error_rate
+        self.purge_interval: float = purge_interval
+        self.sync_interval: float = sync_interval
+        self.__lock: threading.Lock = threading.Lock()
+        self.__revoked: dict[bytes, typing.Optional[float]] = {}
+        self.__filter: BloomFilter = BloomFilter(capacity, error_rate)
+        self.__purge_at: float = time.time() + purge_interval
+        # the log file read so far, compaction replaces it with another one.
+        self.__inode: typing.Optional[int] = None
+        self.__offset: int = 0
+        self.__logged: int = 0
+        self.__syncer: typing.Optional[asyncio.Task[None]] = None
+
+    def __len__(self) -> int:
+        return len(self.__revoked)
+
+    def is_revoked(self, digest: bytes) -> bool:
+        return digest in self.__filter and digest in self.__revoked
+
+    def add(self, digest: bytes, expires_at: typing.Optional[float]) -> None:
+        self.__revoked[digest] = expires_at
+        if len(self.__revoked) > self.__filter.capacity:
+            self.rebuild()
+        else:
+            self.__filter.add(digest)
+
+    def rebuild(self) -> None:
+        # entries can't be removed from a bloom filter, so it is built anew
+        # from the exact set, twice as large as needed to leave room.
+        self.__filter = BloomFilter(
+            max(self.__filter.capacity, 2 * len(self.__revoked)), self.error_rate
+        )
+        for digest in self.__revoked:
+            self.__filter.add(digest)
+
+    def purge(self) -> None:
+        now: float = time.time()
+        self.__purge_at = now + self.purge_interval
+        expired: list[bytes] = [
+            digest
+            for digest, expires_at in self.__revoked.items()
+            if expires_at is not None and expires_at <= now
+        ]
+        if expired:
+            for digest in expired:
+                del self.__revoked[digest]
+            self.rebuild()
+
+    @contextlib.contextmanager
+    def __locked(self) -> typing.Iterator[None]:
+        # the lock file is never replaced, unlike the log, so every worker
+        # locks the same file whatever the compactions.
+        assert self.path is not None
+        with self.__lock, open(os.fspath(self.path) + ".lock", "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def __append(self, digest: bytes, expires_at: typing.Optional[float]) -> None:
+        # the log is opened once the lock is held, so never a replaced one.
+        assert self.path is not None
+        with self.__locked(), open(self.path, "a") as logfile:
+            logfile.write(f"{digest.hex()} {expires_at if expires_at else '-'}\n")
+
+    async def revoke(self, digest: bytes, expires_at: typing.Optional[float]) -> None:
+        if expires_at is not None and expires_at <= time.time():
+            return
+        self.add(digest, expires_at)
+        if time.time() >= self.__purge_at:
+            self.purge()
+        if self.path is not None:
+            await asyncio.to_thread(self.__append, digest, expires_at)
+
+    def __read(self) -> Entries:
+        # called with the lock held, the unexpired entries appended since the
+        # last read, or the whole log if it has been compacted since.
+        assert self.path is not None
+        now: float = time.time()
+        entries: Entries = []
+        try:
+            logfile: typing.BinaryIO = open(self.path, "rb")
+        except FileNotFoundError:
+            return entries
+        with logfile:
+            inode: int = os.fstat(logfile.fileno()).st_ino
+            if inode != self.__inode:
+                self.__inode, self.__offset, self.__logged = inode, 0, 0
+            logfile.seek(self.__offset)
+            for line in logfile:
+                if not line.endswith(b"\n"):
+                    break
+                self.__offset += len(line)
+                self.__logged += 1
+                digest, _, expires = line.decode().strip().partition(" ")
+                if not digest:
+                    continue
+                expires_at: typing.Optional[float] = (
+                    float(expires) if expires not in ("", "-") else None
+                )
+                if expires_at is None or expires_at > now:
+                    entries.append((bytes.fromhex(digest), expires_at))
+        return entries
+
+    def __tail(self) -> Entries:
+        with self.__locked():
+            return self.__read()
+
+    def __compact(self) -> Entries:
+        # the log is re-read with the lock held, so nothing the other workers
+        # appended since the last read is lost by the replacement.
+        assert self.path is not None
+        with self.__locked():
+            self.__inode = None
+            entries: Entries = self.__read()
+            now: float = time.time()
+            live: dict[bytes, typing.Optional[float]] = dict(self.__revoked)
+            live.update(entries)
+            lines: list[str] = [
+                f"{digest.hex()} {expires_at if expires_at else '-'}\n"
+                for digest, expires_at in live.items()
+                if expires_at is None or expires_at > now
+            ]
+            compacted: str = os.fspath(self.path) + ".tmp"
+            with open(compacted, "w") as logfile:
+                logfile.writelines(lines)
+                logfile.flush()
+                os.fsync(logfile.fileno())
+                self.__inode = os.fstat(logfile.fileno()).st_ino
+                self.__offset = logfile.tell()
+            self.__logged = len(lines)
+            os.replace(compacted, self.path)
+        return entries
+
+    def __apply(self, entries: Entries) -> None:
+        for digest, expires_at in entries:
+            self.add(digest, expires_at)
+        if time.time() >= self.__purge_at:
+            self.purge()
+
+    def __bloated(self) -> bool:
+        # the log is mostly expired or repeated entries.
+        return self.__logged > 2 * len(self.__revoked) + 1000
+
+    def sync(self) -> None:
+        # picks up the revocations appended by the other workers.
+        if self.path is not None:
+            self.__apply(self.__tail())
+
+    def load(self) -> None:
+        # replays the log, and compacts it down to the unexpired revocations.
+        if self.path is not None:
+            self.__apply(self.__compact())
+            self.rebuild()
+
+    async def __sync_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            # the file is read in a thread, the set is only changed here.
+            try:
+                if self.path is None:
+                    self.__apply([])
+                    continue
+                self.__apply(await asyncio.to_thread(self.__tail))
+                if self.__bloated():
+                    self.__apply(await asyncio.to_thread(self.__compact))
+            except OSError:
+                log.exception("failed to sync the revocations from %s", self.path)
+
+    async def start(self) -> None:
+        if self.__syncer is None:
+            self.__syncer = asyncio.ensure_future(self.__sync_forever())
+
+    async def stop(self) -> None:
+        if self.__syncer is not None:
+            self.__syncer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__syncer
+            self.__syncer = None
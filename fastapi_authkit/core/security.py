@@ -0,0 +1,119 @@
+import hashlib
+import typing
+
+from authlib.jose import JsonWebToken
+from authlib.jose import JWTClaims
+from authlib.jose.errors import InvalidTokenError
+from authlib.jose.errors import JoseError
+
+from .cache import LRUCache
+from .revocation import RevocationList
+
+if typing.TYPE_CHECKING:
+    import fastapi
+
+
+class TokenVerifier:
+    def __init__(
+        self,
+        key: typing.Any,
+        algorithms: typing.Iterable[str] = ("HS256",),
+        claims_options: typing.Optional[dict[str, typing.Any]] = None,
+        leeway: int = 0,
+        cache_size: int = 4096,
+        revocations: typing.Optional[RevocationList] = None,
+    ) -> None:
+        self.key: typing.Any = key
+        self.jwt: JsonWebToken = JsonWebToken(list(algorithms))
+        self.claims_options: typing.Optional[dict[str, typing.Any]] = claims_options
+        self.leeway: int = leeway
+        # verified claims are cached by the token digest until the token
+        # expires, so a token is only checked once per worker.
+        self.cache: typing.Optional[LRUCache[bytes, JWTClaims]] = (
+            LRUCache(maxsize=cache_size) if cache_size else None
+        )
+        self.revocations: RevocationList = (
+            revocations if revocations is not None else RevocationList()
+        )
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def decode(self, token: str) -> JWTClaims:
+        claims: JWTClaims = self.jwt.decode(
+            token,
+            self.key,
+            claims_options=self.claims_options,
+        )
+        claims.validate(leeway=self.leeway)
+        return claims
+
+    def verify(self, token: str) -> JWTClaims:
+        digest: bytes = self.digest(token)
+        if self.revocations.is_revoked(digest):
+            raise InvalidTokenError(description="The token has been revoked.")
+        if self.cache is None:
+            return self.decode(token)
+
+        claims: typing.Optional[JWTClaims] = self.cache.get(digest)
+        if claims is not None:
+            return claims
+
+        claims = self.decode(token)
+        exp: typing.Any = claims.get("exp")
+        self.cache.set(
+            digest,
+            claims,
+            expires_at=float(exp) + self.leeway if exp is not None else None,
+        )
+        return claims
+
+    @staticmethod
+    def unauthorized(error: Exception) -> "fastapi.HTTPException":
+        # fastapi is only imported by the dependency, verifying tokens alone
+        # doesn't need it.
+        import fastapi
+
+        return fastapi.HTTPException(
+            fastapi.status.HTTP_401_UNAUTHORIZED,
+            detail=getattr(error, "description", None) or str(error),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    async def revoke(self, token: str) -> JWTClaims:
+        # only a valid token can be revoked, it stays revoked until it expires.
+        claims: JWTClaims = self.verify(token)
+        exp: typing.Any = claims.get("exp")
+        digest: bytes = self.digest(token)
+        await self.revocations.revoke(
+            digest, float(exp) + self.leeway if exp is not None else None
+        )
+        if self.cache is not None:
+            self.cache.pop(digest)
+        return claims
+
+    def dependency(
+        self, auto_error: bool = True
+    ) -> typing.Callable[..., typing.Awaitable[typing.Optional[JWTClaims]]]:
+        import fastapi
+        from fastapi.security import HTTPAuthorizationCredentials
+        from fastapi.security import HTTPBearer
+
+        bearer: HTTPBearer = HTTPBearer(auto_error=auto_error)
+
+        async def require_user(
+            credentials: typing.Optional[
+                HTTPAuthorizationCredentials
+            ] = fastapi.Depends(bearer),
+        ) -> typing.Optional[JWTClaims]:
+            if credentials is None:
+                return None
+            try:
+                return self.verify(credentials.credentials)
+            except (JoseError, ValueError) as error:
+                if not auto_error:
+                    return None
+                raise self.unauthorized(error)
+
+        return require_user
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import typing
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..interfaces.session import ISessionBackend
+from .cache import LRUCache
+
+
+class MemorySessionBackend(ISessionBackend):
+    def __init__(self, maxsize: int = 10000) -> None:
+        # sessions are stored serialized, so a handler mutating the session
+        # never changes the stored copy behind the middleware's back.
+        self.cache: LRUCache[str, str] = LRUCache(maxsize=maxsize)
+
+    async def get(self, session_id: str) -> typing.Optional[dict[str, typing.Any]]:
+        data: typing.Optional[str] = self.cache.get(session_id)
+        return json.loads(data) if data is not None else None
+
+    async def set(
+        self, session_id: str, data: dict[str, typing.Any], max_age: int
+    ) -> None:
+        self.cache.set(session_id, json.dumps(data), expires_at=time.time() + max_age)
+
+    async def delete(self, session_id: str) -> None:
+        self.cache.pop(session_id)
+
+
+class SQLiteSessionBackend(ISessionBackend):
+    purge_every: int = 1000
+
+    def __init__(self, path: str | os.PathLike[str] = "sessions.sqlite3") -> None:
+        self.__lock: threading.Lock = threading.Lock()
+        self.__writes: int = 0
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def __get(self, session_id: str) -> typing.Optional[str]:
+        with self.__lock:
+            row = self.connection.execute(
+                "SELECT data FROM sessions WHERE id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def __set(self, session_id: str, data: str, expires_at: float) -> None:
+        with self.__lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires_at) "
+                "VALUES (?, ?, ?)",
+                (session_id, data, expires_at),
+            )
+            self.__writes += 1
+            if self.__writes % self.purge_every == 0:
+                self.connection.execute(
+                    "DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)
+                )
+
+    def __delete(self, session_id: str) -> None:
+        with self.__lock:
+            self.connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    async def get(self, session_id: str) -> typing.Optional[dict[str, typing.Any]]:
+        data: typing.Optional[str] = await asyncio.to_thread(self.__get, session_id)
+        return json.loads(data) if data is not None else None
+
+    async def set(
+        self, session_id: str, data: dict[str, typing.Any], max_age: int
+    ) -> None:
+        await asyncio.to_thread(
+            self.__set, session_id, json.dumps(data), time.time() + max_age
+        )
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self.__delete, session_id)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class ServerSessionMiddleware:
+    # same contract as starlette's ``SessionMiddleware`` (``request.session``)
+    # but the cookie only carries an opaque session id, the session itself
+    # lives in the backend and is only written when it has changed.
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend: ISessionBackend,
+        session_cookie: str = "session",
+        max_age: int = 14 * 24 * 60 * 60,
+        path: str = "/",
+        same_site: typing.Literal["lax", "strict", "none"] = "lax",
+        https_only: bool = False,
+    ) -> None:
+        self.app: ASGIApp = app
+        self.backend: ISessionBackend = backend
+        self.session_cookie: str = session_cookie
+        self.max_age: int = max_age
+        self.path: str = path
+        self.security_flags: str = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection: HTTPConnection = HTTPConnection(scope)
+        session_id: typing.Optional[str] = connection.cookies.get(self.session_cookie)
+        session: typing.Optional[dict[str, typing.Any]] = None
+        if session_id:
+            session = await self.backend.get(session_id)
+        if session is None:
+            # never adopt an unknown id sent by the client.
+            session_id, session = None, {}
+        scope["session"] = session
+        snapshot: str = json.dumps(session, sort_keys=True)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                headers: MutableHeaders = MutableHeaders(scope=message)
+                if scope["session"]:
+                    if json.dumps(scope["session"], sort_keys=True) != snapshot:
+                        session_id = session_id or secrets.token_urlsafe(32)
+                        await self.backend.set(
+                            session_id, scope["session"], self.max_age
+                        )
+                        headers.append("Set-Cookie", self.cookie(session_id))
+                elif session_id:
+                    await self.backend.delete(session_id)
+                    headers.append("Set-Cookie", self.cookie("null", max_age=0))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def cookie(self, value: str, max_age: typing.Optional[int] = None) -> str:
+        return "{}={}; path={}; Max-Age={}; {}".format(
+            self.session_cookie,
+            value,
+            self.path,
+            self.max_age if max_age is None else max_age,
+            self.security_flags,
+        )
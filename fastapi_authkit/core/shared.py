@@ -0,0 +1,146 @@
+import contextlib
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import typing
+
+from ..interfaces.cache import ICacheBackend
+
+MAGIC: bytes = b"AKC1"
+# magic, number of slots, slot size
+HEADER: struct.Struct = struct.Struct("<4sII")
+# key digest, expiry (0 for an empty slot), value length
+SLOT: struct.Struct = struct.Struct("<16sdI")
+
+
+class SharedCacheBackend(ICacheBackend):
+    # a fixed size hash table in a memory mapped file, so the workers of a
+    # host share a single copy of the cached entries. An entry is looked up
+    # by its key's digest among the ``probes`` slots following its hash, a
+    # full neighbourhood replaces the entry which expires first. Values which
+    # don't fit in a slot are not cached. Access is serialized with ``flock``
+    # (shared for reads), all the workers must use the same layout.
+    def __init__(
+        self,
+        path: str | os.PathLike[str] = "authkit.cache",
+        slots: int = 4096,
+        slot_size: int = 8192,
+        probes: int = 8,
+    ) -> None:
+        self.slots: int = slots
+        self.slot_size: int = slot_size
+        self.probes: int = min(probes, slots)
+        self.__lock: threading.Lock = threading.Lock()
+        self.__fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size: int = HEADER.size + slots * slot_size
+        with self.__locked(fcntl.LOCK_EX):
+            header: bytes = os.pread(self.__fd, HEADER.size, 0)
+            if len(header) < HEADER.size or header[:4] != MAGIC:
+                # a new file, the slots are zeroed (empty) by the truncate.
+                os.ftruncate(self.__fd, size)
+                header = HEADER.pack(MAGIC, slots, slot_size)
+                os.pwrite(self.__fd, header, 0)
+        if HEADER.unpack(header)[1:] != (slots, slot_size):
+            os.close(self.__fd)
+            raise ValueError(f"{path} is a cache of another layout.")
+        self.__map: mmap.mmap = mmap.mmap(self.__fd, size)
+
+    @contextlib.contextmanager
+    def __locked(self, operation: int) -> typing.Iterator[None]:
+        # flock doesn't exclude the threads of a process from each other.
+        with self.__lock:
+            fcntl.flock(self.__fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+    def __neighbourhood(self, digest: bytes) -> typing.Iterator[int]:
+        first: int = int.from_bytes(digest[:8], "little") % self.slots
+        for i in range(self.probes):
+            yield HEADER.size + (first + i) % self.slots * self.slot_size
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        digest: bytes = self.digest(key)
+        with self.__locked(fcntl.LOCK_SH):
+            for offset in self.__neighbourhood(digest):
+                slot_digest, expires_at, length = SLOT.unpack_from(self.__map, offset)
+                if slot_digest == digest and expires_at:
+                    if expires_at <= time.time():
+                        return None
+                    start: int = offset + SLOT.size
+                    end: int = start + length
+                    return self.__map[start:end]
+        return None
+
+    def __store(
+        self, digest: bytes, value: bytes, expires_at: float, replace: bool
+    ) -> bool:
+        # called with the exclusive lock held.
+        now: float = time.time()
+        same: typing.Optional[int] = None
+        free: typing.Optional[int] = None
+        soonest: typing.Optional[tuple[float, int]] = None
+        for offset in self.__neighbourhood(digest):
+            slot_digest, slot_expires_at, _ = SLOT.unpack_from(self.__map, offset)
+            if slot_digest == digest and slot_expires_at:
+                if not replace and slot_expires_at > now:
+                    return False
+                same = offset
+                break
+            if slot_expires_at <= now:
+                free = free if free is not None else offset
+            elif soonest is None or slot_expires_at < soonest[0]:
+                soonest = (slot_expires_at, offset)
+        target: int
+        if same is not None:
+            target = same
+        elif free is not None:
+            target = free
+        else:
+            assert soonest is not None
+            target = soonest[1]
+        # the slot is emptied first, so a crashed write leaves no entry.
+        SLOT.pack_into(self.__map, target, digest, 0, 0)
+        start: int = target + SLOT.size
+        end: int = start + len(value)
+        self.__map[start:end] = value
+        SLOT.pack_into(self.__map, target, digest, expires_at, len(value))
+        return True
+
+    def set(self, key: str, value: bytes, ttl: typing.Optional[float] = None) -> None:
+        if SLOT.size + len(value) > self.slot_size:
+            return
+        expires_at: float = time.time() + ttl if ttl is not None else math.inf
+        with self.__locked(fcntl.LOCK_EX):
+            self.__store(self.digest(key), value, expires_at, replace=True)
+
+    def add(self, key: str, value: bytes, ttl: typing.Optional[float] = None) -> bool:
+        # atomic across the workers. a value too large to be cached can't be
+        # found either, so it counts as added.
+        if SLOT.size + len(value) > self.slot_size:
+            return True
+        expires_at: float = time.time() + ttl if ttl is not None else math.inf
+        with self.__locked(fcntl.LOCK_EX):
+            return self.__store(self.digest(key), value, expires_at, replace=False)
+
+    def delete(self, key: str) -> None:
+        digest: bytes = self.digest(key)
+        with self.__locked(fcntl.LOCK_EX):
+            for offset in self.__neighbourhood(digest):
+                slot_digest, expires_at, _ = SLOT.unpack_from(self.__map, offset)
+                if slot_digest == digest and expires_at:
+                    SLOT.pack_into(self.__map, offset, digest, 0, 0)
+
+    def close(self) -> None:
+        self.__map.close()
+        os.close(self.__fd)
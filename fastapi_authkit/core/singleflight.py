@@ -0,0 +1,38 @@
+import asyncio
+import typing
+
+T = typing.TypeVar("T")
+
+
+class SingleFlight(typing.Generic[T]):
+    # concurrent calls with the same key share the result of the first one,
+    # instead of each doing the same (network or database) work.
+    def __init__(self) -> None:
+        self.__calls: dict[typing.Hashable, asyncio.Future[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__calls)
+
+    async def do(
+        self,
+        key: typing.Hashable,
+        func: typing.Callable[[], typing.Awaitable[T]],
+    ) -> tuple[T, bool]:
+        # returns the result and whether it was coalesced, i.e. ``func`` ran
+        # for another caller. results which tell something to the caller
+        # itself (e.g. a signup) only hold for the caller which ran it.
+        future: typing.Optional[asyncio.Future[T]] = self.__calls.get(key)
+        coalesced: bool = future is not None
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.__calls[key] = future
+            future.add_done_callback(lambda done: self.__forget(key, done))
+        # a cancelled caller must not cancel the call the others wait for.
+        return await asyncio.shield(future), coalesced
+
+    def __forget(self, key: typing.Hashable, future: asyncio.Future[T]) -> None:
+        if self.__calls.get(key) is future:
+            del self.__calls[key]
+        if not future.cancelled():
+            # mark the exception as retrieved, the waiting callers get it.
+            future.exception()
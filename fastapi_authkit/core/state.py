@@ -0,0 +1,37 @@
+import base64
+import hashlib
+import hmac
+import json
+import typing
+
+from cryptography.fernet import Fernet
+from cryptography.fernet import InvalidToken
+
+
+class StateSerializer:
+    # the authorization data of a login (redirect uri, nonce and PKCE code
+    # verifier) travels encrypted in the ``state`` itself, instead of in the
+    # session, so any node can complete the callback. It is encrypted, not
+    # only signed, as the state shows up in urls and the code verifier must
+    # stay secret.
+    def __init__(self, secret_key: str, salt: str, max_age: int = 600) -> None:
+        key: bytes = hmac.new(
+            secret_key.encode(), salt.encode(), hashlib.sha256
+        ).digest()
+        self.fernet: Fernet = Fernet(base64.urlsafe_b64encode(key))
+        self.max_age: int = max_age
+
+    def dumps(self, data: dict[str, typing.Any]) -> str:
+        payload: bytes = json.dumps(data, separators=(",", ":")).encode()
+        return self.fernet.encrypt(payload).decode()
+
+    def loads(
+        self, state: typing.Optional[str]
+    ) -> typing.Optional[dict[str, typing.Any]]:
+        # None when the state is missing, forged or older than ``max_age``.
+        if not state:
+            return None
+        try:
+            return json.loads(self.fernet.decrypt(state.encode(), ttl=self.max_age))
+        except (InvalidToken, ValueError):
+            return None
@@ -0,0 +1,178 @@
+import inspect
+import re
+import typing
+
+import fastapi
+
+from .. import OAuthApp
+
+from .cache import LRUCache
+from .oauth import AuthVia
+from .oauth import OAuth
+from .oauth import StarletteOAuth1App
+from .oauth import StarletteOAuth2App
+from .oauth import Url
+from .singleflight import SingleFlight
+
+from ..interfaces.logics import IAuthLogic
+from ..interfaces.provider import AuthenticationMethod
+
+Client = StarletteOAuth1App | StarletteOAuth2App
+TenantSettings = typing.Callable[
+    [str],
+    typing.Optional[dict[str, typing.Any]]
+    | typing.Awaitable[typing.Optional[dict[str, typing.Any]]],
+]
+
+
+class TenantClientCache:
+    # the clients of the tenants in use, built on their first login and
+    # dropped (with their metadata and keys) once idle or least recently used.
+    def __init__(
+        self, oauth: OAuth, maxsize: int = 128, idle_ttl: float = 3600
+    ) -> None:
+        self.oauth: OAuth = oauth
+        self.clients: LRUCache[str, Client] = LRUCache(
+            maxsize=maxsize, ttl=idle_ttl, on_evict=self.__evicted
+        )
+        self.__inflight: SingleFlight[typing.Optional[Client]] = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    async def get(
+        self,
+        name: str,
+        load: typing.Callable[
+            [], typing.Awaitable[typing.Optional[dict[str, typing.Any]]]
+        ],
+        pool_name: typing.Optional[str] = None,
+    ) -> typing.Optional[Client]:
+        client: typing.Optional[Client] = self.clients.get(name)
+        if client is not None:
+            # every use pushes the idle deadline of the tenant back.
+            self.clients.set(name, client)
+            return client
+        client, _ = await self.__inflight.do(
+            name, lambda: self.__build(name, load, pool_name)
+        )
+        return client
+
+    async def __build(
+        self,
+        name: str,
+        load: typing.Callable[
+            [], typing.Awaitable[typing.Optional[dict[str, typing.Any]]]
+        ],
+        pool_name: typing.Optional[str],
+    ) -> typing.Optional[Client]:
+        config: typing.Optional[dict[str, typing.Any]] = await load()
+        if config is None:
+            return None
+        client: Client = self.oauth.build_client(name, pool_name=pool_name, **config)
+        self.clients.set(name, client)
+        return client
+
+    def pop(self, name: str) -> None:
+        client: typing.Optional[Client] = self.clients.pop(name)
+        if client is not None:
+            self.oauth.release_client(client)
+
+    def __evicted(self, name: str, client: Client) -> None:
+        self.oauth.release_client(client)
+
+
+class TenantAuthenticationMethod(AuthenticationMethod):
+    # one set of routes serves every tenant of the provider, ``{tenant}`` in
+    # the settings is replaced with the tenant resolved from the request.
+    tenant_pattern: typing.Pattern[str] = re.compile(r"[A-Za-z0-9][A-Za-z0-9-]{0,62}")
+
+    def __init__(
+        self,
+        name: str,
+        router: fastapi.APIRouter,
+        oauth_app: OAuthApp,
+        auth_vias: AuthVia,
+        auth_logic: IAuthLogic,
+        tenant_settings: TenantSettings,
+        max_tenants: int = 128,
+        idle_ttl: float = 3600,
+    ) -> None:
+        # ``tenant_settings`` returns the settings (e.g. the client id and
+        # secret) of a known tenant over the shared ones, or None for the
+        # others. it is required, as accepting any tenant would send the
+        # shared client secret to (and trust the tokens of) any issuer.
+        self.tenant_settings: TenantSettings = tenant_settings
+        self.tenants: TenantClientCache = TenantClientCache(
+            oauth_app.oauth, maxsize=max_tenants, idle_ttl=idle_ttl
+        )
+        super().__init__(name, router, oauth_app, auth_vias, auth_logic)
+
+    def register(self) -> None:
+        # nothing is registered up front, the tenants' clients are built on
+        # their first use.
+        pass
+
+    def create_authenticator(self) -> AuthVia.Authenticator:
+        return AuthVia.Authenticator(
+            self.auth_vias.get_context(self.name), self.get_urls(), None
+        )
+
+    def get_urls(self) -> list[Url]:
+        self.login_url = Url("{tenant}/login")
+        self.auth_url = Url("{tenant}/authorize")
+        return [self.login_url, self.auth_url]
+
+    def resolve_tenant(self, request: fastapi.Request) -> str:
+        tenant: str = request.path_params.get("tenant", "")
+        # the tenant ends up in the provider's urls, so only plain host labels
+        # are accepted.
+        if not self.tenant_pattern.fullmatch(tenant):
+            raise fastapi.HTTPException(
+                fastapi.status.HTTP_404_NOT_FOUND, detail="unknown tenant"
+            )
+        return tenant
+
+    def get_provider_name(self, request: fastapi.Request) -> str:
+        return self.name + ":" + self.resolve_tenant(request)
+
+    def get_redirect_uri(self, request: fastapi.Request) -> str:
+        return (
+            super()
+            .get_redirect_uri(request)
+            .replace("{tenant}", self.resolve_tenant(request))
+        )
+
+    async def load_tenant(self, tenant: str) -> typing.Optional[dict[str, typing.Any]]:
+        config: dict[str, typing.Any] = self.settings.dict(exclude={"name"})
+        overrides = self.tenant_settings(tenant)
+        if inspect.isawaitable(overrides):
+            overrides = await overrides
+        if overrides is None:
+            return None
+        config.update(overrides)
+        return {
+            key: value.replace("{tenant}", tenant) if isinstance(value, str) else value
+            for key, value in config.items()
+        }
+
+    async def get_client(self, request: fastapi.Request) -> Client:
+        return await self.get_tenant_client(self.resolve_tenant(request))
+
+    async def get_named_client(self, provider: str) -> Client:
+        tenant: str = provider.partition(":")[2]
+        if not self.tenant_pattern.fullmatch(tenant):
+            raise ValueError(provider + " is not a tenant of " + self.name)
+        return await self.get_tenant_client(tenant)
+
+    async def get_tenant_client(self, tenant: str) -> Client:
+        client: typing.Optional[Client] = await self.tenants.get(
+            self.name + ":" + tenant,
+            lambda: self.load_tenant(tenant),
+            pool_name=self.name,
+        )
+        if client is None:
+            raise fastapi.HTTPException(
+                fastapi.status.HTTP_404_NOT_FOUND, detail="unknown tenant"
+            )
+        return client
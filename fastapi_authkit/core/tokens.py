@@ -0,0 +1,312 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typing
+
+from .oauth import OAuthError
+from .oauth import StarletteOAuth1App
+from .oauth import StarletteOAuth2App
+from .singleflight import SingleFlight
+from ..interfaces.tokens import ITokenStore
+from ..interfaces.tokens import ProviderToken
+
+log = logging.getLogger(__name__)
+
+Client = StarletteOAuth1App | StarletteOAuth2App
+
+
+def clean_token(token: typing.Mapping[str, typing.Any]) -> ProviderToken:
+    # the verified id token claims are not needed to call the provider's api.
+    return {key: value for key, value in token.items() if key != "userinfo"}
+
+
+def is_refreshable(token: ProviderToken) -> bool:
+    return bool(token.get("refresh_token")) and token.get("expires_at") is not None
+
+
+class MemoryTokenStore(ITokenStore):
+    def __init__(self) -> None:
+        self.tokens: dict[tuple[str, str], str] = {}
+
+    async def get(self, provider: str, sub: str) -> typing.Optional[ProviderToken]:
+        token: typing.Optional[str] = self.tokens.get((provider, sub))
+        return json.loads(token) if token is not None else None
+
+    async def set(self, provider: str, sub: str, token: ProviderToken) -> None:
+        self.tokens[(provider, sub)] = json.dumps(token)
+
+    async def replace_many(
+        self, tokens: typing.Iterable[tuple[str, str, ProviderToken, ProviderToken]]
+    ) -> None:
+        # atomic, as nothing else runs on the loop in between.
+        for provider, sub, expected, token in tokens:
+            data: typing.Optional[str] = self.tokens.get((provider, sub))
+            if data is not None and json.loads(data) == expected:
+                self.tokens[(provider, sub)] = json.dumps(token)
+
+    async def delete(self, provider: str, sub: str) -> None:
+        self.tokens.pop((provider, sub), None)
+
+    async def expiring(
+        self, before: float, limit: int
+    ) -> list[tuple[str, str, ProviderToken]]:
+        due: list[tuple[str, str, ProviderToken]] = []
+        for (provider, sub), data in self.tokens.items():
+            token: ProviderToken = json.loads(data)
+            if is_refreshable(token) and token["expires_at"] < before:
+                due.append((provider, sub, token))
+        due.sort(key=lambda item: item[2]["expires_at"])
+        return due[:limit]
+
+
+class SQLiteTokenStore(ITokenStore):
+    def __init__(self, path: str | os.PathLike[str] = "tokens.sqlite3") -> None:
+        self.__lock: threading.Lock = threading.Lock()
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            "provider TEXT NOT NULL, sub TEXT NOT NULL, token TEXT NOT NULL, "
+            "refresh_at REAL, PRIMARY KEY (provider, sub))"
+        )
+        # only the refreshable tokens have a ``refresh_at``.
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS tokens_refresh_at ON tokens (refresh_at) "
+            "WHERE refresh_at IS NOT NULL"
+        )
+
+    @staticmethod
+    def row(
+        provider: str, sub: str, token: ProviderToken
+    ) -> tuple[str, str, str, typing.Optional[float]]:
+        refresh_at: typing.Optional[float] = (
+            float(token["expires_at"]) if is_refreshable(token) else None
+        )
+        return provider, sub, json.dumps(token), refresh_at
+
+    def __get(self, provider: str, sub: str) -> typing.Optional[str]:
+        with self.__lock:
+            row = self.connection.execute(
+                "SELECT token FROM tokens WHERE provider = ? AND sub = ?",
+                (provider, sub),
+            ).fetchone()
+        return row[0] if row else None
+
+    def __set_many(
+        self, rows: list[tuple[str, str, str, typing.Optional[float]]]
+    ) -> None:
+        with self.__lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO tokens (provider, sub, token, refresh_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def __replace_many(
+        self, rows: list[tuple[str, typing.Optional[float], str, str, str]]
+    ) -> None:
+        with self.__lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany(
+                    "UPDATE tokens SET token = ?, refresh_at = ? "
+                    "WHERE provider = ? AND sub = ? AND token = ?",
+                    rows,
+                )
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def __delete(self, provider: str, sub: str) -> None:
+        with self.__lock:
+            self.connection.execute(
+                "DELETE FROM tokens WHERE provider = ? AND sub = ?", (provider, sub)
+            )
+
+    def __expiring(self, before: float, limit: int) -> list[tuple[str, str, str]]:
+        with self.__lock:
+            return self.connection.execute(
+                "SELECT provider, sub, token FROM tokens "
+                "WHERE refresh_at IS NOT NULL AND refresh_at < ? "
+                "ORDER BY refresh_at LIMIT ?",
+                (before, limit),
+            ).fetchall()
+
+    async def get(self, provider: str, sub: str) -> typing.Optional[ProviderToken]:
+        token: typing.Optional[str] = await asyncio.to_thread(self.__get, provider, sub)
+        return json.loads(token) if token is not None else None
+
+    async def set(self, provider: str, sub: str, token: ProviderToken) -> None:
+        await asyncio.to_thread(self.__set_many, [self.row(provider, sub, token)])
+
+    async def set_many(
+        self, tokens: typing.Iterable[tuple[str, str, ProviderToken]]
+    ) -> None:
+        rows = [self.row(provider, sub, token) for provider, sub, token in tokens]
+        if rows:
+            await asyncio.to_thread(self.__set_many, rows)
+
+    async def replace_many(
+        self, tokens: typing.Iterable[tuple[str, str, ProviderToken, ProviderToken]]
+    ) -> None:
+        # the stored tokens are the json of ``row``, so the expected one is
+        # compared the same way.
+        rows: list[tuple[str, typing.Optional[float], str, str, str]] = []
+        for provider, sub, expected, token in tokens:
+            _, _, data, refresh_at = self.row(provider, sub, token)
+            rows.append((data, refresh_at, provider, sub, json.dumps(expected)))
+        if rows:
+            await asyncio.to_thread(self.__replace_many, rows)
+
+    async def delete(self, provider: str, sub: str) -> None:
+        await asyncio.to_thread(self.__delete, provider, sub)
+
+    async def expiring(
+        self, before: float, limit: int
+    ) -> list[tuple[str, str, ProviderToken]]:
+        rows = await asyncio.to_thread(self.__expiring, before, limit)
+        return [(provider, sub, json.loads(token)) for provider, sub, token in rows]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class TokenRefresher:
+    # refreshes the stored tokens in batches ``margin`` seconds before they
+    # expire, so the calls made on the users' behalf rarely wait on one.
+    def __init__(
+        self,
+        store: ITokenStore,
+        resolve: typing.Callable[[str], typing.Awaitable[Client]],
+        interval: float = 30,
+        margin: float = 300,
+        batch_size: int = 100,
+        concurrency: int = 10,
+        retry_after: float = 60,
+    ) -> None:
+        self.store: ITokenStore = store
+        self.resolve: typing.Callable[[str], typing.Awaitable[Client]] = resolve
+        self.interval: float = interval
+        self.margin: float = margin
+        self.batch_size: int = batch_size
+        self.concurrency: int = concurrency
+        self.retry_after: float = retry_after
+        self.__inflight: SingleFlight[ProviderToken] = SingleFlight()
+        self.__retry_at: dict[tuple[str, str], float] = {}
+        self.__refresher: typing.Optional[asyncio.Task[None]] = None
+
+    async def __refresh(
+        self, provider: str, sub: str, token: ProviderToken
+    ) -> ProviderToken:
+        client: Client = await self.resolve(provider)
+        refreshed: ProviderToken = clean_token(
+            await client.fetch_access_token(
+                grant_type="refresh_token", refresh_token=token["refresh_token"]
+            )
+        )
+        # providers may keep the refresh token as it is and not send it back.
+        refreshed.setdefault("refresh_token", token["refresh_token"])
+        return refreshed
+
+    async def refresh(
+        self, provider: str, sub: str, token: ProviderToken
+    ) -> ProviderToken:
+        refreshed, _ = await self.__inflight.do(
+            (provider, sub), lambda: self.__refresh(provider, sub, token)
+        )
+        return refreshed
+
+    async def get_token(
+        self, provider: str, sub: str, leeway: float = 30
+    ) -> typing.Optional[ProviderToken]:
+        token: typing.Optional[ProviderToken] = await self.store.get(provider, sub)
+        if (
+            token is not None
+            and is_refreshable(token)
+            and token["expires_at"] <= time.time() + leeway
+        ):
+            # the background refresh is behind, refresh it inline.
+            refreshed: ProviderToken = await self.refresh(provider, sub, token)
+            await self.store.replace_many([(provider, sub, token, refreshed)])
+            token = refreshed
+        return token
+
+    async def refresh_due(self) -> int:
+        now: float = time.time()
+        self.__retry_at = {
+            key: retry_at for key, retry_at in self.__retry_at.items() if retry_at > now
+        }
+        # the failed tokens are skipped until their retry, but still returned
+        # by the store, so they must not take the place of the others.
+        due = [
+            (provider, sub, token)
+            for provider, sub, token in await self.store.expiring(
+                now + self.margin, self.batch_size + len(self.__retry_at)
+            )
+            if (provider, sub) not in self.__retry_at
+        ][: self.batch_size]
+
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(
+            provider: str, sub: str, token: ProviderToken
+        ) -> ProviderToken:
+            async with semaphore:
+                return await self.refresh(provider, sub, token)
+
+        results = await asyncio.gather(
+            *(bounded(*item) for item in due), return_exceptions=True
+        )
+        refreshed: list[tuple[str, str, ProviderToken, ProviderToken]] = []
+        for (provider, sub, token), result in zip(due, results):
+            if isinstance(result, OAuthError) and result.error == "invalid_grant":
+                # revoked or expired refresh token, only a new login helps.
+                log.info("dropping the revoked %s token of %s", provider, sub)
+                await self.store.delete(provider, sub)
+            elif isinstance(result, BaseException):
+                log.warning(
+                    "failed to refresh %s token of %s: %s", provider, sub, result
+                )
+                self.__retry_at[(provider, sub)] = now + self.retry_after
+            else:
+                refreshed.append((provider, sub, token, result))
+        # a user who logged in again meanwhile has a newer token, which stays.
+        await self.store.replace_many(refreshed)
+        return len(due)
+
+    async def __refresh_forever(self) -> None:
+        while True:
+            try:
+                count: int = await self.refresh_due()
+            except Exception:
+                log.exception("failed to refresh the due tokens")
+                count = 0
+            # a full batch means there are more tokens due, go on right away.
+            if count < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self.__refresher is None:
+            self.__refresher = asyncio.ensure_future(self.__refresh_forever())
+
+    async def stop(self) -> None:
+        if self.__refresher is not None:
+            self.__refresher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__refresher
+            self.__refresher = None
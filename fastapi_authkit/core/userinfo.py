@@ -0,0 +1,79 @@
+import json
+import typing
+
+from ..interfaces.cache import ICacheBackend
+from .cache import MemoryCacheBackend
+from .oauth import UserInfoModel
+
+
+class UserInfoCacheEntry:
+    def __init__(
+        self,
+        userinfo: UserInfoModel,
+        etag: typing.Optional[str] = None,
+        last_modified: typing.Optional[str] = None,
+    ) -> None:
+        self.userinfo: UserInfoModel = userinfo
+        self.etag: typing.Optional[str] = etag
+        self.last_modified: typing.Optional[str] = last_modified
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class UserInfoCache:
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 7 * 24 * 60 * 60,
+        backend: typing.Optional[ICacheBackend] = None,
+    ) -> None:
+        self.ttl: float = ttl
+        self.backend: ICacheBackend = backend or MemoryCacheBackend(maxsize)
+
+    @staticmethod
+    def key(provider: str, sub: str) -> str:
+        return f"userinfo:{provider}:{sub}"
+
+    def get(self, provider: str, sub: str) -> typing.Optional[UserInfoCacheEntry]:
+        data: typing.Optional[bytes] = self.backend.get(self.key(provider, sub))
+        if data is None:
+            return None
+        entry: dict[str, typing.Any] = json.loads(data)
+        # the values were validated before being cached, validating them
+        # again would turn the booleans into strings.
+        return UserInfoCacheEntry(
+            UserInfoModel.construct(**entry["userinfo"]),
+            entry["etag"],
+            entry["last_modified"],
+        )
+
+    def set(
+        self,
+        provider: str,
+        userinfo: UserInfoModel,
+        etag: typing.Optional[str] = None,
+        last_modified: typing.Optional[str] = None,
+    ) -> None:
+        # without a validator the payload can't be revalidated, so there is
+        # nothing worth keeping.
+        if userinfo.sub is None or not (etag or last_modified):
+            return
+        entry: dict[str, typing.Any] = {
+            "userinfo": userinfo.dict(),
+            "etag": etag,
+            "last_modified": last_modified,
+        }
+        self.backend.set(
+            self.key(provider, userinfo.sub),
+            json.dumps(entry, separators=(",", ":")).encode(),
+            ttl=self.ttl,
+        )
+
+    def delete(self, provider: str, sub: str) -> None:
+        self.backend.delete(self.key(provider, sub))
@@ -0,0 +1,159 @@
+import json
+import time
+import typing
+
+from .database import SQLiteDriver
+from .issuer import TokenIssuer
+from .oauth import UserInfoModel
+from ..interfaces.database import IDatabaseDriver
+from ..interfaces.database import Row
+from ..interfaces.logics import IAuthLogic
+from ..interfaces.logics import Token
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    sub TEXT NOT NULL,
+    userinfo TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_provider_sub ON users (provider, sub);
+"""
+
+UPSERT_MANY: str = (
+    "INSERT INTO users (provider, sub, userinfo, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (provider, sub) DO UPDATE SET "
+    "userinfo = excluded.userinfo, updated_at = excluded.updated_at"
+)
+
+# a new user has the same creation and update time.
+UPSERT: str = UPSERT_MANY + " RETURNING id, created_at = updated_at"
+
+# ``RETURNING`` came with sqlite 3.35.
+MIN_SQLITE_VERSION: tuple[int, ...] = (3, 35)
+
+SELECT_VERSION: str = "SELECT sqlite_version()"
+
+SELECT_ID: str = "SELECT id FROM users WHERE provider = ? AND sub = ?"
+
+SELECT_USERINFO: str = "SELECT userinfo FROM users WHERE provider = ? AND sub = ?"
+
+
+class SQLiteAuthLogic(IAuthLogic):
+    # the users keyed by the provider (see ``AuthenticationMethod
+    # .get_provider_name``) and their ``sub``, a login stores the latest
+    # profile and creates the user on their first one with a single upsert.
+    # Only ``provider_login_or_signup`` (which the authentication methods
+    # call) and ``signup_many`` are namespaced by the real provider:
+    # ``login``, ``singup`` and ``login_or_signup`` aren't given one, so they
+    # keep every user under the fixed ``provider``.
+    def __init__(
+        self,
+        issuer: TokenIssuer,
+        driver: typing.Optional[IDatabaseDriver] = None,
+        provider: str = "default",
+    ) -> None:
+        self.issuer: TokenIssuer = issuer
+        self.driver: IDatabaseDriver = driver or SQLiteDriver()
+        self.provider: str = provider
+        self.__ready: bool = False
+
+    async def setup(self) -> None:
+        if not self.__ready:
+            row: typing.Optional[Row] = await self.driver.fetchone(SELECT_VERSION, ())
+            assert row is not None
+            version: tuple[int, ...] = tuple(map(int, row[0].split(".")))
+            if version < MIN_SQLITE_VERSION:
+                raise RuntimeError(
+                    f"SQLiteAuthLogic needs sqlite 3.35 or newer, not {row[0]}."
+                )
+            await self.driver.executescript(SCHEMA)
+            self.__ready = True
+
+    def create_token(
+        self, user_id: int, provider: str, userinfo: UserInfoModel
+    ) -> Token:
+        return self.issuer.token(
+            {"sub": str(user_id), "provider": provider, "name": userinfo.name}
+        )
+
+    async def upsert(self, provider: str, userinfo: UserInfoModel) -> tuple[int, bool]:
+        # returns the user's id and whether the user has just been created.
+        await self.setup()
+        now: float = time.time()
+        row: typing.Optional[Row] = await self.driver.fetchone(
+            UPSERT,
+            (provider, userinfo.sub, userinfo.json(exclude_none=True), now, now),
+        )
+        assert row is not None
+        return row[0], bool(row[1])
+
+    async def get_userinfo(
+        self, provider: str, sub: str
+    ) -> typing.Optional[UserInfoModel]:
+        await self.setup()
+        row: typing.Optional[Row] = await self.driver.fetchone(
+            SELECT_USERINFO, (provider, sub)
+        )
+        # stored once validated, validating again would turn the booleans
+        # into strings.
+        return UserInfoModel.construct(**json.loads(row[0])) if row else None
+
+    async def login(self, userinfo: UserInfoModel) -> Token | None:
+        if userinfo.sub is None:
+            return None
+        await self.setup()
+        row: typing.Optional[Row] = await self.driver.fetchone(
+            SELECT_ID, (self.provider, userinfo.sub)
+        )
+        return self.create_token(row[0], self.provider, userinfo) if row else None
+
+    async def singup(self, userinfo: UserInfoModel) -> None:
+        if userinfo.sub is not None:
+            await self.upsert(self.provider, userinfo)
+
+    async def signup_many(
+        self, provider: str, userinfos: list[UserInfoModel]
+    ) -> list[Exception | None]:
+        # a single transaction for the batch, which fails or succeeds as one.
+        await self.setup()
+        now: float = time.time()
+        errors: list[Exception | None] = [
+            None if userinfo.sub is not None else ValueError("the userinfo has no sub")
+            for userinfo in userinfos
+        ]
+        try:
+            await self.driver.executemany(
+                UPSERT_MANY,
+                [
+                    (
+                        provider,
+                        userinfo.sub,
+                        userinfo.json(exclude_none=True),
+                        now,
+                        now,
+                    )
+                    for userinfo in userinfos
+                    if userinfo.sub is not None
+                ],
+            )
+        except Exception as error:
+            return [failed or error for failed in errors]
+        return errors
+
+    async def login_or_signup(
+        self, userinfo: UserInfoModel
+    ) -> tuple[Token | None, bool]:
+        return await self.provider_login_or_signup(self.provider, userinfo)
+
+    async def provider_login_or_signup(
+        self, provider: str, userinfo: UserInfoModel
+    ) -> tuple[Token | None, bool]:
+        # users can't be told apart without a subject.
+        if userinfo.sub is None:
+            return None, False
+        user_id, created = await self.upsert(provider, userinfo)
+        return self.create_token(user_id, provider, userinfo), created
@@ -0,0 +1,29 @@
+import abc
+import typing
+
+
+class ICacheBackend(abc.ABC):
+    # where the kit's caches (provider metadata, key sets and userinfo) keep
+    # their serialized entries, e.g. in the process or shared by the workers
+    # of a host. Writes may be dropped (a full cache, a too large value), a
+    # cache is never the only copy of anything.
+    @abc.abstractmethod
+    def get(self, key: str) -> typing.Optional[bytes]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: bytes, ttl: typing.Optional[float] = None) -> None:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def add(self, key: str, value: bytes, ttl: typing.Optional[float] = None) -> bool:
+        # stores the entry unless the key is already there, returning whether
+        # it was stored. backends shared by several processes should make it
+        # atomic.
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
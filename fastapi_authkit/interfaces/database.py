@@ -0,0 +1,42 @@
+import abc
+import typing
+
+Row = tuple[typing.Any, ...]
+
+
+class IDatabaseDriver(abc.ABC):
+    # the async access to a SQL database the shipped stores are built on, e.g.
+    # ``SQLiteDriver`` or a wrapper of aiosqlite or asyncpg. Statements use
+    # the ``?`` placeholders.
+    @abc.abstractmethod
+    async def execute(
+        self, sql: str, parameters: typing.Sequence[typing.Any] = ()
+    ) -> None:
+        ...
+
+    async def executemany(
+        self, sql: str, parameters: typing.Iterable[typing.Sequence[typing.Any]]
+    ) -> None:
+        # the same statement for each of the parameters, in a single
+        # transaction where the driver supports it.
+        for params in parameters:
+            await self.execute(sql, params)
+
+    @abc.abstractmethod
+    async def fetchone(
+        self, sql: str, parameters: typing.Sequence[typing.Any] = ()
+    ) -> typing.Optional[Row]:
+        ...
+
+    @abc.abstractmethod
+    async def fetchall(
+        self, sql: str, parameters: typing.Sequence[typing.Any] = ()
+    ) -> list[Row]:
+        ...
+
+    @abc.abstractmethod
+    async def executescript(self, script: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        ...
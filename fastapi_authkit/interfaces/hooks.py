@@ -0,0 +1,22 @@
+import abc
+import typing
+
+
+class IFlowHook(abc.ABC):
+    # callbacks around every phase of the callback flow, e.g. for tracing.
+    # they run in the request's task, so context variables set when a phase
+    # starts are still visible when it finishes.
+    def phase_started(self, provider: str, phase: str) -> None:
+        ...
+
+    def phase_finished(
+        self,
+        provider: str,
+        phase: str,
+        duration: float,
+        error: typing.Optional[BaseException],
+    ) -> None:
+        ...
+
+    def outcome(self, provider: str, outcome: str) -> None:
+        ...
@@ -13,3 +13,43 @@ class IAuthLogic(abc.ABC):
     @abc.abstractmethod
     async def singup(self, userinfo: UserInfoModel) -> None:
         ...
+
+    async def signup_many(
+        self, provider: str, userinfos: list[UserInfoModel]
+    ) -> list[Exception | None]:
+        # creates a batch of users (e.g. a bulk import) of ``provider``, the
+        # namespace of their ``sub`` (see ``provider_login_or_signup``),
+        # returning the error of each user in order, None when it succeeded.
+        # the default signs them up one by one, override it with a single
+        # batched call where the backend supports it.
+        errors: list[Exception | None] = []
+        for userinfo in userinfos:
+            try:
+                await self.singup(userinfo=userinfo)
+            except Exception as error:
+                errors.append(error)
+            else:
+                errors.append(None)
+        return errors
+
+    async def login_or_signup(
+        self, userinfo: UserInfoModel
+    ) -> tuple[Token | None, bool]:
+        # returns the token and whether the user has just been created. the
+        # default costs up to three calls for a new user, override it with a
+        # single atomic (upsert) call where the backend supports it.
+        token: Token | None = await self.login(userinfo=userinfo)
+        if token:
+            return token, False
+
+        # create a user account, then login the user.
+        await self.singup(userinfo=userinfo)
+        return await self.login(userinfo=userinfo), True
+
+    async def provider_login_or_signup(
+        self, provider: str, userinfo: UserInfoModel
+    ) -> tuple[Token | None, bool]:
+        # ``provider`` is the namespace of the userinfo's ``sub`` (see
+        # ``AuthenticationMethod.get_provider_name``), for the logics which
+        # key their users by it.
+        return await self.login_or_signup(userinfo=userinfo)
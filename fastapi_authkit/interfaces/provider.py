@@ -1,18 +1,43 @@
 import abc
+import asyncio
+import time
 import typing
 import pydantic
 import fastapi
+from authlib.jose.errors import JoseError
+from httpx import Response
 
 from ..settings import SETTINGS
 
 from ..core.oauth import OAuth
+from ..core.oauth import MismatchingStateError
+from ..core.oauth import OAuthError
+from ..core.oauth import StarletteOAuth1App
+from ..core.oauth import StarletteOAuth2App
 from ..core.oauth import UserInfoModel
 from ..core.oauth import AuthVia
 from ..core.oauth import Url
+from ..core.jwks import JWKSManager
+from ..core.mapping import ClaimMapping
+from ..core.mapping import UserInfoMapper
+from ..core.metrics import FlowMetrics
+from ..core.resilience import LatencyWindow
+from ..core.resilience import ProviderGuard
+from ..core.resilience import ProviderUnavailable
+from ..core.resilience import RetryPolicy
+from ..core.singleflight import SingleFlight
+from ..core.tokens import clean_token
+from ..core.userinfo import UserInfoCache
+from ..core.userinfo import UserInfoCacheEntry
+
+from ..utils import get_full_url
 
 from .. import OAuthApp
 
 from .logics import IAuthLogic
+from .logics import Token
+
+T = typing.TypeVar("T")
 
 
 class TokenResponse(pydantic.BaseModel):
@@ -22,6 +47,22 @@ class TokenResponse(pydantic.BaseModel):
 
 class AuthenticationMethod(abc.ABC):
     router: fastapi.APIRouter
+    # providers which don't return the userinfo with the token, fetch it
+    # from this (api_base_url relative) endpoint.
+    userinfo_endpoint: typing.Optional[str] = None
+    userinfo_params: dict[str, typing.Any] = {}
+    # how the provider's userinfo payload maps on ``UserInfoModel``, it is
+    # compiled once when the method is registered.
+    claims: typing.Optional[ClaimMapping] = None
+    # the claims the id token must carry to skip the OIDC userinfo endpoint,
+    # by default the ones the mapping has no default for.
+    required_claims: typing.Optional[frozenset[str]] = None
+    # the userinfo endpoint's GETs are idempotent, so they are retried (and
+    # optionally hedged), None sends a single request.
+    userinfo_retry: typing.Optional[RetryPolicy] = RetryPolicy()
+    # the seconds a callback may spend on the provider (the token exchange
+    # and the userinfo, retries included), None for no limit.
+    login_budget: typing.Optional[float] = None
 
     def __init__(
         self,
@@ -33,33 +74,329 @@ class AuthenticationMethod(abc.ABC):
     ) -> None:
         self.router = router
         self.auth_logic: IAuthLogic = auth_logic
+        self.name: str = name
+        self.auth_vias: AuthVia = auth_vias
         self.settings: SETTINGS = SETTINGS(**auth_vias.get_setting(name=name))
         self.configure()
-        auth_vias.register(self.settings.dict())
+        self.mapper: typing.Optional[UserInfoMapper] = (
+            self.claims.compile() if self.claims else None
+        )
+        if self.required_claims is None:
+            self.required_claims = self.mapper.required if self.mapper else frozenset()
         self.oauth_app: OAuthApp = oauth_app
         self.oauth_provider: OAuth = oauth_app.oauth
-        self.auth_vias: AuthVia = auth_vias
-        self.name: str = name
-        self.authenticator: AuthVia.Authenticator = self.auth_vias(
-            self.name,
-            self.get_urls(),
-        )
+        self.userinfo_cache: UserInfoCache = oauth_app.userinfo_cache
+        self.userinfo_latencies: LatencyWindow = LatencyWindow()
+        self.jwks: JWKSManager = oauth_app.jwks
+        self.metrics: FlowMetrics = oauth_app.metrics
+        self.register()
+        # concurrent callbacks of the same user share one backend call.
+        self.logins: SingleFlight[tuple[Token | None, bool]] = SingleFlight()
+        self.authenticator: AuthVia.Authenticator = self.create_authenticator()
         self.routes()
-        self.oauth_app.app.include_router(self.router)
+        self.oauth_app.include_router(self.router)
+        self.oauth_app.add_method(self)
 
     @abc.abstractmethod
     def configure(self):
         ...
 
-    @abc.abstractmethod
+    def register(self) -> None:
+        self.auth_vias.register(self.settings.dict())
+        if self.settings.jwks_uri:
+            self.jwks.register(self.settings.jwks_uri)
+
+    def create_authenticator(self) -> AuthVia.Authenticator:
+        return self.auth_vias(self.name, self.get_urls())
+
+    async def get_client(
+        self, request: fastapi.Request
+    ) -> StarletteOAuth1App | StarletteOAuth2App:
+        return self.authenticator.get_auth_class()
+
+    async def get_named_client(
+        self, provider: str
+    ) -> StarletteOAuth1App | StarletteOAuth2App:
+        # the client of a ``get_provider_name`` namespace, out of a request.
+        return self.authenticator.get_auth_class()
+
+    def get_provider_name(self, request: fastapi.Request) -> str:
+        # the namespace of the provider's subjects, cached profiles and
+        # coalesced logins are keyed by it.
+        return self.name
+
+    async def guarded(
+        self,
+        request: fastapi.Request,
+        call: typing.Callable[[], typing.Awaitable[T]],
+        is_failure: typing.Optional[typing.Callable[[T], bool]] = None,
+    ) -> T:
+        # the calls to the provider go through its bulkhead and breaker, so a
+        # slow or failing provider fails fast instead of holding the others.
+        guard: ProviderGuard = self.oauth_app.guards.get(
+            self.get_provider_name(request)
+        )
+        return await guard.call(call, is_failure)
+
+    async def within_budget(
+        self, request: fastapi.Request, call: typing.Awaitable[T]
+    ) -> T:
+        deadline: typing.Optional[float] = getattr(
+            request.state, "authkit_deadline", None
+        )
+        if deadline is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise ProviderUnavailable(
+                self.get_provider_name(request), "latency budget exceeded"
+            )
+
     def create_userinfo(self, userinfo: dict[str, typing.Any]) -> UserInfoModel:
-        ...
+        if self.mapper is None:
+            raise NotImplementedError(
+                self.name + " has neither claims nor a create_userinfo method."
+            )
+        return self.mapper(userinfo)
+
+    async def request_userinfo(
+        self,
+        request: fastapi.Request,
+        auth_token: typing.Any,
+        headers: typing.Optional[dict[str, str]] = None,
+    ) -> Response:
+        if self.userinfo_endpoint is None:
+            raise ValueError(self.name + " has no userinfo endpoint.")
+        client = await self.get_client(request)
+
+        async def call() -> Response:
+            return await self.guarded(
+                request,
+                lambda: client.get(
+                    self.userinfo_endpoint,
+                    params=self.userinfo_params,
+                    headers=headers,
+                    token=auth_token,
+                ),
+                is_failure=lambda resp: resp.status_code >= 500,
+            )
+
+        if self.userinfo_retry is None:
+            return await self.within_budget(request, call())
+        return await self.within_budget(
+            request,
+            self.userinfo_retry.run(
+                call,
+                self.userinfo_latencies,
+                deadline=getattr(request.state, "authkit_deadline", None),
+            ),
+        )
+
+    async def fetch_userinfo(
+        self, request: fastapi.Request, auth_token: typing.Any
+    ) -> dict[str, typing.Any]:
+        # OIDC providers return the (verified) id token claims along with the
+        # access token, the others are asked through their user api.
+        if self.userinfo_endpoint is None:
+            return await self.fetch_oidc_userinfo(request, auth_token)
+        resp: Response = await self.request_userinfo(request, auth_token)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def fetch_oidc_userinfo(
+        self, request: fastapi.Request, auth_token: typing.Any
+    ) -> dict[str, typing.Any]:
+        claims: typing.Optional[dict[str, typing.Any]] = auth_token.get("userinfo")
+        if claims is not None and self.required_claims <= claims.keys():
+            return claims
+
+        # the id token is missing some of the claims (or there is none), so
+        # the provider's userinfo endpoint is asked for the rest.
+        client = await self.get_client(request)
+        userinfo: dict[str, typing.Any] = dict(
+            await self.within_budget(
+                request,
+                self.guarded(request, lambda: client.userinfo(token=auth_token)),
+            )
+        )
+        if claims is None:
+            return userinfo
+        if userinfo.get("sub") != claims.get("sub"):
+            raise OAuthError(
+                error="invalid_userinfo",
+                description="userinfo doesn't belong to the id token's subject.",
+            )
+        return {**claims, **userinfo}
+
+    def get_subject_key(self, request: fastapi.Request) -> str:
+        return "_authkit_" + self.get_provider_name(request) + "_sub"
+
+    async def get_userinfo(
+        self, request: fastapi.Request, auth_token: typing.Any
+    ) -> UserInfoModel:
+        provider: str = self.get_provider_name(request)
+        if self.userinfo_endpoint is None:
+            with self.metrics.phase(self.name, "userinfo"):
+                payload: dict[str, typing.Any] = await self.fetch_userinfo(
+                    request, auth_token
+                )
+            with self.metrics.phase(self.name, "mapping"):
+                return self.create_userinfo(payload)
+
+        # the subject of the last login from this session tells which cached
+        # profile to revalidate, on 304 the provider sends no payload and the
+        # cached userinfo is reused as is.
+        sub: typing.Optional[str] = request.session.get(self.get_subject_key(request))
+        entry: typing.Optional[UserInfoCacheEntry] = (
+            self.userinfo_cache.get(provider, sub) if sub else None
+        )
+        with self.metrics.phase(self.name, "userinfo"):
+            resp: Response = await self.request_userinfo(
+                request,
+                auth_token,
+                headers=entry.conditional_headers() if entry else None,
+            )
+            if entry and resp.status_code == 304:
+                return entry.userinfo.copy()
+            resp.raise_for_status()
+
+        with self.metrics.phase(self.name, "mapping"):
+            userinfo: UserInfoModel = self.create_userinfo(resp.json())
+        self.userinfo_cache.set(
+            provider,
+            userinfo,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+        if userinfo.sub:
+            request.session[self.get_subject_key(request)] = userinfo.sub
+        return userinfo
 
     def get_urls(self) -> list[Url]:
         self.login_url = Url("login")
         self.auth_url = Url("authorize")
         return [self.login_url, self.auth_url]
 
-    @abc.abstractmethod
+    def get_redirect_uri(self, request: fastapi.Request) -> str:
+        return (
+            get_full_url(request=request)
+            + self.router.prefix
+            + self.authenticator(self.auth_url)
+        )
+
+    async def login(self, request: fastapi.Request) -> fastapi.responses.Response:
+        # no point in sending the user to a provider which is known to be down.
+        self.oauth_app.guards.get(self.get_provider_name(request)).check()
+        client = await self.get_client(request)
+        return await client.authorize_redirect(
+            request,
+            redirect_uri=self.get_redirect_uri(request),
+        )
+
+    async def authorize(
+        self, request: fastapi.Request, response: fastapi.Response
+    ) -> TokenResponse:
+        # the metrics are labelled with the method's name, not the tenants
+        # (which come from the url), so their series stay bounded.
+        if self.login_budget is not None:
+            request.state.authkit_deadline = time.monotonic() + self.login_budget
+        try:
+            with self.metrics.phase(self.name, "authorize"):
+                client = await self.get_client(request)
+                with self.metrics.phase(self.name, "token"):
+                    auth_token: typing.Any = await self.within_budget(
+                        request,
+                        self.guarded(
+                            request, lambda: client.authorize_access_token(request)
+                        ),
+                    )
+                userinfo: UserInfoModel = await self.get_userinfo(request, auth_token)
+                token: TokenResponse = await self.login_or_signup(
+                    request, userinfo, response
+                )
+                await self.save_token(request, userinfo, auth_token)
+        except Exception as error:
+            self.metrics.count(self.name, self.metrics.classify(error))
+            if isinstance(error, (MismatchingStateError, JoseError)):
+                # the callback url was used already (a ``ReplayedCallbackError``
+                # or a state the session no longer has), e.g. reloaded by the
+                # browser, or its ID token doesn't verify (e.g. an unknown
+                # ``kid``), neither of which is the server's fault.
+                raise fastapi.HTTPException(
+                    fastapi.status.HTTP_400_BAD_REQUEST, detail=error.description
+                ) from error
+            raise
+        created: bool = response.status_code == fastapi.status.HTTP_201_CREATED
+        self.metrics.count(self.name, "signup" if created else "login")
+        return token
+
+    async def save_token(
+        self,
+        request: fastapi.Request,
+        userinfo: UserInfoModel,
+        auth_token: typing.Any,
+    ) -> None:
+        # keep the provider's token for the later calls on the user's behalf.
+        if self.oauth_app.token_store is None or userinfo.sub is None:
+            return
+        provider: str = self.get_provider_name(request)
+        with self.metrics.phase(self.name, "store"):
+            await self.oauth_app.token_store.set(
+                provider, userinfo.sub, clean_token(auth_token)
+            )
+
+    async def login_or_signup(
+        self,
+        request: fastapi.Request,
+        userinfo: UserInfoModel,
+        response: fastapi.Response,
+    ) -> TokenResponse:
+        # If user has already registered by its account will login easily,
+        # otherwize will be signed up before the login.
+        token: Token | None
+        created: bool
+        provider: str = self.get_provider_name(request)
+        with self.metrics.phase(self.name, "logic"):
+            if userinfo.sub is None:
+                token, created = await self.auth_logic.provider_login_or_signup(
+                    provider, userinfo
+                )
+            else:
+                (token, created), coalesced = await self.logins.do(
+                    (provider, userinfo.sub),
+                    lambda: self.auth_logic.provider_login_or_signup(
+                        provider, userinfo
+                    ),
+                )
+                # the user has been created for the caller which ran it, for
+                # the others it is a login.
+                created = created and not coalesced
+
+        if token:
+            if created:
+                response.status_code = fastapi.status.HTTP_201_CREATED
+            return TokenResponse(access_token=token, token_type="bearer")
+        raise fastapi.HTTPException(
+            fastapi.status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
     def routes(self):
-        ...
+        @self.router.get(self.authenticator(self.login_url))
+        async def login(request: fastapi.Request) -> fastapi.responses.RedirectResponse:
+            return await self.login(request)
+
+        @self.router.get(
+            self.authenticator(self.auth_url),
+            responses={
+                201: {
+                    "description": "when a user has not already registered, this"
+                    " api will signup first and next step will login the user,"
+                },
+            },
+            response_model=TokenResponse,
+        )
+        async def authorize(
+            request: fastapi.Request, response: fastapi.Response
+        ) -> TokenResponse:
+            return await self.authorize(request, response)
@@ -0,0 +1,18 @@
+import abc
+import typing
+
+
+class ISessionBackend(abc.ABC):
+    @abc.abstractmethod
+    async def get(self, session_id: str) -> typing.Optional[dict[str, typing.Any]]:
+        ...
+
+    @abc.abstractmethod
+    async def set(
+        self, session_id: str, data: dict[str, typing.Any], max_age: int
+    ) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, session_id: str) -> None:
+        ...
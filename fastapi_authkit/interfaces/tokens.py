@@ -0,0 +1,44 @@
+import abc
+import typing
+
+ProviderToken = dict[str, typing.Any]
+
+
+class ITokenStore(abc.ABC):
+    # the providers' tokens of every user, keyed by (provider, sub).
+    @abc.abstractmethod
+    async def get(self, provider: str, sub: str) -> typing.Optional[ProviderToken]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, provider: str, sub: str, token: ProviderToken) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, provider: str, sub: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def expiring(
+        self, before: float, limit: int
+    ) -> list[tuple[str, str, ProviderToken]]:
+        # the refreshable tokens (with a refresh token) which expire before
+        # ``before``, the soonest first.
+        ...
+
+    async def set_many(
+        self, tokens: typing.Iterable[tuple[str, str, ProviderToken]]
+    ) -> None:
+        # override it where a batch can be written at once.
+        for provider, sub, token in tokens:
+            await self.set(provider, sub, token)
+
+    async def replace_many(
+        self, tokens: typing.Iterable[tuple[str, str, ProviderToken, ProviderToken]]
+    ) -> None:
+        # (provider, sub, expected, token): sets ``token`` only where the
+        # stored one is still ``expected``, so a refresh never overwrites the
+        # token of a newer login. override it to compare and set atomically.
+        for provider, sub, expected, token in tokens:
+            if await self.get(provider, sub) == expected:
+                await self.set(provider, sub, token)
@@ -17,6 +17,7 @@ class OIDC_SETTINGS(__SETTINGS):
     api_base_url: Optional[str] = None
     request_token_url: Optional[str] = None
     server_metadata_url: Optional[str] = None
+    jwks_uri: Optional[str] = None
     client_kwargs: dict[str, Any] = Field(default_factory=dict)
 
 
@@ -10,8 +10,12 @@ setup(
         "fastapi",
         "uvicorn",
         "Authlib",
+        "httpx",
         "itsdangerous",
         "passlib",
         "python-dotenv",
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],
+    },
 )
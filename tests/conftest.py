@@ -0,0 +1,138 @@
+import functools
+import pathlib
+import sys
+import typing
+
+import fastapi
+import httpx
+import pytest
+
+from fastapi_authkit import AuthProviders
+from fastapi_authkit import AuthSetting
+from fastapi_authkit import OAuthApp
+from fastapi_authkit.core import providers
+from fastapi_authkit.core.http import HTTPClientPool
+
+# the stub provider of the benchmarks answers for every provider host.
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "benchmarks"))
+
+from stub import StubProvider  # noqa: E402
+
+BASE_URL = "http://testserver:80"
+
+
+def openid() -> dict[str, typing.Any]:
+    return {"scope": "openid profile email"}
+
+
+METHODS: dict[str, tuple[typing.Callable[..., typing.Any], dict[str, typing.Any]]] = {
+    "google": (providers.GoogleAuthenticationMethod, {"client_kwargs": openid()}),
+    "github": (providers.GithubAuthenticationMethod, {}),
+    "zoom": (providers.ZoomAuthenticationMethod, {}),
+    "twitter": (providers.TwitterAuthenticationMethod, {}),
+    "okta-tenants": (
+        functools.partial(
+            providers.OktaTenantAuthenticationMethod, name="okta-tenants"
+        ),
+        {"api_base_url": "https://{tenant}.okta.stub", "client_kwargs": openid()},
+    ),
+}
+
+
+class MemoryAuthLogic(AuthProviders.IAuthLogic):
+    def __init__(self) -> None:
+        self.users: dict[str, AuthProviders.UserInfoModel] = {}
+
+    async def login(
+        self, userinfo: AuthProviders.UserInfoModel
+    ) -> AuthProviders.Token | None:
+        if userinfo.sub in self.users:
+            return AuthProviders.Token("token-" + str(userinfo.sub))
+        return None
+
+    async def singup(self, userinfo: AuthProviders.UserInfoModel) -> None:
+        self.users[str(userinfo.sub)] = userinfo
+
+
+@pytest.fixture
+def stub() -> StubProvider:
+    return StubProvider(client_id="test")
+
+
+@pytest.fixture
+def build(
+    stub: StubProvider,
+) -> typing.Callable[..., tuple[fastapi.FastAPI, OAuthApp]]:
+    # an app with the given providers, all answered by the stub. ``settings``
+    # and ``options`` are the providers' settings and methods' arguments.
+    def build(
+        names: typing.Iterable[str] = ("google", "github"),
+        logic: typing.Optional[AuthProviders.IAuthLogic] = None,
+        settings: typing.Optional[dict[str, dict[str, typing.Any]]] = None,
+        options: typing.Optional[dict[str, dict[str, typing.Any]]] = None,
+        **kwargs: typing.Any,
+    ) -> tuple[fastapi.FastAPI, OAuthApp]:
+        app = fastapi.FastAPI()
+        kwargs.setdefault(
+            "http", HTTPClientPool(transport=httpx.ASGITransport(app=stub))
+        )
+        oauth_app = OAuthApp(app=app, secret_key="test", **kwargs)
+        router = fastapi.APIRouter(prefix="/auth")
+        auth_vias = AuthProviders.AuthVia(
+            oapp=oauth_app.oauth,
+            vias=[
+                AuthSetting(
+                    name=name,
+                    client_id=stub.client_id,
+                    client_secret="secret",
+                    **{**METHODS[name][1], **(settings or {}).get(name, {})},
+                ).dict()
+                for name in names
+            ],
+        )
+        logic = logic or MemoryAuthLogic()
+        for name in names:
+            METHODS[name][0](
+                router=router,
+                oauth_app=oauth_app,
+                auth_vias=auth_vias,
+                auth_logic=logic,
+                **(options or {}).get(name, {}),
+            )
+        return app, oauth_app
+
+    return build
+
+
+async def login(
+    app_client: httpx.AsyncClient,
+    browser: httpx.AsyncClient,
+    path: str,
+    user: str,
+) -> httpx.Response:
+    # the whole login -> provider -> callback flow of ``user``.
+    resp: httpx.Response = await app_client.get(path + "/login")
+    resp = await browser.get(resp.headers["location"], params={"user": user})
+    return await app_client.get(resp.headers["location"])
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    # the path and status of every request sent to ``app``.
+    def __init__(self, app: typing.Any) -> None:
+        self.inner = httpx.ASGITransport(app=app)
+        self.responses: list[tuple[str, int]] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        resp = await self.inner.handle_async_request(request)
+        self.responses.append((request.url.path, resp.status_code))
+        return resp
+
+
+def clients(
+    app: fastapi.FastAPI, stub: StubProvider
+) -> tuple[httpx.AsyncClient, httpx.AsyncClient]:
+    # a browser of its own: the app's client keeps the session cookie.
+    return (
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=BASE_URL),
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)),
+    )
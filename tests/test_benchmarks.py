@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+import flow
+
+
+def test_report_separates_the_columns(capsys: pytest.CaptureFixture[str]) -> None:
+    phases = {phase: {"p50_ms": 113.88, "p99_ms": 164.8} for phase in flow.PHASES}
+    flow.report(
+        [
+            {
+                "provider": "google",
+                "throughput": 10.0,
+                "errors": 0,
+                "phases": phases,
+            }
+        ]
+    )
+    header, row = capsys.readouterr().out.splitlines()
+    assert "113.88 ms  " in row
+    assert "164.80 ms" in row
+    assert len(header) == len(row)
+
+
+def test_failed_callbacks_are_errors() -> None:
+    def app(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/login"):
+            return httpx.Response(302, headers={"location": "https://stub/authorize"})
+        return httpx.Response(500)
+
+    def provider(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            302, headers={"location": "http://testserver/auth/google/authorize"}
+        )
+
+    async def main() -> flow.Run:
+        run = flow.Run("google")
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(app), base_url=flow.BASE_URL
+        ) as app_client, httpx.AsyncClient(
+            transport=httpx.MockTransport(provider)
+        ) as browser:
+            await flow.flow(run, app_client, browser, "/auth/google", 1)
+        return run
+
+    run = asyncio.run(main())
+    assert run.errors == 1
+    assert run.statuses == {500: 1}
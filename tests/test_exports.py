@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+import pytest
+
+import fastapi_authkit
+
+
+def test_exports() -> None:
+    assert set(fastapi_authkit.__all__) <= set(dir(fastapi_authkit))
+    assert fastapi_authkit.OAuthApp.__name__ == "OAuthApp"
+    assert fastapi_authkit.AuthProviders.GithubAuthenticationMethod is not None
+    with pytest.raises(AttributeError):
+        fastapi_authkit.Unknown
+
+
+def test_verifying_tokens_does_not_load_the_web_stack() -> None:
+    # in a fresh interpreter, the modules already imported by the tests don't
+    # count.
+    code = (
+        "import sys, fastapi_authkit.core.security; "
+        "print(sorted(m for m in ('fastapi', 'fastapi_authkit.base', "
+        "'fastapi_authkit.core.providers') if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "[]"
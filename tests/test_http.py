@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+
+from fastapi_authkit.core.http import HTTPClientPool
+from fastapi_authkit.core.oauth import OAuth
+
+
+def test_aclose_closes_client_and_transport() -> None:
+    async def main() -> None:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200))
+        pool = HTTPClientPool(transport=transport)
+        client = pool.client
+        assert (await client.get("http://provider.test/")).status_code == 200
+        await pool.aclose()
+        assert client.is_closed
+        # a new client is created on the next use.
+        assert pool.client is not client
+        assert not pool.client.is_closed
+
+    asyncio.run(main())
+
+
+def test_shared_transport_survives_authlib_clients() -> None:
+    async def main() -> None:
+        calls: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(str(request.url))
+            return httpx.Response(200)
+
+        pool = HTTPClientPool(transport=httpx.MockTransport(handler))
+        async with httpx.AsyncClient(**pool.client_kwargs("github")) as client:
+            await client.get("http://provider.test/a")
+        # closing a per-call client leaves the pooled transport usable.
+        await pool.client.get("http://provider.test/b")
+        assert calls == ["http://provider.test/a", "http://provider.test/b"]
+        await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_components_fetch_through_the_current_client() -> None:
+    async def main() -> None:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        oauth = OAuth(http=HTTPClientPool(transport=transport))
+        await oauth.jwks.fetch("http://provider.test/jwks")
+        # a second lifespan of the app, after the pool was closed.
+        await oauth.http.aclose()
+        assert await oauth.jwks.fetch("http://provider.test/jwks") == {}
+        resp = await oauth.metadata_cache.fetch("http://provider.test/meta", {})
+        assert resp.status_code == 200
+        await oauth.http.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import fastapi
+import httpx
+
+from fastapi_authkit import OAuthApp
+from fastapi_authkit.core.http import HTTPClientPool
+from fastapi_authkit.core.introspection import IntrospectionClient
+from fastapi_authkit.core.introspection import introspection_response
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import TokenIssuer
+
+URL = "http://auth.test/introspect"
+
+
+def test_claims_cannot_override_active() -> None:
+    response = introspection_response({"sub": "1", "active": False})
+    assert response["active"] is True
+    assert response["sub"] == "1"
+    assert introspection_response(None) == {"active": False}
+
+
+def test_cache_time_is_always_bounded() -> None:
+    client = IntrospectionClient(URL, negative_ttl=30, max_ttl=300)
+    now = time.time()
+    assert client.expires_at({"active": True}) <= now + 301
+    assert client.expires_at({"active": True, "exp": now + 60}) == now + 60
+    assert client.expires_at({"active": True, "exp": now + 3600}) <= now + 301
+    assert client.expires_at({"active": False}) <= now + 31
+
+
+def test_introspection_through_the_endpoint() -> None:
+    app = fastapi.FastAPI()
+    issuer = TokenIssuer(KeyRing("HS256"))
+    oauth_app = OAuthApp(app=app, secret_key="test", token_issuer=issuer)
+    oauth_app.expose_introspection(dependencies=[])
+    requests: list[httpx.Request] = []
+
+    async def count(request: httpx.Request) -> None:
+        requests.append(request)
+
+    async def main() -> None:
+        http = HTTPClientPool(transport=httpx.ASGITransport(app=app))
+        client = IntrospectionClient(URL, http=http)
+        http.client.event_hooks["request"].append(count)
+        token = issuer.issue({"sub": "1"})
+        results = await asyncio.gather(*(client.introspect(token) for _ in range(5)))
+        assert all(result["active"] and result["sub"] == "1" for result in results)
+        # concurrent introspections share a request, and the result is cached.
+        assert (await client.introspect(token))["sub"] == "1"
+        assert len(requests) == 1
+        assert (await client.introspect("invalid")) == {"active": False}
+        assert len(requests) == 2
+        await client.aclose()
+        # a given pool belongs to its owner.
+        assert not http.client.is_closed
+        await http.aclose()
+
+    asyncio.run(main())
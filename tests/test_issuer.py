@@ -0,0 +1,95 @@
+import asyncio
+import os
+import pathlib
+import stat
+import time
+
+import pytest
+from authlib.jose import jwt
+
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import SigningKey
+from fastapi_authkit.core.issuer import TokenIssuer
+
+
+def decode(issuer: TokenIssuer, token: str) -> dict:
+    claims = jwt.decode(
+        token, issuer.verification_key, claims_options=issuer.claims_options()
+    )
+    claims.validate()
+    return dict(claims)
+
+
+@pytest.mark.parametrize("alg", ["HS256", "RS256", "EdDSA"])
+def test_issued_tokens_verify(alg: str) -> None:
+    issuer = TokenIssuer(KeyRing(alg), issuer="https://api.test")
+    claims = decode(issuer, issuer.issue({"sub": "1"}))
+    assert claims["sub"] == "1"
+    assert claims["iss"] == "https://api.test"
+
+
+def test_given_claims_cant_override_the_registered_ones() -> None:
+    issuer = TokenIssuer(KeyRing("HS256"), issuer="https://api.test", lifetime=60)
+    userinfo = {"sub": "1", "iss": "https://provider.test", "exp": 0, "jti": "x"}
+    claims = decode(issuer, issuer.issue(userinfo))
+    assert claims["sub"] == "1"
+    assert claims["iss"] == "https://api.test"
+    assert time.time() < claims["exp"] <= time.time() + 60
+    assert claims["jti"] != "x"
+
+
+def test_rotated_keys_verify_until_retired() -> None:
+    keyring = KeyRing("HS256", retention=0.05)
+    issuer = TokenIssuer(keyring)
+    token = issuer.issue({"sub": "1"})
+    keyring.rotate()
+    assert decode(issuer, token)["sub"] == "1"
+    time.sleep(0.1)
+    keyring.prune()
+    with pytest.raises(ValueError):
+        decode(issuer, token)
+
+
+def test_workers_share_the_key_file(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "keys.json"
+    first = TokenIssuer(KeyRing("EdDSA", path=path))
+    second = TokenIssuer(KeyRing("EdDSA", path=path))
+    assert first.keyring.current.kid == second.keyring.current.kid
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    # a key rotated by one worker is picked up by the other one.
+    first.keyring.rotate()
+    time.sleep(1)
+    assert decode(second, first.issue({"sub": "1"}))["sub"] == "1"
+    # and survives a restart.
+    third = TokenIssuer(KeyRing("EdDSA", path=path))
+    assert third.keyring.current.kid == first.keyring.current.kid
+
+
+def test_only_one_worker_rotates(tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        path = tmp_path / "keys.json"
+        keyrings = [
+            KeyRing("HS256", rotation_interval=0.05, path=path) for _ in range(3)
+        ]
+        initial = keyrings[0].current.kid
+        await asyncio.sleep(0.06)
+        rotated = await asyncio.gather(
+            *(asyncio.to_thread(keyring.sync) for keyring in keyrings)
+        )
+        assert sum(key is not None for key in rotated) == 1
+        kids = {keyring.current.kid for keyring in keyrings}
+        assert len(kids) == 1 and initial not in kids
+
+    asyncio.run(main())
+
+
+def test_workers_without_shared_keys_are_refused(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path
+) -> None:
+    with pytest.raises(RuntimeError):
+        KeyRing("HS256", workers=2)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(RuntimeError):
+        KeyRing("HS256")
+    KeyRing("HS256", path=tmp_path / "keys.json")
+    KeyRing("HS256", keys=[SigningKey.generate("HS256")], rotation_interval=None)
@@ -0,0 +1,110 @@
+import asyncio
+import typing
+
+import httpx
+import pytest
+from authlib.jose import JsonWebKey
+from authlib.jose.errors import JoseError
+
+from fastapi_authkit.core.cache import MemoryCacheBackend
+from fastapi_authkit.core.jwks import JWKSManager
+
+URI = "http://provider.test/jwks"
+
+
+def jwk(kid: str) -> dict[str, typing.Any]:
+    key = JsonWebKey.generate_key("OKP", "Ed25519", is_private=True)
+    return {**key.as_dict(is_private=False), "kid": kid}
+
+
+def test_unknown_kid_skips_the_stale_shared_copy() -> None:
+    async def main() -> None:
+        served: dict[str, typing.Any] = {"keys": [jwk("old")]}
+        fetches: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            fetches.append(str(request.url))
+            return httpx.Response(200, json=served)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        backend = MemoryCacheBackend()
+        first = JWKSManager(min_refetch_interval=0, client=client, backend=backend)
+        second = JWKSManager(min_refetch_interval=0, client=client, backend=backend)
+        assert (await second.get_key(URI, "old")).kid == "old"
+        await asyncio.sleep(0.01)
+        # another worker fetches the set later, still before the rotation.
+        await first.fetch(URI)
+        first.store_shared(URI, served)
+        served = {"keys": [jwk("old"), jwk("new")]}
+        # the shared copy is newer than the second worker's, but can't be
+        # adopted as it doesn't hold the new key either.
+        assert (await second.get_key(URI, "new")).kid == "new"
+        assert len(fetches) == 3
+        # the refetched set is shared with the first worker.
+        assert (await first.get_key(URI, "new")).kid == "new"
+        assert len(fetches) == 3
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_concurrent_lookups_share_a_fetch() -> None:
+    async def main() -> None:
+        fetches: list[str] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            fetches.append(str(request.url))
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"keys": [jwk("a")]})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        manager = JWKSManager(client=client)
+        keys = await asyncio.gather(*(manager.get_key(URI, "a") for _ in range(10)))
+        assert {key.kid for key in keys} == {"a"}
+        assert len(fetches) == 1
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_unknown_kid_is_a_jose_error() -> None:
+    async def main() -> None:
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json={"keys": [jwk("a")]})
+            )
+        )
+        manager = JWKSManager(client=client)
+        await manager.get_key(URI, "a")
+        # within the refetch interval, the set isn't fetched again.
+        with pytest.raises(JoseError):
+            await manager.get_key(URI, "b")
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_forgotten_sets_dont_stop_the_refresh() -> None:
+    async def main() -> None:
+        manager = JWKSManager(refresh_interval=0)
+        fetched = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal fetched
+            fetched += 1
+            if fetched == 1:
+                return httpx.Response(200, json={"keys": [jwk("a")]})
+            # the set is forgotten while its refresh is in flight, which fails.
+            manager.forget(URI)
+            return httpx.Response(500)
+
+        manager.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await manager.get_key(URI, "a")
+        await manager.start()
+        await asyncio.sleep(0.05)
+        # a refresh task which died would raise here.
+        await manager.stop()
+        assert fetched == 2
+        await manager.client.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import asyncio
+from fastapi_authkit import AuthProviders
+
+from conftest import MemoryAuthLogic
+from conftest import clients
+from conftest import login
+
+
+class SlowAuthLogic(MemoryAuthLogic):
+    # a slow store, so the concurrent logins of a user overlap.
+    async def provider_login_or_signup(
+        self, provider: str, userinfo: AuthProviders.UserInfoModel
+    ) -> tuple[AuthProviders.Token | None, bool]:
+        await asyncio.sleep(0.02)
+        return await self.login_or_signup(userinfo)
+
+
+def test_concurrent_logins_of_a_new_user_sign_up_once(build, stub) -> None:
+    app, oauth_app = build(names=("github",), logic=SlowAuthLogic())
+
+    async def main() -> dict[str, list[int]]:
+        statuses: dict[str, list[int]] = {}
+
+        async def flow(user: str) -> None:
+            app_client, browser = clients(app, stub)
+            async with app_client, browser:
+                resp = await login(app_client, browser, "/auth/github", user)
+            statuses.setdefault(user, []).append(resp.status_code)
+
+        await oauth_app.startup()
+        try:
+            await asyncio.gather(
+                *(flow(str(user)) for user in range(1, 31) for _ in range(3))
+            )
+        finally:
+            await oauth_app.shutdown()
+        return statuses
+
+    statuses: dict[str, list[int]] = asyncio.run(main())
+    assert len(statuses) == 30
+    for user, codes in statuses.items():
+        assert sorted(codes) == [200, 200, 201], user
+    assert oauth_app.metrics.outcomes("github") == {"signup": 30, "login": 60}
+
+
+def test_twitter_users_are_keyed_by_id_str(build, stub) -> None:
+    # verify_credentials has no ``sub``, the user's id string stands for it.
+    logic = MemoryAuthLogic()
+    app, oauth_app = build(names=("twitter",), logic=logic)
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            resp = await login(app_client, browser, "/auth/twitter", "5")
+            assert resp.status_code == 201
+            resp = await login(app_client, browser, "/auth/twitter", "5")
+            assert resp.status_code == 200
+
+    asyncio.run(main())
+    assert list(logic.users) == ["5"]
+    assert logic.users["5"].name == "user-5"
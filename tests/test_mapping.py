@@ -0,0 +1,66 @@
+import pydantic
+import pytest
+
+from fastapi_authkit.core.mapping import Claim
+from fastapi_authkit.core.mapping import ClaimMapping
+from fastapi_authkit.core.mapping import Const
+from fastapi_authkit.core.mapping import optional_str
+from fastapi_authkit.core.oauth import UserInfoModel
+from fastapi_authkit.core.providers import ZoomAuthenticationMethod
+
+from stub import oidc_profile
+from stub import zoom_profile
+
+
+def test_compiled_mapping() -> None:
+    mapper = ClaimMapping(
+        {
+            "sub": Claim("id", convert=optional_str),
+            "name": "login",
+            "email": Claim("email", default=None),
+            "locale": Const("en"),
+            "website": lambda payload: payload["login"] + ".example.com",
+        },
+        extra="unknown",
+    ).compile()
+    userinfo = mapper({"id": 7, "login": "jane", "plan": "pro"})
+    assert userinfo.sub == "7"
+    assert userinfo.name == "jane"
+    assert userinfo.email is None
+    assert userinfo.locale == "en"
+    assert userinfo.website == "jane.example.com"
+    # only the claims the mapping doesn't consume are kept as extra.
+    assert userinfo.extra == {"plan": "pro"}
+    assert mapper.required == frozenset({"id", "login"})
+    with pytest.raises(KeyError):
+        mapper({"login": "jane"})
+
+
+def test_standard_mapping_validates_the_claims() -> None:
+    payload = {**oidc_profile("1"), "hd": "example.com"}
+    userinfo = ClaimMapping.standard().compile()(payload)
+    assert userinfo.sub == "1"
+    assert userinfo == UserInfoModel(**payload)
+    assert userinfo.extra == {"hd": "example.com"}
+    with pytest.raises(pydantic.ValidationError):
+        ClaimMapping.standard().compile()({"sub": "1", "address": {"country": "x"}})
+
+
+def test_payload_is_nested_as_extra() -> None:
+    payload = zoom_profile("1")
+    userinfo = ZoomAuthenticationMethod.claims.compile()(payload)
+    assert userinfo.extra == {"extra": payload}
+    assert userinfo.email_verified == "1"
+
+
+def test_record_keeps_the_values_as_they_are() -> None:
+    mapper = ZoomAuthenticationMethod.claims.compile()
+    payload = zoom_profile("1")
+    record = mapper.record(payload)
+    assert record.dict() == mapper.extract(payload)
+    assert record.email_verified == 1
+
+
+def test_unknown_fields_are_rejected() -> None:
+    with pytest.raises(ValueError):
+        ClaimMapping({"username": "login"})
@@ -0,0 +1,55 @@
+import asyncio
+import pathlib
+
+import httpx
+
+from fastapi_authkit.core.metadata import MetadataCache
+
+URL = "http://provider.test/.well-known/openid-configuration"
+
+
+def test_metadata_is_persisted_and_revalidated(tmp_path: pathlib.Path) -> None:
+    requests: list[httpx.Request] = []
+    up: bool = True
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if not up:
+            return httpx.Response(503)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"issuer": "stub"}, headers={"ETag": '"v1"'})
+
+    async def main() -> None:
+        nonlocal up
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        path = tmp_path / "metadata.json"
+        first = MetadataCache(path, client=client)
+        assert await first.prefetch([URL, URL]) == {URL: {"issuer": "stub"}}
+        assert len(requests) == 1
+        # a restarted worker comes up warm.
+        second = MetadataCache(path, client=client)
+        assert await second.get(URL) == {"issuer": "stub"}
+        assert len(requests) == 1
+        # once stale, it is revalidated with its ETag.
+        third = MetadataCache(path, ttl=0, client=client)
+        assert await third.get(URL) == {"issuer": "stub"}
+        assert requests[-1].headers["If-None-Match"] == '"v1"'
+        # and served stale while the provider is down.
+        up = False
+        assert await third.get(URL) == {"issuer": "stub"}
+        assert len(requests) == 3
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_unreachable_provider_is_skipped_by_prefetch() -> None:
+    async def main() -> None:
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(500))
+        )
+        assert await MetadataCache(client=client).prefetch([URL]) == {}
+        await client.aclose()
+
+    asyncio.run(main())
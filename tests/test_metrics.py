@@ -0,0 +1,56 @@
+import asyncio
+
+import fastapi
+import httpx
+
+from fastapi_authkit.core.metrics import FlowMetrics
+from fastapi_authkit.core.oauth import OAuthError
+from fastapi_authkit.core.resilience import ProviderUnavailable
+
+from conftest import BASE_URL
+
+
+def test_classify() -> None:
+    classify = FlowMetrics.classify
+    assert classify(ProviderUnavailable("github", "circuit open")) == "unavailable"
+    assert classify(fastapi.HTTPException(422)) == "rejected"
+    assert classify(fastapi.HTTPException(404)) == "client_error"
+    assert classify(OAuthError(error="access_denied")) == "provider_error"
+    assert classify(RuntimeError()) == "error"
+
+
+def test_providers_past_the_limit_are_other() -> None:
+    metrics = FlowMetrics(max_providers=2)
+    for provider in ("google", "github", "zoom", "twitter"):
+        metrics.count(provider, "login")
+    assert metrics.outcomes("google") == {"login": 1}
+    assert metrics.outcomes("other") == {"login": 2}
+    assert metrics.outcomes("zoom") == {}
+
+
+def test_tenants_share_the_series_of_their_provider(build) -> None:
+    app, oauth_app = build(
+        names=("okta-tenants",),
+        options={
+            "okta-tenants": {
+                "tenant_settings": lambda tenant: {} if tenant == "acme" else None
+            }
+        },
+    )
+
+    async def main() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url=BASE_URL
+        ) as client:
+            for i in range(200):
+                resp = await client.get(
+                    f"/auth/okta-tenants/made-up-{i}/authorize",
+                    params={"code": "code", "state": "state"},
+                )
+                assert resp.status_code == 404
+
+    asyncio.run(main())
+    assert oauth_app.metrics.outcomes("okta-tenants") == {"client_error": 200}
+    lines: list[str] = oauth_app.metrics.render().splitlines()
+    assert not any("made-up" in line for line in lines)
+    assert len(lines) < 50
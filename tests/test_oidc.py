@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from fastapi_authkit.core import providers
+from fastapi_authkit.core.http import HTTPClientPool
+
+import conftest
+from conftest import RecordingTransport
+from conftest import clients
+from conftest import login
+
+
+class PhoneGoogle(providers.GoogleAuthenticationMethod):
+    # the stub's id tokens have no phone number.
+    required_claims = frozenset({"sub", "phone_number"})
+
+
+@pytest.mark.parametrize("method", [None, PhoneGoogle])
+def test_userinfo_endpoint_only_for_missing_claims(
+    build, stub, monkeypatch: pytest.MonkeyPatch, method
+) -> None:
+    if method is not None:
+        monkeypatch.setitem(
+            conftest.METHODS, "google", (method, conftest.METHODS["google"][1])
+        )
+    transport = RecordingTransport(stub)
+    logic = conftest.MemoryAuthLogic()
+    app, oauth_app = build(
+        names=("google",), logic=logic, http=HTTPClientPool(transport=transport)
+    )
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await login(app_client, browser, "/auth/google", "1")
+                assert resp.status_code == 201
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    called = ("/userinfo", 200) in transport.responses
+    assert called is (method is not None)
+    userinfo = logic.users["1"]
+    assert userinfo.email == "user-1@example.com"
+    # validated by the model, whose first type is a string.
+    assert userinfo.email_verified == "True"
+
+
+def test_id_token_of_an_unknown_key_is_rejected(build, stub) -> None:
+    # the provider publishes its key under another kid than it signs with.
+    stub.jwk_set = {"keys": [{**stub.key.as_dict(), "kid": "other"}]}
+    app, oauth_app = build(names=("google",))
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await login(app_client, browser, "/auth/google", "1")
+                assert resp.status_code == 400
+                assert "stub key not found" in resp.json()["detail"]
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    assert oauth_app.metrics.outcomes("google") == {"client_error": 1}
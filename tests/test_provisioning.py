@@ -0,0 +1,58 @@
+import asyncio
+import json
+import pathlib
+
+from fastapi_authkit.core.database import SQLiteDriver
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import TokenIssuer
+from fastapi_authkit.core.users import SQLiteAuthLogic
+
+from conftest import clients
+from conftest import login
+
+RECORDS = b"""{"sub": "7", "name": "Jane Doe", "email_verified": true}
+not json
+
+{"name": "no sub"}
+"""
+
+
+def test_provisioned_users_log_in_through_their_provider(
+    build, stub, tmp_path: pathlib.Path
+) -> None:
+    logic = SQLiteAuthLogic(
+        TokenIssuer(KeyRing("HS256")), SQLiteDriver(tmp_path / "users.sqlite3")
+    )
+    app, oauth_app = build(names=("github",), logic=logic)
+    oauth_app.expose_provisioning(logic, "github", dependencies=[], batch_size=2)
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            resp = await app_client.post("/users/bulk", content=RECORDS)
+            assert resp.status_code == 200
+            results = [json.loads(line) for line in resp.text.splitlines()]
+            assert [result.get("ok") for result in results] == [
+                True,
+                False,
+                False,
+                None,
+            ]
+            assert results[-1] == {"summary": {"records": 3, "failed": 2}}
+            userinfo = await logic.get_userinfo("github", "7")
+            # validated like the userinfo of the provider's logins.
+            assert userinfo is not None and userinfo.email_verified == "True"
+
+            await oauth_app.startup()
+            try:
+                # the provisioned user exists, the other one is signed up.
+                assert (
+                    await login(app_client, browser, "/auth/github", "7")
+                ).status_code == 200
+                assert (
+                    await login(app_client, browser, "/auth/github", "8")
+                ).status_code == 201
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+import asyncio
+import collections
+
+import pytest
+
+from fastapi_authkit import AuthProviders
+
+from conftest import clients
+from conftest import login
+
+
+def test_clients_are_created_on_first_use(build, stub) -> None:
+    app, oauth_app = build(names=("google", "github", "zoom"))
+    oauth = oauth_app.oauth
+    assert all(oauth.is_registered(name) for name in ("google", "github", "zoom"))
+    assert oauth._clients == {}
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await login(app_client, browser, "/auth/github", "1")
+                assert resp.status_code == 201
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    assert list(oauth._clients) == ["github"]
+
+
+def test_routes_are_included_once(build) -> None:
+    app, _ = build(names=("google", "github", "zoom"))
+    paths = collections.Counter(route.path for route in app.routes)
+    assert paths["/auth/github/login"] == 1
+    assert paths["/auth/google/authorize"] == 1
+    assert paths["/auth/zoom/login"] == 1
+
+
+def test_unknown_method_is_rejected(build) -> None:
+    _, oauth_app = build(names=("github",))
+    auth_vias = AuthProviders.AuthVia(oapp=oauth_app.oauth, vias=[])
+    # a method needs both its settings and a registered client.
+    with pytest.raises(ValueError):
+        auth_vias("github", [])
+    with pytest.raises(ValueError):
+        auth_vias.get_setting("github")
@@ -0,0 +1,53 @@
+import asyncio
+import pathlib
+
+from fastapi_authkit.core.replay import ReplayCache
+from fastapi_authkit.core.shared import SharedCacheBackend
+
+from conftest import clients
+
+
+def test_replay_cache_remembers_values() -> None:
+    cache = ReplayCache(ttl=60)
+    assert not cache.seen("state-1", "code-1")
+    assert cache.seen("code-1")
+    assert not cache.seen("state-2")
+
+
+def test_replay_cache_is_shared_through_the_backend(tmp_path: pathlib.Path) -> None:
+    backend = SharedCacheBackend(tmp_path / "replay", slots=64, slot_size=64)
+    first, second = ReplayCache(backend=backend), ReplayCache(backend=backend)
+    assert not first.seen("state-1")
+    # the other worker doesn't hold it in its filters.
+    assert second.seen("state-1")
+
+
+def test_replayed_callback_is_a_bad_request(build, stub) -> None:
+    app, oauth_app = build(names=("github",), replay_cache=ReplayCache())
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await app_client.get("/auth/github/login")
+                resp = await browser.get(resp.headers["location"], params={"user": "1"})
+                callback: str = resp.headers["location"]
+                cookies = dict(app_client.cookies)
+                assert (await app_client.get(callback)).status_code == 201
+                # a reload, the state is gone from the session.
+                assert (await app_client.get(callback)).status_code == 400
+                # a replay with the session cookie of the first callback.
+                app_client.cookies.clear()
+                resp = await app_client.get(callback, cookies=cookies)
+                assert resp.status_code == 400
+                assert resp.json() == {"detail": "The callback has already been used."}
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    assert oauth_app.metrics.outcomes("github") == {
+        "signup": 1,
+        "client_error": 1,
+        "replayed": 1,
+    }
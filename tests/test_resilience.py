@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from fastapi_authkit.core import providers
+from fastapi_authkit.core.resilience import Bulkhead
+from fastapi_authkit.core.resilience import CircuitBreaker
+from fastapi_authkit.core.resilience import LatencyWindow
+from fastapi_authkit.core.resilience import ProviderGuards
+from fastapi_authkit.core.resilience import ProviderUnavailable
+from fastapi_authkit.core.resilience import RetryPolicy
+
+import conftest
+from conftest import clients
+
+REQUEST = httpx.Request("GET", "http://provider.test/userinfo")
+
+
+def test_breaker_opens_and_probes_once() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # a single call probes the provider.
+    assert breaker.allow() and not breaker.allow()
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_guard_fails_fast_once_open() -> None:
+    guards = ProviderGuards(failure_threshold=1, overrides={"github": {}})
+    guard = guards.get("github:acme")
+    calls: list[int] = []
+
+    async def failing() -> None:
+        calls.append(1)
+        raise httpx.ConnectError("down", request=REQUEST)
+
+    async def main() -> None:
+        with pytest.raises(httpx.ConnectError):
+            await guard.call(failing)
+        with pytest.raises(ProviderUnavailable) as raised:
+            await guard.call(failing)
+        assert raised.value.status_code == 503
+        assert "Retry-After" in raised.value.headers
+
+    asyncio.run(main())
+    assert calls == [1]
+    # the guards are per provider.
+    assert guards.get("github:acme") is guard
+    assert guards.get("github").breaker.state == CircuitBreaker.CLOSED
+
+
+def test_bulkhead_bounds_the_concurrent_calls() -> None:
+    async def main() -> None:
+        bulkhead = Bulkhead(max_concurrent=2, queue_timeout=0.05)
+        running: list[int] = []
+        peak: int = 0
+
+        async def call() -> None:
+            nonlocal peak
+            async with bulkhead.slot("github"):
+                running.append(1)
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        assert peak == 2
+        # a call waiting longer than the queue timeout is turned away.
+        async with bulkhead.slot("github"), bulkhead.slot("github"):
+            with pytest.raises(ProviderUnavailable):
+                async with bulkhead.slot("github"):
+                    pass
+
+    asyncio.run(main())
+
+
+def test_retries_the_retryable_statuses() -> None:
+    statuses = iter([503, 502, 200])
+
+    async def call() -> httpx.Response:
+        return httpx.Response(next(statuses), request=REQUEST)
+
+    policy = RetryPolicy(attempts=3, backoff=0)
+    resp = asyncio.run(policy.run(call, LatencyWindow()))
+    assert resp.status_code == 200
+
+
+def test_retries_stop_at_the_deadline() -> None:
+    calls: list[int] = []
+
+    async def call() -> httpx.Response:
+        calls.append(1)
+        return httpx.Response(503, request=REQUEST)
+
+    async def main() -> httpx.Response:
+        policy = RetryPolicy(attempts=10, backoff=1, max_backoff=1)
+        return await policy.run(call, LatencyWindow(), deadline=time.monotonic())
+
+    assert asyncio.run(main()).status_code == 503
+    assert len(calls) == 1
+
+
+def test_slow_calls_are_hedged() -> None:
+    latencies = LatencyWindow()
+    for _ in range(20):
+        latencies.observe(0.01)
+    delays = iter([1.0, 0.0])
+    calls: list[int] = []
+
+    async def call() -> httpx.Response:
+        calls.append(1)
+        await asyncio.sleep(next(delays))
+        return httpx.Response(200, request=REQUEST)
+
+    async def main() -> None:
+        policy = RetryPolicy(hedge_percentile=0.9)
+        started = time.monotonic()
+        resp = await policy.run(call, latencies)
+        assert resp.status_code == 200
+        assert time.monotonic() - started < 0.5
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+class BudgetGithub(providers.GithubAuthenticationMethod):
+    login_budget = 0.05
+
+
+def test_callback_within_the_login_budget(
+    build, stub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setitem(conftest.METHODS, "github", (BudgetGithub, {}))
+    app, oauth_app = build(names=("github",))
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await app_client.get("/auth/github/login")
+                resp = await browser.get(resp.headers["location"], params={"user": "1"})
+                # the provider is slower than the whole budget.
+                stub.latency = 0.2
+                resp = await app_client.get(resp.headers["location"])
+                assert resp.status_code == 503
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    assert oauth_app.metrics.outcomes("github") == {"unavailable": 1}
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import multiprocessing
+import pathlib
+import time
+
+import fastapi
+import httpx
+
+from fastapi_authkit import OAuthApp
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import TokenIssuer
+from fastapi_authkit.core.revocation import BloomFilter
+from fastapi_authkit.core.revocation import RevocationList
+from fastapi_authkit.core.security import TokenVerifier
+
+from conftest import BASE_URL
+
+
+def digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode()).digest()
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(1000, 0.001)
+    for i in range(1000):
+        bloom.add(digest(str(i)))
+    assert all(digest(str(i)) in bloom for i in range(1000))
+    false_positives = sum(digest("other" + str(i)) in bloom for i in range(10000))
+    assert false_positives < 100
+
+
+def test_revocations_are_seen_by_the_other_workers(tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        path = tmp_path / "revoked.log"
+        first, second = RevocationList(path), RevocationList(path)
+        first.load()
+        second.load()
+        await first.revoke(digest("a"), time.time() + 60)
+        assert not second.is_revoked(digest("a"))
+        second.sync()
+        assert second.is_revoked(digest("a"))
+        # nor the revocations of the other worker are lost by a compaction.
+        await second.revoke(digest("b"), None)
+        first.load()
+        assert first.is_revoked(digest("b"))
+        await second.revoke(digest("c"), None)
+        first.sync()
+        assert first.is_revoked(digest("c"))
+
+    asyncio.run(main())
+
+
+def test_expired_revocations_are_purged_and_compacted(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "revoked.log"
+    path.write_text(f"{digest('old').hex()} {time.time() - 1}\n")
+    revocations = RevocationList(path, purge_interval=0)
+    revocations.load()
+    assert len(revocations) == 0
+    assert path.read_text() == ""
+
+    async def main() -> None:
+        await revocations.revoke(digest("a"), time.time() + 0.05)
+        await asyncio.sleep(0.1)
+        # purged by the sync, without another revocation.
+        revocations.sync()
+        assert not revocations.is_revoked(digest("a"))
+
+    asyncio.run(main())
+
+
+def test_background_sync(tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        path = tmp_path / "revoked.log"
+        first = RevocationList(path)
+        second = RevocationList(path, sync_interval=0.01)
+        await second.start()
+        await first.revoke(digest("a"), None)
+        await asyncio.sleep(0.1)
+        assert second.is_revoked(digest("a"))
+        await second.stop()
+
+    asyncio.run(main())
+
+
+def revoke_many(path: pathlib.Path, worker: int) -> None:
+    async def main() -> None:
+        revocations = RevocationList(path)
+        for i in range(200):
+            await revocations.revoke(digest(f"{worker}:{i}"), None)
+            if i % 50 == 0:
+                revocations.load()
+
+    asyncio.run(main())
+
+
+def test_concurrent_appends_and_compactions(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "revoked.log"
+    workers = [
+        multiprocessing.Process(target=revoke_many, args=(path, worker))
+        for worker in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    revocations = RevocationList(path)
+    revocations.load()
+    assert len(revocations) == 800
+
+
+def test_logout_revokes_the_token(tmp_path: pathlib.Path) -> None:
+    app = fastapi.FastAPI()
+    issuer = TokenIssuer(KeyRing("HS256"))
+    revocations = RevocationList(tmp_path / "revoked.log")
+    oauth_app = OAuthApp(
+        app=app,
+        secret_key="test",
+        token_issuer=issuer,
+        token_verifier=TokenVerifier(issuer.verification_key, revocations=revocations),
+    )
+    oauth_app.expose_logout("/logout")
+
+    @app.get("/me")
+    async def me(claims=fastapi.Depends(oauth_app.require_user())):
+        return {"sub": claims["sub"]}
+
+    async def main() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url=BASE_URL
+        ) as client:
+            headers = {"Authorization": "Bearer " + issuer.issue({"sub": "1"})}
+            assert (await client.get("/me", headers=headers)).status_code == 200
+            resp = await client.post("/logout", headers=headers)
+            assert resp.status_code == 204
+            assert (await client.get("/me", headers=headers)).status_code == 401
+            assert (await client.post("/logout", headers=headers)).status_code == 401
+        # the revocation outlives the worker.
+        restarted = RevocationList(tmp_path / "revoked.log")
+        restarted.load()
+        assert len(restarted) == 1
+
+    asyncio.run(main())
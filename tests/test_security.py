@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import fastapi
+import httpx
+from authlib.jose import jwt
+
+from fastapi_authkit.core.security import TokenVerifier
+
+from conftest import BASE_URL
+
+KEY = "secret"
+
+
+def token(**claims) -> str:
+    return jwt.encode({"alg": "HS256"}, claims, KEY).decode()
+
+
+class CountingVerifier(TokenVerifier):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.decoded: int = 0
+
+    def decode(self, token: str):
+        self.decoded += 1
+        return super().decode(token)
+
+
+def test_verified_claims_are_cached_until_expiry() -> None:
+    verifier = CountingVerifier(KEY)
+    valid = token(sub="1", exp=int(time.time()) + 60)
+    assert verifier.verify(valid)["sub"] == "1"
+    assert verifier.verify(valid)["sub"] == "1"
+    assert verifier.decoded == 1
+
+    expiring = token(sub="2", exp=time.time() + 0.05)
+    verifier.verify(expiring)
+    assert verifier.cache.get(verifier.digest(expiring)) is not None
+    time.sleep(0.1)
+    # the cached claims expire with the token.
+    assert verifier.cache.get(verifier.digest(expiring)) is None
+
+
+def test_require_user() -> None:
+    verifier = TokenVerifier(KEY)
+    app = fastapi.FastAPI()
+
+    @app.get("/me")
+    async def me(claims=fastapi.Depends(verifier.dependency())):
+        return {"sub": claims["sub"]}
+
+    @app.get("/maybe")
+    async def maybe(claims=fastapi.Depends(verifier.dependency(auto_error=False))):
+        return {"sub": claims["sub"] if claims else None}
+
+    async def main() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url=BASE_URL
+        ) as client:
+            valid = {"Authorization": "Bearer " + token(sub="1")}
+            invalid = {"Authorization": "Bearer " + token(sub="1")[:-2]}
+            assert (await client.get("/me", headers=valid)).json() == {"sub": "1"}
+            resp = await client.get("/me", headers=invalid)
+            assert resp.status_code == 401
+            assert resp.headers["www-authenticate"] == "Bearer"
+            resp = await client.get("/maybe", headers=invalid)
+            assert resp.json() == {"sub": None}
+            # the revoked tokens are rejected, even when cached.
+            await verifier.revoke(token(sub="1"))
+            assert (await client.get("/me", headers=valid)).status_code == 401
+
+    asyncio.run(main())
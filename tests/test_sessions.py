@@ -0,0 +1,110 @@
+import asyncio
+import pathlib
+import typing
+
+import fastapi
+import httpx
+import pytest
+
+from fastapi_authkit.core.sessions import MemorySessionBackend
+from fastapi_authkit.core.sessions import ServerSessionMiddleware
+from fastapi_authkit.core.sessions import SQLiteSessionBackend
+from fastapi_authkit.interfaces.session import ISessionBackend
+
+from conftest import BASE_URL
+from conftest import clients
+from conftest import login
+
+
+class CountingBackend(MemorySessionBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes: int = 0
+
+    async def set(
+        self, session_id: str, data: dict[str, typing.Any], max_age: int
+    ) -> None:
+        self.writes += 1
+        await super().set(session_id, data, max_age)
+
+
+def session_app(backend: ISessionBackend) -> fastapi.FastAPI:
+    app = fastapi.FastAPI()
+    app.add_middleware(ServerSessionMiddleware, backend=backend)
+
+    @app.get("/set/{value}")
+    async def set_value(request: fastapi.Request, value: str) -> dict:
+        request.session["value"] = value
+        return dict(request.session)
+
+    @app.get("/get")
+    async def get_value(request: fastapi.Request) -> dict:
+        return dict(request.session)
+
+    @app.get("/clear")
+    async def clear(request: fastapi.Request) -> dict:
+        request.session.clear()
+        return {}
+
+    return app
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_sessions_live_in_the_backend(kind: str, tmp_path: pathlib.Path) -> None:
+    backend: ISessionBackend = (
+        MemorySessionBackend()
+        if kind == "memory"
+        else SQLiteSessionBackend(tmp_path / "sessions.sqlite3")
+    )
+
+    async def main() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=session_app(backend)),
+            base_url=BASE_URL,
+        ) as client:
+            resp = await client.get("/set/secret-value")
+            session_id = resp.cookies["session"]
+            # the cookie is an opaque id, the data stays on the server.
+            assert "secret" not in session_id
+            assert await backend.get(session_id) == {"value": "secret-value"}
+            assert (await client.get("/get")).json() == {"value": "secret-value"}
+            await client.get("/clear")
+            assert await backend.get(session_id) is None
+
+    asyncio.run(main())
+
+
+def test_unchanged_sessions_are_not_written() -> None:
+    backend = CountingBackend()
+
+    async def main() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=session_app(backend)),
+            base_url=BASE_URL,
+        ) as client:
+            await client.get("/set/a")
+            await client.get("/get")
+            await client.get("/set/a")
+            assert backend.writes == 1
+            # an id the server never issued is not adopted.
+            client.cookies.set("session", "forged")
+            resp = await client.get("/set/b")
+            assert resp.cookies["session"] != "forged"
+
+    asyncio.run(main())
+
+
+def test_login_with_server_side_sessions(build, stub) -> None:
+    app, oauth_app = build(names=("github",), session_backend=MemorySessionBackend())
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await login(app_client, browser, "/auth/github", "1")
+                assert resp.status_code == 201
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
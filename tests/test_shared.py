@@ -0,0 +1,85 @@
+import multiprocessing
+import pathlib
+import time
+
+import pytest
+
+from fastapi_authkit.core.shared import SharedCacheBackend
+
+
+def test_set_get_and_delete(tmp_path: pathlib.Path) -> None:
+    cache = SharedCacheBackend(tmp_path / "cache", slots=16, slot_size=128)
+    assert cache.get("a") is None
+    cache.set("a", b"1")
+    cache.set("a", b"2")
+    assert cache.get("a") == b"2"
+    cache.delete("a")
+    assert cache.get("a") is None
+    # too large values are not cached.
+    cache.set("b", b"x" * 128)
+    assert cache.get("b") is None
+    cache.close()
+
+
+def test_entries_expire(tmp_path: pathlib.Path) -> None:
+    cache = SharedCacheBackend(tmp_path / "cache", slots=16, slot_size=128)
+    cache.set("a", b"1", ttl=0.05)
+    assert cache.get("a") == b"1"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    # an expired entry can be added again.
+    assert cache.add("a", b"2", ttl=60)
+    assert not cache.add("a", b"3", ttl=60)
+    assert cache.get("a") == b"2"
+    cache.close()
+
+
+def test_full_neighbourhood_replaces_the_soonest_expiry(
+    tmp_path: pathlib.Path,
+) -> None:
+    cache = SharedCacheBackend(tmp_path / "cache", slots=2, slot_size=64)
+    cache.set("a", b"1", ttl=60)
+    cache.set("b", b"2", ttl=10)
+    cache.set("c", b"3", ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+    cache.close()
+
+
+def test_workers_share_the_entries(tmp_path: pathlib.Path) -> None:
+    first = SharedCacheBackend(tmp_path / "cache", slots=16, slot_size=128)
+    second = SharedCacheBackend(tmp_path / "cache", slots=16, slot_size=128)
+    first.set("a", b"1")
+    assert second.get("a") == b"1"
+    with pytest.raises(ValueError):
+        SharedCacheBackend(tmp_path / "cache", slots=32, slot_size=128)
+    first.close()
+    second.close()
+
+
+def add_all(
+    path: pathlib.Path, worker: int, added: "multiprocessing.Queue[int]"
+) -> None:
+    cache = SharedCacheBackend(path, slots=256, slot_size=64)
+    for i in range(100):
+        if cache.add(str(i), str(worker).encode(), ttl=60):
+            added.put(i)
+    cache.close()
+
+
+def test_add_is_atomic_across_processes(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "cache"
+    SharedCacheBackend(path, slots=256, slot_size=64).close()
+    added: "multiprocessing.Queue[int]" = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=add_all, args=(path, worker, added))
+        for worker in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    keys = [added.get(timeout=5) for _ in range(100)]
+    # each key is added by a single worker.
+    assert sorted(keys) == list(range(100))
+    assert added.empty()
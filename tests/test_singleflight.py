@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi_authkit.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run() -> None:
+    async def main() -> None:
+        flight: SingleFlight[int] = SingleFlight()
+        runs: list[int] = []
+
+        async def work() -> int:
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        assert runs == [1]
+        assert [value for value, _ in results] == [42] * 5
+        # only the first caller ran it.
+        assert [coalesced for _, coalesced in results] == [False] + [True] * 4
+        assert len(flight) == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_others() -> None:
+    async def main() -> None:
+        flight: SingleFlight[str] = SingleFlight()
+
+        async def work() -> str:
+            await asyncio.sleep(0.01)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == ("done", True)
+
+    asyncio.run(main())
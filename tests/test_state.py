@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from fastapi_authkit.core.state import StateSerializer
+
+from conftest import BASE_URL
+from conftest import clients
+
+
+def test_state_round_trip() -> None:
+    serializer = StateSerializer("secret", "google-state")
+    data = {"redirect_uri": "http://testserver/cb", "nonce": "n", "code_verifier": "v"}
+    state = serializer.dumps(data)
+    # encrypted, the code verifier doesn't show in the urls.
+    assert "code_verifier" not in state
+    assert serializer.loads(state) == data
+    assert serializer.loads(state[:-4] + "AAAA") is None
+    assert StateSerializer("secret", "github-state").loads(state) is None
+    assert StateSerializer("other", "google-state").loads(state) is None
+    assert serializer.loads(None) is None
+
+
+def test_state_expires() -> None:
+    serializer = StateSerializer("secret", "google-state", max_age=600)
+    payload = json.dumps({"nonce": "n"}).encode()
+    state = serializer.fernet.encrypt_at_time(payload, int(time.time()) - 601).decode()
+    assert serializer.loads(state) is None
+
+
+def test_any_node_completes_the_callback(build, stub) -> None:
+    settings = {"google": {"urlsafe_salt": "google-state"}}
+    first, first_app = build(names=("google",), settings=settings)
+    second, second_app = build(names=("google",), settings=settings)
+
+    async def main() -> None:
+        app_client, browser = clients(first, stub)
+        async with app_client, browser:
+            await first_app.startup()
+            await second_app.startup()
+            try:
+                resp = await app_client.get("/auth/google/login")
+                resp = await browser.get(resp.headers["location"], params={"user": "1"})
+                callback = resp.headers["location"]
+                # the callback reaches another node, with the browser's cookies.
+                async with httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=second),
+                    base_url=BASE_URL,
+                    cookies=app_client.cookies,
+                ) as other:
+                    assert (await other.get(callback)).status_code == 201
+                # and only from the browser which started the login.
+                async with httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=second), base_url=BASE_URL
+                ) as stranger:
+                    assert (await stranger.get(callback)).status_code == 400
+            finally:
+                await first_app.shutdown()
+                await second_app.shutdown()
+
+    asyncio.run(main())
+
+
+def test_stateless_callbacks_are_used_once(build, stub) -> None:
+    # without a replay cache given, the state is remembered by the worker.
+    app, oauth_app = build(
+        names=("google",), settings={"google": {"urlsafe_salt": "google-state"}}
+    )
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await app_client.get("/auth/google/login")
+                resp = await browser.get(resp.headers["location"], params={"user": "1"})
+                callback = resp.headers["location"]
+                assert (await app_client.get(callback)).status_code == 201
+                assert (await app_client.get(callback)).status_code == 400
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    assert oauth_app.metrics.outcomes("google") == {"signup": 1, "replayed": 1}
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from conftest import MemoryAuthLogic
+from conftest import clients
+from conftest import login
+
+
+class ProviderLogic(MemoryAuthLogic):
+    # records the namespace of every login.
+    def __init__(self) -> None:
+        super().__init__()
+        self.providers: list[str] = []
+
+    async def provider_login_or_signup(self, provider, userinfo):
+        self.providers.append(provider)
+        return await self.login_or_signup(userinfo)
+
+
+def test_tenants_share_the_routes(build, stub) -> None:
+    logic = ProviderLogic()
+    tenants = {"acme": {}, "globex": {"client_id": stub.client_id}}
+    app, oauth_app = build(
+        names=("okta-tenants",),
+        logic=logic,
+        options={"okta-tenants": {"tenant_settings": tenants.get, "max_tenants": 1}},
+    )
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                for tenant in ("acme", "globex", "acme"):
+                    resp = await login(
+                        app_client, browser, f"/auth/okta-tenants/{tenant}", "1"
+                    )
+                    assert resp.status_code in (200, 201), tenant
+                # unknown tenants, and the ones which aren't host labels.
+                for tenant in ("initech", "-bad"):
+                    resp = await app_client.get(f"/auth/okta-tenants/{tenant}/login")
+                    assert resp.status_code == 404, tenant
+                client = await oauth_app.get_provider_client("okta-tenants:acme")
+                assert "acme.okta.stub" in client._server_metadata_url
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+    assert logic.providers == [
+        "okta-tenants:acme",
+        "okta-tenants:globex",
+        "okta-tenants:acme",
+    ]
+
+
+def test_tenants_must_be_listed(build) -> None:
+    # without ``tenant_settings`` any org would get the shared client secret.
+    with pytest.raises(TypeError):
+        build(names=("okta-tenants",))
@@ -0,0 +1,99 @@
+import asyncio
+import pathlib
+import time
+
+import pytest
+
+from fastapi_authkit.core.tokens import MemoryTokenStore
+from fastapi_authkit.core.tokens import SQLiteTokenStore
+from fastapi_authkit.core.tokens import TokenRefresher
+from fastapi_authkit.interfaces.tokens import ITokenStore
+
+from conftest import clients
+from conftest import login
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_expiring_tokens(kind: str, tmp_path: pathlib.Path) -> None:
+    store: ITokenStore = (
+        MemoryTokenStore() if kind == "memory" else SQLiteTokenStore(tmp_path / "t")
+    )
+
+    async def main() -> None:
+        now = time.time()
+        await store.set("github", "1", {"refresh_token": "a", "expires_at": now + 60})
+        await store.set("github", "2", {"refresh_token": "b", "expires_at": now + 10})
+        await store.set("github", "3", {"refresh_token": "c", "expires_at": now + 900})
+        # without a refresh token there is nothing to refresh.
+        await store.set("github", "4", {"expires_at": now})
+        due = await store.expiring(now + 300, limit=10)
+        assert [sub for _, sub, _ in due] == ["2", "1"]
+        assert [sub for _, sub, _ in await store.expiring(now + 300, 1)] == ["2"]
+        await store.delete("github", "2")
+        assert await store.get("github", "2") is None
+
+    asyncio.run(main())
+
+
+def test_stored_tokens_are_refreshed(build, stub, tmp_path: pathlib.Path) -> None:
+    store = SQLiteTokenStore(tmp_path / "tokens.sqlite3")
+    app, oauth_app = build(names=("github",), token_store=store)
+    refresher = oauth_app.token_refresher
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                await login(app_client, browser, "/auth/github", "1")
+                token = await store.get("github", "1")
+                assert token is not None and token["access_token"] == "at-1"
+                # due within the margin, the background batch refreshes it.
+                await store.set("github", "1", {**token, "expires_at": time.time()})
+                assert await refresher.refresh_due() == 1
+                token = await store.get("github", "1")
+                assert token is not None and token["expires_at"] > time.time() + 3000
+                # an expired token is refreshed inline when it is asked for.
+                await store.set("github", "1", {**token, "expires_at": time.time()})
+                token = await refresher.get_token("github", "1")
+                assert token is not None and token["expires_at"] > time.time() + 3000
+            finally:
+                await oauth_app.shutdown()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_refresh_doesnt_overwrite_a_newer_login(
+    kind: str, tmp_path: pathlib.Path
+) -> None:
+    store: ITokenStore = (
+        MemoryTokenStore() if kind == "memory" else SQLiteTokenStore(tmp_path / "t")
+    )
+    old = {"access_token": "old", "refresh_token": "r", "expires_at": time.time()}
+    newer = {"access_token": "login", "refresh_token": "r2", "expires_at": 1e10}
+
+    class Client:
+        async def fetch_access_token(self, **kwargs):
+            # the user logs in again while the old token is being refreshed.
+            await store.set("github", "1", newer)
+            return {"access_token": "refreshed", "expires_at": 1e10}
+
+    async def resolve(provider: str) -> Client:
+        return Client()
+
+    async def main() -> None:
+        await store.set("github", "1", old)
+        refresher = TokenRefresher(store, resolve)
+        assert await refresher.refresh_due() == 1
+        assert await store.get("github", "1") == newer
+        # the inline refresh doesn't either.
+        await store.set("github", "1", old)
+        token = await refresher.get_token("github", "1")
+        assert token is not None and token["access_token"] == "refreshed"
+        assert await store.get("github", "1") == newer
+        # without a newer login, the refreshed token is stored.
+        await store.replace_many([("github", "1", newer, token)])
+        assert await store.get("github", "1") == token
+
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+import asyncio
+import pathlib
+
+import pytest
+
+from fastapi_authkit.core.cache import MemoryCacheBackend
+from fastapi_authkit.core.http import HTTPClientPool
+from fastapi_authkit.core.oauth import UserInfoModel
+from fastapi_authkit.core.shared import SharedCacheBackend
+from fastapi_authkit.core.userinfo import UserInfoCache
+
+from conftest import RecordingTransport
+from conftest import clients
+from conftest import login
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_cached_userinfo_round_trips(tmp_path: pathlib.Path, shared: bool) -> None:
+    backend = (
+        SharedCacheBackend(tmp_path / "cache", slots=64, slot_size=1024)
+        if shared
+        else MemoryCacheBackend()
+    )
+    cache = UserInfoCache(backend=backend)
+    # as the providers build it, the values are kept as they came.
+    userinfo = UserInfoModel.construct(
+        sub="1",
+        email="user@example.com",
+        email_verified=True,
+        phone_number_verified=False,
+        extra={"login": "user", "id": 1},
+    )
+    cache.set("github", userinfo, etag='"v1"')
+    entry = cache.get("github", "1")
+    assert entry is not None
+    assert entry.userinfo == userinfo
+    assert entry.userinfo.email_verified is True
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+    # nothing to revalidate without a validator.
+    cache.set("github", UserInfoModel(sub="2"))
+    assert cache.get("github", "2") is None
+
+
+def test_cached_userinfo_is_revalidated(build, stub) -> None:
+    transport = RecordingTransport(stub)
+    app, oauth_app = build(names=("github",), http=HTTPClientPool(transport=transport))
+
+    async def main() -> None:
+        app_client, browser = clients(app, stub)
+        async with app_client, browser:
+            await oauth_app.startup()
+            try:
+                resp = await login(app_client, browser, "/auth/github", "1")
+                assert resp.status_code == 201
+                assert transport.responses[-1] == ("/user", 200)
+                # the session's subject tells which profile to revalidate.
+                resp = await login(app_client, browser, "/auth/github", "1")
+                assert resp.status_code == 200
+                assert transport.responses[-1] == ("/user", 304)
+            finally:
+                await oauth_app.shutdown()
+        entry = oauth_app.userinfo_cache.get("github", "1")
+        assert entry is not None and entry.etag == '"1"'
+
+    asyncio.run(main())
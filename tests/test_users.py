@@ -0,0 +1,62 @@
+import asyncio
+import pathlib
+
+import pytest
+
+from fastapi_authkit.core.database import SQLiteDriver
+from fastapi_authkit.core.issuer import KeyRing
+from fastapi_authkit.core.issuer import TokenIssuer
+from fastapi_authkit.core.oauth import UserInfoModel
+from fastapi_authkit.core.users import SQLiteAuthLogic
+
+
+def test_users_are_unique_per_provider(tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        logic = SQLiteAuthLogic(
+            TokenIssuer(KeyRing("HS256")), SQLiteDriver(tmp_path / "users.sqlite3")
+        )
+        userinfo = UserInfoModel.construct(sub="1", name="Jane", email_verified=True)
+        first, created = await logic.provider_login_or_signup("google", userinfo)
+        assert first is not None and created
+        _, created = await logic.provider_login_or_signup("google", userinfo)
+        assert not created
+        # the same sub of another provider is another user.
+        _, created = await logic.provider_login_or_signup("github", userinfo)
+        assert created
+        stored = await logic.get_userinfo("google", "1")
+        assert stored == userinfo
+        assert stored is not None and stored.email_verified is True
+        assert await logic.get_userinfo("zoom", "1") is None
+
+    asyncio.run(main())
+
+
+def test_concurrent_logins_create_one_user(tmp_path: pathlib.Path) -> None:
+    async def main() -> None:
+        logic = SQLiteAuthLogic(
+            TokenIssuer(KeyRing("HS256")), SQLiteDriver(tmp_path / "users.sqlite3")
+        )
+        userinfo = UserInfoModel.construct(sub="1")
+        results = await asyncio.gather(
+            *(logic.provider_login_or_signup("google", userinfo) for _ in range(10))
+        )
+        assert sum(created for _, created in results) == 1
+
+    asyncio.run(main())
+
+
+class OldSQLiteDriver(SQLiteDriver):
+    # a build of sqlite without ``RETURNING``.
+    async def fetchone(self, sql, parameters=()):
+        if sql == "SELECT sqlite_version()":
+            return ("3.31.1",)
+        return await super().fetchone(sql, parameters)
+
+
+def test_old_sqlite_is_refused(tmp_path: pathlib.Path) -> None:
+    logic = SQLiteAuthLogic(
+        TokenIssuer(KeyRing("HS256")), OldSQLiteDriver(tmp_path / "users.sqlite3")
+    )
+    userinfo = UserInfoModel.construct(sub="1")
+    with pytest.raises(RuntimeError, match="3.35"):
+        asyncio.run(logic.provider_login_or_signup("google", userinfo))